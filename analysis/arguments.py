@@ -0,0 +1,96 @@
+import argparse
+import os
+import re
+import textwrap
+from workflows import WORKFLOWS
+
+'''
+Command line of main.py. Only the standard library and the workflow registry are imported, so that the arguments
+(and --help) are handled before pandas, networkx and matplotlib are loaded
+'''
+
+
+'''
+Read command line arguments and return list of analysis routines to run
+'''
+
+def parse_arguments():
+    valid_analysis_names = list(WORKFLOWS)
+
+    def validate_path(p):
+        if not os.path.exists(p):
+            error_msg = f"{p} does not exist"
+            raise argparse.ArgumentTypeError(error_msg)
+        return p
+
+    # "first-last" or a single value, numbers may be negative (e.g. seeds)
+    def validate_range(value):
+        match = re.fullmatch(r"(-?\d+)(?:-(-?\d+))?", value)
+        if not match:
+            raise argparse.ArgumentTypeError(f'{value} is not a valid range, use FIRST-LAST or a single value')
+        first = int(match.group(1))
+        last = first if match.group(2) is None else int(match.group(2))
+        return [first, last]
+
+    # check that the analysis routines passed by the user are valid
+    def validate_analysis_workflows(analysis_workflows):
+        analysis_workflows = analysis_workflows.split(',')
+        for analysis_workflow in analysis_workflows:
+            if analysis_workflow not in valid_analysis_names:
+                error_msg = f'{analysis_workflow} is not a valid analysis workflow. Choose one or a combination of the following workflows: {valid_analysis_names}'
+                raise argparse.ArgumentTypeError(error_msg)
+        return analysis_workflows
+
+    description = textwrap.dedent('''
+    This script performs downstream analysis of simulation outputs generated by the spatial single progenitor models.
+    It takes as input a path to netlogo model file and the name(s) of the required analysis workflow(s). 
+    If no analysis workflows are given, then the script performs all the available workflows.
+    The user may either save the output calculations as pickled files (choosing the 'save' option) OR
+    use existing pickled files from previous runs (choosing the 'use' option). This option might be helpful for producing 
+    alternative plots from existing output calculations without repeating the analysis.
+    USAGE EXAMPLES:
+    main.py -m "path/to/netlogo/model/directory" save (All analysis workflows will be performed)
+    main.py -m "path/to/netlogo/model/directory" -a mutantProportion,averageCloneSize save (Only a subset of two workflows will be performed)
+    main.py -m "path/to/netlogo/model/directory" use (Existing analysis outputs will be used and be re-plotted)
+    main.py -m "path/to/netlogo/model/directory" update (Only new or changed world files will be analysed and added to existing analysis outputs)
+    main.py -m "path/to/netlogo/model/directory" watch (World files will be analysed as soon as they are exported, until interrupted)
+    ''')
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, description=description)
+    requiredNamed = parser.add_argument_group('Required named arguments')
+    requiredNamed.add_argument('-m', '--model_dir', help='directory containing the model file (.nlogo)',
+                        required=True, type=validate_path, metavar='PATH')
+    parser.add_argument('-a', '--analysis', help=f'analysis workflow(s), Choose one or a combination of the following: {valid_analysis_names}, DEFAULT:{valid_analysis_names}',
+                        type=validate_analysis_workflows, default=','.join(valid_analysis_names), metavar='SINGLE or COMBINATION OF ANALYSIS WORKFLOWS ')
+    parser.add_argument('var', help='save output analysis variables (save), use already saved output variables (use), '
+                                    'add the new or changed world files to the saved output variables (update) or '
+                                    'keep analysing the world files while the simulations export them (watch)',
+                        nargs='?', choices=('save', 'use', 'update', 'watch'))
+    parser.add_argument('-j', '--jobs', help='number of worker processes used for parsing and analysing the world files, DEFAULT:1',
+                        type=int, default=1, metavar='N')
+    parser.add_argument('--tile-size', help='side (in patches) of the grid tiles used for local statistics, DEFAULT: a tenth of the shortest grid side',
+                        type=int, metavar='N')
+    for gridLimit in ['min-pxcor', 'max-pxcor', 'min-pycor', 'max-pycor']:
+        parser.add_argument('--' + gridLimit, help=f'{gridLimit} of the simulated grid, DEFAULT: derived from the world files',
+                            type=int, metavar='N')
+    parser.add_argument('--no-cache', help='do not read or write the cache of parsed world snapshots (netlogo_output/worlds_cache)',
+                        action='store_true')
+    parser.add_argument('--weeks', help='analyse only the snapshots of this range of weeks, DEFAULT: all weeks',
+                        type=validate_range, metavar='FIRST-LAST')
+    parser.add_argument('--seeds', help='analyse only the runs of this range of seeds, DEFAULT: all seeds',
+                        type=validate_range, metavar='FIRST-LAST')
+    parser.add_argument('--store', help='consolidate the world files into a memory mapped snapshot store (netlogo_output/store) and analyse the snapshots from the store',
+                        action='store_true')
+    parser.add_argument('--poll-interval', help='watch: seconds between checks for new world files, DEFAULT:5',
+                        type=float, default=5.0, metavar='SECONDS')
+    parser.add_argument('--idle-timeout', help='watch: stop when no new world file was exported for this long, DEFAULT: run until interrupted',
+                        type=float, metavar='SECONDS')
+    parser.add_argument('--delete-ingested', help='watch: delete the world files once they have been analysed',
+                        action='store_true')
+    parser.add_argument('--metrics', help='record the time and memory of the analysis stages in metrics.jsonl in the model directory',
+                        action='store_true')
+    parser.add_argument('--profile', help='write the cProfile statistics of the analysis (main process only) to this file',
+                        metavar='PATH')
+
+    args = parser.parse_args()
+
+    return args
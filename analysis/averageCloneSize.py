@@ -1,17 +1,18 @@
 from essentials import *
-import os
+from pipeline import run_workflows
+from stats import IntegerHistogram, get_mean_std
 
 
 def plotAvgCloneSizePerWeek(totalCloneSizePerWeek, cloneType, c):
-    numberOfweeks = len(totalCloneSizePerWeek)
     avgCloneSizesPerWeek = []
     std = []
 
-    weeks = range(numberOfweeks)
+    weeks = list(sorted(totalCloneSizePerWeek.keys()))
 
     for week in weeks:
-        avgCloneSizesPerWeek.append(np.array(totalCloneSizePerWeek[week]).mean())
-        std.append(np.array(totalCloneSizePerWeek[week]).std())
+        mean, sd = get_mean_std(totalCloneSizePerWeek[week])
+        avgCloneSizesPerWeek.append(mean)
+        std.append(sd)
 
 
     d = {
@@ -31,63 +32,53 @@ def plotAvgCloneSizePerWeek(totalCloneSizePerWeek, cloneType, c):
 
     plot(d)
 
-def avgCloneSizePerWeek(c, options):
+def initAvgCloneSize(c):
     if c['induction_level'] > 0:
-        totalMutCloneSizePerWeek = {}
-        totalWTCloneSizePerWeek = {}
-
-        if options.var == 'use':
-            totalMutCloneSizePerWeek = readVariableFromDisk('totalMutCloneSizePerWeek', c)
-            totalWTCloneSizePerWeek = readVariableFromDisk('totalWTCloneSizePerWeek', c)
-        else:
-            for filename in os.listdir(c['netlogo_output']):
-                [week, seed] = re.findall(r"[-]?\d+|\d+", filename)
-
-                week = int(week)
-                agents = parse_netlogo_world(c['netlogo_output'] + filename)
-                clones = get_clones(agents)  # group agents by clone ID
+        return {'totalMutCloneSizePerWeek': {}, 'totalWTCloneSizePerWeek': {}}
+    else:
+        return {'totalCloneSizePerWeek': {}}
 
-                totalWTCloneSizePerWeek.setdefault(week, [])
 
-                mutantClones, wtClones = split_clones(clones)
+def updateAvgCloneSize(results, week, agents, c):
+    clones = get_clone_summary(agents)  # one row per clone ID
 
-                for mutant, mclones in mutantClones.items():
+    if c['induction_level'] > 0:
+        totalMutCloneSizePerWeek = results['totalMutCloneSizePerWeek']
+        totalWTCloneSizePerWeek = results['totalWTCloneSizePerWeek']
 
-                    totalMutCloneSizePerWeek.setdefault(mutant, {}).setdefault(week, [])
+        totalWTCloneSizePerWeek.setdefault(week, IntegerHistogram())
+        totalWTCloneSizePerWeek[week].extend(clones.loc[clones["mutation-status"] == "WT", "cells"].to_numpy())
 
-                    for cloneID, cloneAgents in mclones.items():
-                        totalMutCloneSizePerWeek[mutant][week].append(get_num_of_cells(cloneAgents))
+        for mutant in clones["mutation-status"].unique():
+            if mutant in MUTANT_TYPES:
+                totalMutCloneSizePerWeek.setdefault(mutant, {}).setdefault(week, IntegerHistogram())
+                totalMutCloneSizePerWeek[mutant][week].extend(
+                    clones.loc[clones["mutation-status"] == mutant, "cells"].to_numpy())
 
-                for cloneID, cloneAgents in wtClones.items():
-                    totalWTCloneSizePerWeek[week].append(get_num_of_cells(cloneAgents))
+    else:
+        totalCloneSizePerWeek = results['totalCloneSizePerWeek']
 
-        if options.var == 'save':
-            writeVariableToDisk(totalMutCloneSizePerWeek, 'totalMutCloneSizePerWeek', c)
-            writeVariableToDisk(totalWTCloneSizePerWeek, 'totalWTCloneSizePerWeek', c)
+        totalCloneSizePerWeek.setdefault(week, IntegerHistogram())
+        totalCloneSizePerWeek[week].extend(clones["cells"].to_numpy())
 
-        plotAvgCloneSizePerWeek(totalWTCloneSizePerWeek, "WT", c)
 
-        for mutant, cloneSizePerWeek in totalMutCloneSizePerWeek.items():
-            plotAvgCloneSizePerWeek(totalMutCloneSizePerWeek[mutant], mutant, c)
+def plotAvgCloneSize(results, c):
+    if c['induction_level'] > 0:
+        plotAvgCloneSizePerWeek(results['totalWTCloneSizePerWeek'], "WT", c)
 
+        for mutant, cloneSizePerWeek in results['totalMutCloneSizePerWeek'].items():
+            plotAvgCloneSizePerWeek(cloneSizePerWeek, mutant, c)
     else:
-        totalCloneSizePerWeek = {}
+        plotAvgCloneSizePerWeek(results['totalCloneSizePerWeek'], "WT", c)
 
-        if options.var == 'use':
-            totalCloneSizePerWeek = readVariableFromDisk('totalCloneSizePerWeek', c)
-        else:
-            for filename in os.listdir(c['netlogo_output']):
-                [week, seed] = re.findall(r"[-]?\d+|\d+", filename)
 
-                week = int(week)
-                agents = parse_netlogo_world(c['netlogo_output'] + filename)
-                clones = get_clones(agents)  # group agents by clone ID
+avgCloneSizeWorkflow = {
+    'name': 'averageCloneSize',
+    'init': initAvgCloneSize,
+    'update': updateAvgCloneSize,
+    'plot': plotAvgCloneSize,
+}
 
-                totalCloneSizePerWeek.setdefault(week, [])
-                for cloneID, cloneAgents in clones.items():
-                    totalCloneSizePerWeek[week].append(get_num_of_cells(cloneAgents))
 
-        if options.var == 'save':
-            writeVariableToDisk(totalCloneSizePerWeek, 'totalCloneSizePerWeek', c)
-
-        plotAvgCloneSizePerWeek(totalCloneSizePerWeek, "WT", c)
+def avgCloneSizePerWeek(c, options):
+    run_workflows(c, options, [avgCloneSizeWorkflow])
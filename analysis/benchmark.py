@@ -0,0 +1,371 @@
+from essentials import *
+from averageCloneSize import avgCloneSizeWorkflow
+from mutantProportion import mutantPercentageWorkflow
+from cellPopulations import cellPopulationsWorkflow
+from cellDensity import cellDensityWorkflow
+from rho import rhoWorkflow
+from cloneSizeDistribution import cloneSizeDistributionWorkflow
+from cloneInteractions import cloneInteractionsWorkflow
+from neighborhoodDensity import neighborhoodDensityWorkflow
+from pipeline import get_world_files
+from store import build_snapshot_store, open_snapshot_store
+import itertools
+import json
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import tracemalloc
+
+'''
+Benchmarks of the analysis pipeline on synthetic world snapshots.
+Synthetic runs are written as netlogo export-world csv files (hex grid with six-neighbors strings, single, double
+and empty agents, contiguous WT, p53 and N clones that grow over the weeks) in a temporary model directory, for every
+combination of the requested grid sizes, clone counts and seed counts. Every essentials function is timed on the
+snapshot of the last week, reading all the snapshots is timed from the world files and, optionally, from the snapshot
+store, and every workflow is timed on all the snapshots (update) and once for its plots. The agents of a run keep
+their who numbers in all its world files, as in netlogo, so a run can be consolidated in the snapshot store.
+Times are the median of the repeats, peak memory is the peak of the Python allocations traced by tracemalloc (numpy
+and pandas buffers included) during a single call. Results are written as JSON, and a previous results file can be
+given to print the change of every timing
+'''
+
+BENCHMARK_VERSION = 1
+
+CELL_TYPES = ["A", "B", "AA", "AB", "BA", "BB"]
+CELL_TYPE_PROBABILITIES = [0.35, 0.45, 0.04, 0.06, 0.06, 0.04]
+
+TURTLE_COLUMNS = ["who", "color", "heading", "xcor", "ycor", "shape", "label", "label-color", "breed", "hidden?",
+                  "size", "pen-size", "pen-mode", "immediate-neighbors", "extended-neighbors", "six-neighbors",
+                  "cell-type", "state", "time", "cloneid", "creation-time", "mutation-status", "fate-bias",
+                  "division-rate", "stratification-rate", "symmetric-prob", "progenitor-proportion"]
+
+
+'''
+Return the clone ID of every patch of a side x side grid: numOfClones clones seeded at random patches and grown
+over the hex neighbourhood, by steps in which every patch next to a clone joins it with probability 1/2.
+Mutant clones (the first numOfMutantClones IDs) grow twice as many steps. Every patch left outside the grown clones
+is a clone of its own, as every cell at the start of a run
+'''
+
+
+def grow_clones(neighbors, numOfClones, numOfMutantClones, steps, rng):
+    numOfPatches = neighbors.shape[0]
+    cloneids = np.zeros(numOfPatches + 1, dtype=np.int64)
+    cloneids[rng.choice(numOfPatches, size=min(numOfClones, numOfPatches), replace=False)] = \
+        np.arange(1, min(numOfClones, numOfPatches) + 1)
+
+    for step in range(2 * steps):
+        # index -1 (padding) selects the extra 0 entry of cloneids
+        neighbor = cloneids[neighbors[np.arange(numOfPatches), rng.integers(neighbors.shape[1], size=numOfPatches)]]
+        grows = (neighbor > 0) & (neighbor <= numOfMutantClones if step >= steps else True)
+        joins = (cloneids[:-1] == 0) & grows & (rng.random(numOfPatches) < 0.5)
+        cloneids[:-1][joins] = neighbor[joins]
+
+    cloneids = cloneids[:-1]
+    single = cloneids == 0
+    cloneids[single] = numOfClones + 1 + np.arange(np.count_nonzero(single))
+
+    return cloneids
+
+
+'''
+Write a synthetic netlogo world csv of a side x side grid at a given week. whoOfPatch is the who number of the agent of
+every patch, which is the same in all the world files of a run, as in netlogo
+'''
+
+
+def write_synthetic_world(csv, side, numOfClones, week, whoOfPatch, rng, mutantFraction=0.2, emptyFraction=0.05):
+    gridExtent = [0, side - 1, 0, side - 1]
+    topology = get_topology(gridExtent)
+    numOfPatches = side * side
+
+    numOfMutantClones = int(round(numOfClones * mutantFraction))
+    cloneids = grow_clones(topology["six-neighbors"], numOfClones, numOfMutantClones, 1 + week // 4, rng)
+    mutationStatus = np.where(cloneids > numOfMutantClones, "WT", np.where(cloneids % 2 == 0, "p53", "N"))
+    cellType = rng.choice(CELL_TYPES, size=numOfPatches, p=CELL_TYPE_PROBABILITIES).astype(object)
+    state = np.where(np.isin(cellType, ["A", "B"]), "single", "double")
+
+    empty = rng.random(numOfPatches) < emptyFraction
+    cellType[empty], state[empty], cloneids[empty] = "empty", "empty", 0
+    fateBias = np.where(mutationStatus == "WT", 0, 0.95)
+
+    patchOfWho = np.argsort(whoOfPatch)
+    sixNeighbors = whoOfPatch[topology["six-neighbors"]]
+
+    lines = ['"export-world data (NetLogo 6.1.1)"', '"densityFeedback.nlogo"', '"01/01/2024 00:00:00:000 +0000"', '',
+             '"RANDOM STATE"', '"0 -1 0 0 0"', '', '"GLOBALS"', '"min-pxcor","max-pxcor","min-pycor","max-pycor"',
+             '"{}","{}","{}","{}"'.format(*gridExtent), '', '"TURTLES"',
+             ','.join('"' + column + '"' for column in TURTLE_COLUMNS)]
+    for who in range(numOfPatches):
+        patch = patchOfWho[who]
+        mutation = '"0"' if empty[patch] else '"""' + mutationStatus[patch] + '"""'
+        lines.append(f'"{who}","45","0","{topology["xcor"][patch]:g}","{topology["ycor"][patch]:g}","""hex""",'
+                     f'"""""","9.9","{{all-turtles}}","false","1","1","""up""",'
+                     f'"{{turtles {" ".join(map(str, sixNeighbors[patch]))}}}","{{turtles}}",'
+                     f'"{{turtles {" ".join(map(str, sixNeighbors[patch]))}}}","""{cellType[patch]}""",'
+                     f'"""{state[patch]}""","{week + rng.random():.6f}","{cloneids[patch]}","{week:.6f}",{mutation},'
+                     f'"{fateBias[patch]:g}","1.9","3.5","0.1","0.65"')
+    lines += ['', '"PATCHES"', '"pxcor","pycor","pcolor","plabel","plabel-color"']
+    lines += [f'"{x}","{y}","0","""""","9.9"' for x in range(side) for y in range(side)]
+    lines += ['', '"LINKS"', '', '']
+
+    with open(csv, 'w') as fh:
+        fh.write("\n".join(lines))
+
+
+'''
+Create a model directory with the config.nls of the unified model and the synthetic world files of numOfSeeds runs
+of numOfWeeks weeks, and return the analysis configuration of main.py for it
+'''
+
+
+def create_synthetic_model(modelDir, side, numOfClones, numOfSeeds, numOfWeeks, seed=0):
+    for directory in ["netlogo_output/worlds", "analysis_output/dump_vars"]:
+        os.makedirs(os.path.join(modelDir, directory), exist_ok=True)
+    with open(os.path.join(modelDir, "config.nls"), 'w') as fh:
+        fh.write(' set model "unified"\n set sims-duration {}\n set induction 0.01\n set densityBias true\n'
+                 ' set crowdingCutOff 6\n set fdelta 1.0\n set p53delta 0.95\n'.format(numOfWeeks - 1))
+
+    rng = np.random.default_rng(seed)
+    for run in range(numOfSeeds):
+        # agents are created in a random order, so who numbers are not the patch numbers
+        whoOfPatch = rng.permutation(side * side)
+        for week in range(numOfWeeks):
+            write_synthetic_world(os.path.join(modelDir, "netlogo_output", "worlds", f"unified_{week}_{run + 1}.csv"),
+                                  side, numOfClones, week, whoOfPatch, rng)
+
+    netlogo_config = os.path.join(modelDir, "config.nls")
+    c = parse_config_files(netlogo_config)
+    c.update({'netlogo_config': netlogo_config, 'parameters': parse_config_parameters(netlogo_config),
+              'week_range': None, 'seed_range': None,
+              'netlogo_output': os.path.join(modelDir, "netlogo_output", "worlds/"),
+              'analysis_output': os.path.join(modelDir, "analysis_output/"),
+              'tile_size': None, 'grid_extent': None, 'world_cache': None, 'snapshot_store': None})
+
+    return c
+
+
+def get_all_clone_adjacencies(agents):
+    return [get_clone_adjacencies(clone) for clone in get_clones(agents).values()]
+
+
+def get_all_clone_graphs(agents):
+    return [get_clone_graph(clone) for clone in get_clones(agents).values()]
+
+
+# essentials functions, called with the agents of a snapshot (parse_netlogo_world with the path of its csv)
+FUNCTIONS = {
+    'parse_netlogo_world': lambda agents, csv, c: parse_netlogo_world(csv),
+    'get_neighbor_pairs': lambda agents, csv, c: get_neighbor_pairs(agents),
+    'get_clones': lambda agents, csv, c: get_clones(agents),
+    'get_clone_summary': lambda agents, csv, c: get_clone_summary(agents),
+    'get_clone_components': lambda agents, csv, c: get_clone_components(agents),
+    'get_clone_adjacencies': lambda agents, csv, c: get_all_clone_adjacencies(agents),
+    'get_clone_graph': lambda agents, csv, c: get_all_clone_graphs(agents),
+    'get_grid_chunks': lambda agents, csv, c: get_grid_chunks(agents),
+    'get_tile_counts': lambda agents, csv, c: get_tile_counts(agents),
+    'get_cell_counts': lambda agents, csv, c: get_cell_counts(agents),
+    'get_snapshot_cell_counts': lambda agents, csv, c: get_snapshot_cell_counts(agents),
+    'get_neighborhood_density': lambda agents, csv, c: get_neighborhood_density(agents),
+    'get_feedback_bias': lambda agents, csv, c: get_feedback_bias(get_neighborhood_density(agents),
+                                                                  agents["mutation-status"], c['parameters']),
+    'get_graph': lambda agents, csv, c: get_graph(agents),
+}
+
+WORKFLOWS = [avgCloneSizeWorkflow, mutantPercentageWorkflow, cellPopulationsWorkflow, cellDensityWorkflow, rhoWorkflow,
+             cloneSizeDistributionWorkflow, cloneInteractionsWorkflow, neighborhoodDensityWorkflow]
+
+
+'''
+Call a function repeat times and return (median seconds, minimum seconds, peak traced memory in bytes)
+'''
+
+
+def measure(function, repeat):
+    seconds = []
+    peakMemory = 0
+    for r in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+        peakMemory = max(peakMemory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return statistics.median(seconds), min(seconds), peakMemory
+
+
+def benchmark_case(side, numOfClones, numOfSeeds, numOfWeeks, repeat, functions, workflows, workDir, store=False):
+    case = {'grid': side, 'agents': side * side, 'clones': numOfClones, 'seeds': numOfSeeds, 'weeks': numOfWeeks}
+    modelDir = os.path.join(workDir, f"grid{side}_clones{numOfClones}_seeds{numOfSeeds}")
+    start = time.perf_counter()
+    c = create_synthetic_model(modelDir, side, numOfClones, numOfSeeds, numOfWeeks)
+    print(f"grid {side}x{side}, {numOfClones} clones, {numOfSeeds} seeds: generated in "
+          f"{time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    # the world files are listed by the catalogue, as by main.py
+    worldFiles = get_world_files(c)
+    lastWorld = os.path.join(c['netlogo_output'], f"unified_{numOfWeeks - 1}_1.csv")
+    agents = parse_netlogo_world(lastWorld)
+
+    results = []
+
+    def add_result(name, kind, timing, units, count):
+        median, minimum, peakMemory = timing
+        results.append(dict(case, name=name, kind=kind, repeat=repeat, seconds=median, min_seconds=minimum,
+                            throughput={units + '_per_second': count / median if median > 0 else None},
+                            peak_memory_bytes=peakMemory))
+        print(f"  {kind:<16} {name:<28} {median * 1000:10.1f} ms {peakMemory / 2 ** 20:9.1f} MiB", file=sys.stderr)
+
+    for name in functions:
+        add_result(name, 'function', measure(lambda: FUNCTIONS[name](agents, lastWorld, c), repeat), 'agents',
+                   len(agents))
+
+    # reading every snapshot, from the world files or from the snapshot store (see store.py)
+    add_result('parse_netlogo_world', 'read',
+               measure(lambda: [parse_netlogo_world(path) for week, seed, path in worldFiles], repeat), 'snapshots',
+               len(worldFiles))
+    if store:
+        storeDir = os.path.join(modelDir, "netlogo_output", "store")
+        add_result('build_snapshot_store', 'store',
+                   measure(lambda: build_snapshot_store(worldFiles, storeDir, numOfWeeks), 1), 'snapshots',
+                   len(worldFiles))
+        snapshotStore = open_snapshot_store(storeDir)
+        add_result('snapshot_store', 'read',
+                   measure(lambda: [agents for week, seed, path in worldFiles
+                                    for week, agents in snapshotStore.get_snapshots(path)], repeat), 'snapshots',
+                   len(worldFiles))
+
+    for workflow in workflows:
+        # snapshots are parsed once per repeat outside of the timed update calls
+        timings = []
+        for r in range(repeat):
+            results_ = workflow['init'](c)
+            seconds = 0.0
+            peakMemory = 0
+            for week, seed, path in worldFiles:
+                snapshotAgents = parse_netlogo_world(path)
+                timing = measure(lambda: workflow['update'](results_, week, snapshotAgents, c), 1)
+                seconds += timing[0]
+                peakMemory = max(peakMemory, timing[2])
+            timings.append((seconds, peakMemory))
+        seconds = [timing[0] for timing in timings]
+        add_result(workflow['name'], 'workflow-update',
+                   (statistics.median(seconds), min(seconds), max(timing[1] for timing in timings)),
+                   'snapshots', len(worldFiles))
+
+        # plots are rendered once, a repeated rendering would be skipped by the figure cache (see render.py)
+        add_result(workflow['name'], 'workflow-plot', measure(lambda: workflow['plot'](results_, c), 1),
+                   'figures', 1)
+
+    return results
+
+
+def get_environment():
+    import networkx as nx
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.processor(),
+            'cpus': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__, 'networkx': nx.__version__}
+
+
+'''
+Print the change of every timing against a previous results file. Timings are matched by their name, kind, grid,
+clones, seeds and weeks
+'''
+
+
+def compare_results(results, previousFile):
+    with open(previousFile) as fh:
+        previous = json.load(fh)
+
+    key = lambda result: (result['kind'], result['name'], result['grid'], result['clones'], result['seeds'],
+                          result['weeks'])
+    previousSeconds = {key(result): result['seconds'] for result in previous['results']}
+
+    print(f"{'kind':<16} {'name':<28} {'grid':>5} {'clones':>6} {'seeds':>5} {'before (ms)':>12} {'after (ms)':>11} "
+          f"{'speedup':>8}")
+    for result in results:
+        before = previousSeconds.get(key(result))
+        if before is None:
+            continue
+        speedup = before / result['seconds'] if result['seconds'] > 0 else float('inf')
+        print(f"{result['kind']:<16} {result['name']:<28} {result['grid']:>5} {result['clones']:>6} "
+              f"{result['seeds']:>5} {before * 1000:12.1f} {result['seconds'] * 1000:11.1f} {speedup:7.2f}x")
+
+
+def parse_integer_list(values):
+    try:
+        return [int(value) for value in values.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{values}' is not a comma separated list of integers")
+
+
+def parse_name_list(validNames):
+    def parse(values):
+        names = values.split(',')
+        for name in names:
+            if name not in validNames:
+                raise argparse.ArgumentTypeError(f"'{name}' is not one of {validNames}")
+        return names
+    return parse
+
+
+def parse_benchmark_arguments():
+    workflowNames = [workflow['name'] for workflow in WORKFLOWS]
+    parser = argparse.ArgumentParser(description='Benchmark the analysis functions and workflows on synthetic world '
+                                                 'snapshots of every combination of grid sizes, clone and seed counts')
+    parser.add_argument('--grid', help='comma separated sides of the square grids, DEFAULT: 50,100',
+                        type=parse_integer_list, default=[50, 100], metavar='N[,N...]')
+    parser.add_argument('--clones', help='comma separated numbers of clones, DEFAULT: 50',
+                        type=parse_integer_list, default=[50], metavar='N[,N...]')
+    parser.add_argument('--seeds', help='comma separated numbers of seeds (runs), DEFAULT: 2',
+                        type=parse_integer_list, default=[2], metavar='N[,N...]')
+    parser.add_argument('--weeks', help='number of weeks (world files) of every run, from week 0, DEFAULT: 71',
+                        type=int, default=71, metavar='N')
+    parser.add_argument('--repeat', help='number of timed repeats, DEFAULT: 3', type=int, default=3, metavar='N')
+    parser.add_argument('--functions', help=f'functions to benchmark, DEFAULT: all of {list(FUNCTIONS)}',
+                        type=parse_name_list(list(FUNCTIONS)), default=list(FUNCTIONS), metavar='NAME[,NAME...]')
+    parser.add_argument('--workflows', help=f'workflows to benchmark, DEFAULT: all of {workflowNames}',
+                        type=parse_name_list(workflowNames), default=workflowNames, metavar='NAME[,NAME...]')
+    parser.add_argument('-o', '--output', help='JSON file of the results, DEFAULT: benchmark.json',
+                        default='benchmark.json', metavar='PATH')
+    parser.add_argument('--compare', help='JSON file of previous results to compare with', metavar='PATH')
+    parser.add_argument('--store', help='also time building the snapshot store and reading the snapshots from it',
+                        action='store_true')
+    parser.add_argument('--keep', help='keep the synthetic model directories in this directory instead of a '
+                                       'temporary directory', metavar='PATH')
+
+    return parser.parse_args()
+
+
+def main():
+    options = parse_benchmark_arguments()
+    workflows = [workflow for workflow in WORKFLOWS if workflow['name'] in options.workflows]
+
+    workDir = options.keep if options.keep is not None else tempfile.mkdtemp(prefix="sp_benchmark_")
+    results = []
+    try:
+        for side, numOfClones, numOfSeeds in itertools.product(options.grid, options.clones, options.seeds):
+            results += benchmark_case(side, numOfClones, numOfSeeds, options.weeks, options.repeat,
+                                      options.functions, workflows, workDir, options.store)
+    finally:
+        if options.keep is None:
+            shutil.rmtree(workDir, ignore_errors=True)
+
+    output = {'version': BENCHMARK_VERSION,
+              'timestamp': datetime.datetime.now().astimezone().isoformat(timespec='seconds'),
+              'environment': get_environment(),
+              'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+              'results': results}
+    with open(options.output, 'w') as fh:
+        json.dump(output, fh, indent=1)
+    print(f"{len(results)} timings written to {options.output}", file=sys.stderr)
+
+    if options.compare is not None:
+        compare_results(results, options.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+from essentials import *
+import json
+import sqlite3
+
+'''
+Catalogue of the simulation outputs of a model directory, kept as an SQLite database in
+analysis_output/catalogue.sqlite. Every world file (netlogo_output/worlds/<model>_<week>_<seed>.csv), snapshot file
+(netlogo_output/snapshots/<model>_<seed>.csv, week NULL) and event log (netlogo_output/events/<model>_<seed>.csv,
+week NULL) is recorded with its model, week, seed, size, modification
+time and the parameters of config.nls at the time it was catalogued. The catalogue is synchronised with the output
+directories once per run, file names are only parsed for new files, and the files of a range of weeks and seeds are
+selected with an indexed query
+'''
+
+CATALOGUE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    week INTEGER,
+    seed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    parameters TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_week_seed ON outputs (week, seed);
+CREATE INDEX IF NOT EXISTS outputs_seed ON outputs (seed);
+'''
+
+
+'''
+Return (model, week, seed) of a world file name (week is None for snapshot files and event logs), or None for other
+files.
+Only the last fields are numbers, so model names may contain digits and underscores
+'''
+
+
+def parse_output_filename(filename, kind):
+    if not filename.endswith(".csv"):
+        return None
+
+    fields = filename[:-len(".csv")].rsplit('_', 2 if kind == 'world' else 1)
+    try:
+        if kind == 'world':
+            return fields[0], int(fields[1]), int(fields[2])
+        return fields[0], None, int(fields[1])
+    except (IndexError, ValueError):
+        return None
+
+
+# files that are not netlogo outputs are reported once per process
+skippedFiles = set()
+
+
+def open_catalogue(c):
+    os.makedirs(c['analysis_output'], exist_ok=True)
+    connection = sqlite3.connect(os.path.join(c['analysis_output'], "catalogue.sqlite"))
+    connection.executescript(CATALOGUE_SCHEMA)
+
+    return connection
+
+
+'''
+Synchronise the catalogue with the world, snapshot and event log directories: new and changed files are (re)catalogued and
+files that no longer exist are removed
+'''
+
+
+def update_catalogue(c, connection):
+    parameters = None
+    catalogued = {path: (size, mtime) for path, size, mtime in connection.execute("SELECT path, size, mtime FROM outputs")}
+    found = set()
+
+    with connection:
+        for kind, directory in [('world', c['netlogo_output']), ('snapshot', c.get('netlogo_snapshots')),
+                                ('events', c.get('netlogo_events'))]:
+            if directory is None or not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if not entry.is_file():
+                    continue
+                path = os.path.join(directory, entry.name)
+                stat = entry.stat()
+                found.add(path)
+                if catalogued.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+
+                fields = parse_output_filename(entry.name, kind)
+                if fields is None:
+                    if path not in skippedFiles:
+                        print(f'{path}: not a netlogo output file name, skipped')
+                        skippedFiles.add(path)
+                    continue
+                if parameters is None:
+                    parameters = json.dumps(parse_config_parameters(c.get('netlogo_config', '')))
+                connection.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (path, kind) + fields + (stat.st_size, stat.st_mtime_ns, parameters))
+
+        connection.executemany("DELETE FROM outputs WHERE path = ?",
+                               [(path,) for path in catalogued.keys() - found])
+
+
+'''
+Return the list of [week, seed, path] of the catalogued files within the (first, last) ranges of weeks and seeds
+(None for all), ordered by week and seed. Snapshot files (week None) are listed last and selected by seed only.
+A run is analysed from a single source: the world files of a (model, seed) that also has a snapshot file are not
+listed, as the snapshot file holds the same weeks
+'''
+
+
+def query_world_files(connection, weekRange=None, seedRange=None):
+    query = ("SELECT week, seed, path FROM outputs AS o WHERE NOT (kind = 'world' AND EXISTS "
+             "(SELECT 1 FROM outputs AS s WHERE s.kind = 'snapshot' AND s.model = o.model AND s.seed = o.seed))")
+    arguments = []
+    if weekRange is not None:
+        query += " AND (week IS NULL OR week BETWEEN ? AND ?)"
+        arguments += list(weekRange)
+    if seedRange is not None:
+        query += " AND seed BETWEEN ? AND ?"
+        arguments += list(seedRange)
+    query += " ORDER BY week IS NULL, week, seed, path"
+
+    return [list(row) for row in connection.execute(query, arguments)]
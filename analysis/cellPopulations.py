@@ -1,9 +1,8 @@
 from essentials import *
-import os
+from pipeline import run_workflows
 
 
 def plotCellPopulationsPerWeek(cellPopulations, c):
-    numberOfweeks = len(cellPopulations)
 
     avgAlpha = []
     stdAlpha = []
@@ -14,7 +13,7 @@ def plotCellPopulationsPerWeek(cellPopulations, c):
     avgEmpty = []
     stdEmpty = []
 
-    weeks = range(numberOfweeks)
+    weeks = list(sorted(cellPopulations.keys()))
 
     for week in weeks:
         avgAlpha.append(np.array(cellPopulations[week]['A']).mean())
@@ -65,31 +64,31 @@ def plotCellPopulationsPerWeek(cellPopulations, c):
     plot(dcrowding)
 
 
-def cellPopulationsPerWeek(c, options):
-    cellPopulations = {}
+def initCellPopulations(c):
+    return {'cellPopulations': {}}
+
 
-    if options.var == 'use':
-        cellPopulations = readVariableFromDisk('cellPopulations', c)
-    else:
-        for filename in os.listdir(c['netlogo_output']):
-            [week, seed] = re.findall(r"[-]?\d+|\d+", filename)
+def updateCellPopulations(results, week, agents, c):
+    cellPopulations = results['cellPopulations']
 
-            week = int(week)
-            agents = parse_netlogo_world(c['netlogo_output'] + filename)
+    counts = get_snapshot_cell_counts(agents)
 
-            cellPopulations.setdefault(week, {}).setdefault('A', [])
-            cellPopulations[week]['A'].append(get_cell_populations(agents)[0])
+    for population in ['A', 'B', 'D', 'E']:
+        cellPopulations.setdefault(week, {}).setdefault(population, [])
+        cellPopulations[week][population].append(int(counts[population]))
 
-            cellPopulations.setdefault(week, {}).setdefault('B', [])
-            cellPopulations[week]['B'].append(get_cell_populations(agents)[1])
 
-            cellPopulations.setdefault(week, {}).setdefault('D', [])
-            cellPopulations[week]['D'].append(get_cell_populations(agents)[2])
+def plotCellPopulations(results, c):
+    plotCellPopulationsPerWeek(results['cellPopulations'], c)
 
-            cellPopulations.setdefault(week, {}).setdefault('E', [])
-            cellPopulations[week]['E'].append(get_cell_populations(agents)[3])
 
-    if options.var == 'save':
-        writeVariableToDisk(cellPopulations, 'cellPopulations', c)
+cellPopulationsWorkflow = {
+    'name': 'cellPopulations',
+    'init': initCellPopulations,
+    'update': updateCellPopulations,
+    'plot': plotCellPopulations,
+}
 
-    plotCellPopulationsPerWeek(cellPopulations, c)
\ No newline at end of file
+
+def cellPopulationsPerWeek(c, options):
+    run_workflows(c, options, [cellPopulationsWorkflow])
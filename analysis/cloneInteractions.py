@@ -0,0 +1,111 @@
+from essentials import *
+from pipeline import run_workflows
+
+
+def plot_clone_interactions_per_week(statisticPerWeek, ylabel, title, filename, c):
+    formats = {'WT': 'k-o', 'p53': 'b-o', 'N': 'r-o'}
+
+    x = {}
+    y = {}
+    for label, valuesPerWeek in statisticPerWeek.items():
+        weeks = list(sorted(valuesPerWeek.keys()))
+
+        avg = []
+        std = []
+        for week in weeks:
+            avg.append(np.array(valuesPerWeek[week]).mean())
+            std.append(np.array(valuesPerWeek[week]).std())
+
+        x[label] = weeks
+        y[label] = (avg, formats.get(label, 'g-o'), std, 'gray', 'gray', 'shaded')
+
+    d = {
+        'data': {
+            'x': x,
+            'y': y,
+        },
+        'xlabel': 'Weeks',
+        'ylabel': ylabel,
+        'title': title,
+        'savefig': c['analysis_output'] + filename
+    }
+
+    plot(d)
+
+
+'''
+Calculate clone-clone contact statistics of a snapshot from the pairs of neighboring agents:
+ - boundary length between WT and every type of mutant cells (number of neighboring WT-mutant agent pairs)
+ - average number of distinct neighboring clones of a clone, per mutation status
+ - proportion of fragmented clones, per mutation status
+'''
+
+
+def get_clone_interactions(agents):
+    agents = agents[agents["state"].isin(["single", "double"])]
+
+    mutationStatus = agents["mutation-status"].astype(str).to_numpy()
+    cloneids = agents["cloneid"].to_numpy()
+    i, j = get_neighbor_pairs(agents)
+
+    boundaryLength = {}
+    for mt in np.unique(mutationStatus):
+        if mt != "WT":
+            boundaryLength[mt] = int(np.count_nonzero(((mutationStatus[i] == "WT") & (mutationStatus[j] == mt)) |
+                                                      ((mutationStatus[i] == mt) & (mutationStatus[j] == "WT"))))
+
+    # distinct pairs of neighboring clones, ignoring agents without clone ID
+    contact = (cloneids[i] != cloneids[j]) & (cloneids[i] != 0) & (cloneids[j] != 0)
+    clonePairs = np.stack([cloneids[i][contact], cloneids[j][contact]])
+    clonePairs = np.unique(np.stack([clonePairs.min(axis=0), clonePairs.max(axis=0)]), axis=1)
+    neighboringClones = pd.Series(np.concatenate([clonePairs[0], clonePairs[1]]), dtype=np.int64).value_counts()
+
+    clones = agents[agents["cloneid"] != 0].groupby("cloneid")["mutation-status"].first().astype(str)
+    clones = clones.to_frame("mutation-status")
+    clones["neighboring-clones"] = neighboringClones.reindex(clones.index, fill_value=0)
+    clones["fragmented"] = get_clone_components(agents)["fragmented"].reindex(clones.index, fill_value=False)
+
+    statistics = clones.groupby("mutation-status").agg(neighboringClones=("neighboring-clones", "mean"),
+                                                       fragmentationRate=("fragmented", "mean"))
+
+    return boundaryLength, statistics
+
+
+def initCloneInteractions(c):
+    return {'boundaryLengthPerWeek': {}, 'neighboringClonesPerWeek': {}, 'fragmentationRatePerWeek': {}}
+
+
+def updateCloneInteractions(results, week, agents, c):
+    boundaryLength, statistics = get_clone_interactions(agents)
+
+    for mt, length in boundaryLength.items():
+        results['boundaryLengthPerWeek'].setdefault(mt, {}).setdefault(week, [])
+        results['boundaryLengthPerWeek'][mt][week].append(length)
+
+    for mutationStatus, row in statistics.iterrows():
+        results['neighboringClonesPerWeek'].setdefault(mutationStatus, {}).setdefault(week, [])
+        results['neighboringClonesPerWeek'][mutationStatus][week].append(float(row['neighboringClones']))
+        results['fragmentationRatePerWeek'].setdefault(mutationStatus, {}).setdefault(week, [])
+        results['fragmentationRatePerWeek'][mutationStatus][week].append(float(row['fragmentationRate']))
+
+
+def plotCloneInteractions(results, c):
+    if results['boundaryLengthPerWeek']:
+        plot_clone_interactions_per_week(results['boundaryLengthPerWeek'], 'Number of WT-mutant contacts',
+                                         "WT-mutant boundary length", "wt_mutant_boundary_std.png", c)
+    plot_clone_interactions_per_week(results['neighboringClonesPerWeek'], 'Number of neighbouring clones',
+                                     "Average number of neighbouring clones", "neighbouring_clones_std.png", c)
+    plot_clone_interactions_per_week(results['fragmentationRatePerWeek'], 'Proportion of fragmented clones',
+                                     "Clone fragmentation", "fragmentation_rate_std.png", c)
+
+
+cloneInteractionsWorkflow = {
+    'name': 'cloneInteractions',
+    'init': initCloneInteractions,
+    'update': updateCloneInteractions,
+    'plot': plotCloneInteractions,
+}
+
+
+def cloneInteractionsPerWeek(c, options):
+    run_workflows(c, options, [cloneInteractionsWorkflow])
@@ -1,29 +1,39 @@
 from essentials import *
-import seaborn as sns
-import os
+from pipeline import run_workflows
+from stats import IntegerHistogram, get_mean_std
 
-def plot_distributions(data, yaxis, c, type="WT"):
+def plot_distributions(cloneSizesPerWeek, c, type="WT"):
 
-    df = pd.DataFrame(data)
-    df = df.loc[df['week'].apply(lambda x: x % 20 == 0 and x != 0)]
+    weeks = [week for week in sorted(cloneSizesPerWeek.keys()) if week % 20 == 0 and week != 0]
+    boxes = []
+    for week in weeks:
+        boxes.append(cloneSizesPerWeek[week].boxplot_stats())
+        boxes[-1]['label'] = week
+
+    # no week of the analysed range is a multiple of 20
+    if not boxes:
+        return
 
-    box = sns.boxplot(x='week', y=yaxis, data=df)
-    plt.title(type)
-    plt.xlabel('Week')
-    plt.ylabel('Clone size')
-    plt.savefig(c['analysis_output'] + "boxplot_" + type + "_clone_size.png", dpi=300)
-    plt.close()
+    d = {
+        'boxes': boxes,
+        'xlabel': 'Week',
+        'ylabel': 'Clone size',
+        'title': type,
+        'savefig': c['analysis_output'] + "boxplot_" + type + "_clone_size.png"
+    }
+
+    render_figure('boxplots', d)
 
 def plotCloneSurvivalPerWeek(numOfClonesPerWeek, cloneType, c):
-    numberOfweeks = len(numOfClonesPerWeek)
     avgCloneSurvPerWeek = []
     std = []
 
-    weeks = range(numberOfweeks)
+    weeks = list(sorted(numOfClonesPerWeek.keys()))
 
     for week in weeks:
-        avgCloneSurvPerWeek.append(np.array(numOfClonesPerWeek[week]).mean())
-        std.append(np.array(numOfClonesPerWeek[week]).std())
+        mean, sd = get_mean_std(numOfClonesPerWeek[week])
+        avgCloneSurvPerWeek.append(mean)
+        std.append(sd)
 
     d = {
         'data': {
@@ -43,80 +53,71 @@ def plotCloneSurvivalPerWeek(numOfClonesPerWeek, cloneType, c):
     plot(d)
 
 
-def cloneSizeDistributionPerWeek (c, options):
+def initCloneSizeDistribution(c):
     if c['induction_level'] > 0:
+        return {'mutCloneSizes': {}, 'wtCloneSizes': {}, 'MUTnumberOfClones': {}, 'WTnumberOfClones': {}}
+    else:
+        return {'cloneSizes': {}, 'numberOfClones': {}}
 
-        mutCloneSizes = {}
-        wtCloneSizes = []
-        MUTnumberOfClones = {}
-        WTnumberOfClones = {}
 
-        if options.var == 'use':
-            mutCloneSizes = readVariableFromDisk('mutCloneSizes', c)
-            wtCloneSizes = readVariableFromDisk('wtCloneSizes', c)
-            MUTnumberOfClones = readVariableFromDisk('MUTnumberOfClones', c)
-            WTnumberOfClones = readVariableFromDisk('WTnumberOfClones', c)
-        else:
-            for filename in os.listdir(c['netlogo_output']):
-                [week, seed] = re.findall(r"[-]?\d+|\d+", filename)
+def updateCloneSizeDistribution(results, week, agents, c):
+    clones = get_clone_summary(agents)  # one row per clone ID
 
-                week = int(week)
-                agents = parse_netlogo_world(c['netlogo_output'] + filename)
-                clones = get_clones(agents)  # group agents by clone ID
-                mutantClones, wtClones = split_clones(clones)
+    if c['induction_level'] > 0:
+        mutCloneSizes = results['mutCloneSizes']
+        wtCloneSizes = results['wtCloneSizes']
+        MUTnumberOfClones = results['MUTnumberOfClones']
+        WTnumberOfClones = results['WTnumberOfClones']
 
-                WTnumberOfClones.setdefault(week, [])
-                WTnumberOfClones[week].append(len(wtClones))
+        wtClones = clones[clones["mutation-status"] == "WT"]
 
-                for cloneID, cloneAgents in wtClones.items():
-                    wtCloneSizes.append({"week": week, "wt_clone_size": get_num_of_cells(cloneAgents)})
-                for mutant, mclones in mutantClones.items():
+        WTnumberOfClones.setdefault(week, [])
+        WTnumberOfClones[week].append(len(wtClones))
 
-                    mutCloneSizes.setdefault(mutant, [])
-                    MUTnumberOfClones.setdefault(mutant, {}).setdefault(week,[])
-                    MUTnumberOfClones[mutant][week].append(len(mclones))
+        wtCloneSizes.setdefault(week, IntegerHistogram())
+        wtCloneSizes[week].extend(wtClones["cells"].to_numpy())
+        for mutant in clones["mutation-status"].unique():
+            if mutant not in MUTANT_TYPES:
+                continue
+            mclones = clones[clones["mutation-status"] == mutant]
 
-                    for cloneID, cloneAgents in mclones.items():
-                        mutCloneSizes[mutant].append({"week": week, "mutant_clone_size": get_num_of_cells(cloneAgents)})
+            mutCloneSizes.setdefault(mutant, {}).setdefault(week, IntegerHistogram())
+            MUTnumberOfClones.setdefault(mutant, {}).setdefault(week,[])
+            MUTnumberOfClones[mutant][week].append(len(mclones))
 
-        if options.var == 'save':
-            writeVariableToDisk(mutCloneSizes, 'mutCloneSizes', c)
-            writeVariableToDisk(wtCloneSizes, 'wtCloneSizes', c)
-            writeVariableToDisk(MUTnumberOfClones, 'MUTnumberOfClones', c)
-            writeVariableToDisk(WTnumberOfClones, 'WTnumberOfClones', c)
+            mutCloneSizes[mutant][week].extend(mclones["cells"].to_numpy())
 
-        for mutant in mutCloneSizes.keys():
-            plot_distributions(mutCloneSizes[mutant], 'mutant_clone_size', c, mutant)
-            plotCloneSurvivalPerWeek(MUTnumberOfClones[mutant], mutant, c)
-        plot_distributions(wtCloneSizes, 'wt_clone_size', c)
-        plotCloneSurvivalPerWeek(WTnumberOfClones, "WT", c)
+    else:
+        cloneSizes = results['cloneSizes']
+        numberOfClones = results['numberOfClones']
 
+        numberOfClones.setdefault(week, [])
+        numberOfClones[week].append(len(clones))
 
-    else:
-        cloneSizes = []
-        numberOfClones = {}
+        if week % 20 == 0 and week !=0:
+            cloneSizes.setdefault(week, IntegerHistogram())
+            cloneSizes[week].extend(clones["cells"].to_numpy())
 
-        if options.var == 'use':
-            cloneSizes = readVariableFromDisk('cloneSizes', c)
-            numberOfClones = readVariableFromDisk('numberOfClones', c)
-        else:
-            for filename in os.listdir(c['netlogo_output']):
-                [week, seed] = re.findall(r"[-]?\d+|\d+", filename)
 
-                week = int(week)
-                agents = parse_netlogo_world(c['netlogo_output'] + filename)
-                clones = get_clones(agents)  # group agents by clone ID
+def plotCloneSizeDistribution(results, c):
+    if c['induction_level'] > 0:
+        for mutant in results['mutCloneSizes'].keys():
+            plot_distributions(results['mutCloneSizes'][mutant], c, mutant)
+            plotCloneSurvivalPerWeek(results['MUTnumberOfClones'][mutant], mutant, c)
+        plot_distributions(results['wtCloneSizes'], c)
+        plotCloneSurvivalPerWeek(results['WTnumberOfClones'], "WT", c)
+    else:
+        plot_distributions(results['cloneSizes'], c)
+        plotCloneSurvivalPerWeek(results['numberOfClones'], "WT", c)
 
-                numberOfClones.setdefault(week, [])
-                numberOfClones[week].append(len(clones))
 
-                if week % 20 == 0 and week !=0:
-                    for cloneID, cloneAgents in clones.items():
-                        cloneSizes.append({"week": week, "wt_clone_size": get_num_of_cells(cloneAgents)})
+cloneSizeDistributionWorkflow = {
+    'name': 'cloneSizeDistribution',
+    'init': initCloneSizeDistribution,
+    'update': updateCloneSizeDistribution,
+    'plot': plotCloneSizeDistribution,
+}
 
-        if options.var == 'save':
-            writeVariableToDisk(cloneSizes, 'cloneSizes', c)
-            writeVariableToDisk(numberOfClones, 'numberOfClones', c)
 
-        plot_distributions(cloneSizes,'wt_clone_size', c)
-        plotCloneSurvivalPerWeek(numberOfClones, "WT", c)
+def cloneSizeDistributionPerWeek (c, options):
+    run_workflows(c, options, [cloneSizeDistributionWorkflow])
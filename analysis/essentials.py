@@ -1,63 +1,16 @@
 import argparse
 import os
 import re
+import io
 import pandas as pd
-import networkx as nx
 import datetime
 import textwrap
 import time
 import numpy as np
-import matplotlib.pyplot as plt
 import pickle
-
-'''
-Read command line arguments and return list of analysis routines to run
-'''
-
-def parse_arguments():
-    valid_analysis_names = ['cloneSizeDistribution', 'averageCloneSize', 'cellPopulations', 'cloneInteractions',
-                            'cellDensity', 'rho']
-
-    def validate_path(p):
-        if not os.path.exists(p):
-            error_msg = f"{p} does not exist"
-            raise argparse.ArgumentTypeError(error_msg)
-        return p
-
-    # check that the analysis routines passed by the user are valid
-    def validate_analysis_workflows(analysis_workflows):
-        analysis_workflows = analysis_workflows.split(',')
-        for analysis_workflow in analysis_workflows:
-            if analysis_workflow not in valid_analysis_names:
-                error_msg = f'{analysis_workflow} is not a valid analysis workflow. Choose one or a combination of the following workflows: {valid_analysis_names}'
-                raise argparse.ArgumentTypeError(error_msg)
-        return analysis_workflows
-
-    description = textwrap.dedent('''
-    This script performs downstream analysis of simulation outputs generated by the spatial single progenitor models.
-    It takes as input a path to netlogo model file and the name(s) of the required analysis workflow(s). 
-    If no analysis workflows are given, then the script performs all the available workflows.
-    The user may either save the output calculations as pickled files (choosing the 'save' option) OR
-    use existing pickled files from previous runs (choosing the 'use' option). This option might be helpful for producing 
-    alternative plots from existing output calculations without repeating the analysis.
-    USAGE EXAMPLES:
-    main.py -m "path/to/netlogo/model/directory" save (All analysis workflows will be performed)
-    main.py -m "path/to/netlogo/model/directory" -a mutantProportion,averageCloneSize save (Only a subset of two workflows will be performed)
-    main.py -m "path/to/netlogo/model/directory" use (Existing analysis outputs will be used and be re-plotted)
-    ''')
-    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, description=description)
-    requiredNamed = parser.add_argument_group('Required named arguments')
-    requiredNamed.add_argument('-m', '--model_dir', help='directory containing the model file (.nlogo)',
-                        required=True, type=validate_path, metavar='PATH')
-    parser.add_argument('-a', '--analysis', help=f'analysis workflow(s), Choose one or a combination of the following: {valid_analysis_names}, DEFAULT:{valid_analysis_names}',
-                        type=validate_analysis_workflows, default=','.join(valid_analysis_names), metavar='SINGLE or COMBINATION OF ANALYSIS WORKFLOWS ')
-    parser.add_argument('var', help='save output analysis variables (save) or use already saved output variables (use)',
-                        nargs='?', choices=('save', 'use'))
-
-    args = parser.parse_args()
-
-    return args
-
+import weakref
+from topology import get_topology, get_agent_neighbors
+from render import render_figure
 
 '''
 Read config files and return dictionary with config values
@@ -79,6 +32,35 @@ def parse_config_files(netlogo_conf):
     return config_values
 
 
+'''
+Read the values of all the parameters set in a netlogo config file ("set name value" lines).
+Numbers and booleans are converted, any other value (e.g. an expression) is kept as a string
+'''
+
+
+def parse_config_parameters(netlogo_conf):
+    parameters = {}
+    if not os.path.exists(netlogo_conf):
+        return parameters
+
+    with open(netlogo_conf) as f:
+        for line in f:
+            match = re.match(r"\s*set\s+(\S+)\s+([^;]*)", line)
+            if not match:
+                continue
+            name, value = match.group(1), match.group(2).strip()
+            if value in ("true", "false"):
+                parameters[name] = value == "true"
+            elif re.fullmatch(r"-?\d+", value):
+                parameters[name] = int(value)
+            elif re.fullmatch(r"-?\d*\.\d+|-?\d+\.\d*", value):
+                parameters[name] = float(value)
+            else:
+                parameters[name] = value.strip('"')
+
+    return parameters
+
+
 '''
 Convert string of neighbors to list of neighbors
 '''
@@ -100,35 +82,170 @@ def parse_neighbors_string(string):
 
 
 '''
-Parse netlogo world csv and return dataframe with selected fields
+Convert a series of neighbor strings to a (number of agents x NEIGHBORS_WIDTH) matrix of neighbor IDs.
+Agents with fewer neighbors (e.g. at the edges of a non-wrapping grid) are padded with -1
+'''
+
+NEIGHBORS_WIDTH = 6
+NEIGHBOR_COLUMNS = ["six-neighbors-" + str(i) for i in range(NEIGHBORS_WIDTH)]
+
+
+def parse_neighbors_strings(strings):
+    strings = strings.tolist()
+    # "{turtles 26 48 43 39 33 91}" has 6 neighbors separated by 6 spaces
+    counts = np.array([string.count(' ') for string in strings], dtype=np.int64)
+    values = np.array(' '.join(strings).replace('{turtles', '').replace('}', '').split(), dtype=np.int32)
+
+    # scatter the flat list of neighbor IDs to their (row, position) in the matrix
+    rows = np.repeat(np.arange(len(strings)), counts)
+    columns = np.arange(values.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    keep = columns < NEIGHBORS_WIDTH
+
+    neighbors = np.full((len(strings), NEIGHBORS_WIDTH), -1, dtype=np.int32)
+    neighbors[rows[keep], columns[keep]] = values[keep]
+
+    return neighbors
+
+
+'''
+Parse netlogo world csv and return dataframe with selected fields.
+The six-neighbors agentset of every agent is returned as the int32 columns in NEIGHBOR_COLUMNS. The neighbours are
+taken from the grid topology (see topology.py) by the coordinates of the agents, the six-neighbors strings are only
+parsed for worlds that are not a full grid with one agent per patch
 '''
 
 
-def parse_netlogo_world(csv):
+def parse_netlogo_world(csv, cache_dir=None):
     # Keep only rows corresponding to "turtle" agents
-    top_rows_to_exclude = 0
-    bottom_rows_to_exclude = 0
     with open(csv) as f:
-        for i, l in enumerate(f):
-            if l.startswith("\"TURTLES\""):
-                top_rows_to_exclude = i + 1
-            if l.startswith("\"PATCHES\""):
-                bottom_rows_to_exclude = i - 1
+        content = f.read()
+    start = content.index("\n", content.index("\n\"TURTLES\"") + 1) + 1
+    end = content.index("\n\"PATCHES\"", start)
 
-    df = pd.read_csv(csv, skiprows=top_rows_to_exclude, nrows=bottom_rows_to_exclude - top_rows_to_exclude - 1)
-    df = df.loc[:, ["who", "xcor", "ycor", "six-neighbors", "cell-type", "state", "time", "cloneid", "creation-time",
-                    "mutation-status", "fate-bias"]]
+    df = pd.read_csv(io.StringIO(content[start:end]),
+                     usecols=["who", "xcor", "ycor", "cell-type", "state", "time", "cloneid", "creation-time",
+                              "mutation-status", "fate-bias"])
 
     # certain csv columns are triple quoted, extra quotes have to be removed
+    # the repeated string columns are stored as categoricals, so quotes are only removed from the categories
     for column in ["cell-type", "state", "mutation-status"]:
-        df[column] = df[column].apply(lambda x: x.replace('"', ''))
+        df[column] = df[column].astype(str).astype("category")
+        df[column] = df[column].cat.rename_categories(lambda x: x.replace('"', ''))
+
+    gridExtent = get_grid_extent(df)
+    neighbors = get_agent_neighbors(df["who"].to_numpy(), df["xcor"].to_numpy(), df["ycor"].to_numpy(), gridExtent,
+                                    get_topology(gridExtent, cacheDir=cache_dir))
+    if neighbors is None:
+        # convert strings of neighbors to a fixed width matrix of neighbors
+        neighbors = parse_neighbors_strings(pd.read_csv(io.StringIO(content[start:end]),
+                                                        usecols=["six-neighbors"])["six-neighbors"])
+    for i, column in enumerate(NEIGHBOR_COLUMNS):
+        df[column] = neighbors[:, i]
+
+    return df[["who", "xcor", "ycor", "cell-type", "state", "time", "cloneid", "creation-time", "mutation-status",
+               "fate-bias"] + NEIGHBOR_COLUMNS]
+
+
+'''
+Return the (number of agents x NEIGHBORS_WIDTH) matrix of neighbor IDs of a group of agents
+'''
 
-    # convert string of neighbors to list of neighbors
-    df["six-neighbors"] = df["six-neighbors"].apply(lambda x: parse_neighbors_string(x))
+
+def get_neighbor_matrix(agents):
+    return agents[NEIGHBOR_COLUMNS].to_numpy()
+
+
+'''
+Parsed world snapshots are cached as pickled dataframes in a directory next to the netlogo worlds.
+A cache entry is reused only if the size and modification time of its world csv are unchanged.
+WORLD_CACHE_VERSION has to be increased whenever the output of parse_netlogo_world changes.
+'''
+
+WORLD_CACHE_VERSION = 3
+
+
+def get_world_cache_key(csv):
+    stat = os.stat(csv)
+    return {'version': WORLD_CACHE_VERSION, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+'''
+Return dataframe of a netlogo world csv, using the parsed snapshot cache when possible
+'''
+
+
+def load_netlogo_world(csv, cache_dir=None):
+    if cache_dir is None:
+        return parse_netlogo_world(csv)
+
+    key = get_world_cache_key(csv)
+    cache_file = os.path.join(cache_dir, os.path.basename(csv) + ".pkl")
+
+    # the key is pickled ahead of the dataframe, so that stale entries are detected without loading them
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as fh:
+            try:
+                if pickle.load(fh) == key:
+                    return pickle.load(fh)
+            except (pickle.UnpicklingError, EOFError):
+                pass
+
+    df = parse_netlogo_world(csv, cache_dir)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = cache_file + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_file, 'wb') as fh:
+        pickle.dump(key, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(df, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
 
     return df
 
 
+'''
+Parse a compact snapshot file written by get-snapshot (see report.nls) and yield (week, dataframe) for every week,
+with the same columns as parse_netlogo_world ("time" is not exported and is left empty).
+The file starts with the static topology of the grid, followed by the agent variables of every week:
+    topology
+    who,xcor,ycor,six-neighbors
+    ...
+    snapshots
+    week,who,cell-type,state,cloneid,creation-time,mutation-status,fate-bias
+    ...
+Snapshot files are appended while the simulation runs, so a last week that is not completely written is skipped
+'''
+
+
+def parse_netlogo_snapshots(csv):
+    with open(csv) as f:
+        content = f.read()
+    content = content[:content.rfind("\n") + 1]
+    start = content.index("snapshots\n")
+
+    topology = pd.read_csv(io.StringIO(content[content.index("\n") + 1:start]))
+    topology = topology.sort_values("who")
+    neighbors = parse_neighbors_strings("{turtles " + topology["six-neighbors"].astype(str) + "}")
+
+    snapshots = pd.read_csv(io.StringIO(content[start + len("snapshots\n"):]),
+                            dtype={"cell-type": "category", "state": "category", "mutation-status": "category"})
+
+    who = topology["who"].to_numpy()
+    for week, df in snapshots.groupby("week", sort=True):
+        if len(df) < len(who):
+            continue
+
+        positions = np.searchsorted(who, df["who"].to_numpy())
+        df = df.drop(columns="week").reset_index(drop=True)
+        df["xcor"] = topology["xcor"].to_numpy()[positions]
+        df["ycor"] = topology["ycor"].to_numpy()[positions]
+        df["time"] = np.nan
+        for i, column in enumerate(NEIGHBOR_COLUMNS):
+            df[column] = neighbors[positions, i]
+
+        yield int(week), df[["who", "xcor", "ycor", "cell-type", "state", "time", "cloneid", "creation-time",
+                             "mutation-status", "fate-bias"] + NEIGHBOR_COLUMNS]
+
+
 '''
 Return dataframe containing neighbors
 '''
@@ -136,37 +253,131 @@ Return dataframe containing neighbors
 
 def get_neighbors(agent, agents):
 
-    neighbors = agents[agents['who'].isin(agent["six-neighbors"])]
+    neighbors = agents[agents['who'].isin(agent[NEIGHBOR_COLUMNS])]
     return neighbors
 
 
 '''
-Parse netlogo events csv and return tuple with either division or stratification events for mutants and WT cells
+Read an event log of start-event-log (report.nls) and return the dataframes of its initial and events sections:
+    initial
+    who,xcor,ycor,six-neighbors,cell-type,state,cloneid,creation-time,mutation-status,fate-bias
+    ...
+    events
+    tick,time,event,who,cell-type,state,cloneid,creation-time,mutation-status,fate-bias
+    ...
+Event logs are appended while the simulation runs, so a last line that is not completely written is skipped.
+The initial agents are sorted by who
 '''
 
+EVENT_LOG_STRING_COLUMNS = {"event": str, "cell-type": str, "state": str, "mutation-status": str}
 
-def parse_netlogo_events(csv):
-    df = pd.read_csv(csv, header=None)
 
-    mutant = {}
-    wildType = {}
+def read_netlogo_event_log(csv):
+    with open(csv) as f:
+        content = f.read()
+    content = content[:content.rfind("\n") + 1]
+    start = content.index("events\n")
+
+    initial = pd.read_csv(io.StringIO(content[content.index("\n") + 1:start]), dtype=EVENT_LOG_STRING_COLUMNS)
+    initial = initial.sort_values("who").reset_index(drop=True)
+    events = pd.read_csv(io.StringIO(content[start + len("events\n"):]), dtype=EVENT_LOG_STRING_COLUMNS)
 
-    pat = re.compile('array: ([\d\s]+)')
-    for row_index, row in df.iterrows():
-        mo = pat.findall(row[1])
-        mut = [int(n) for n in mo[0].split(' ')]
-        wt = [int(n) for n in mo[1].split(' ')]
+    return initial, events
 
-        for i in range(len(mut)):
-            mutant.setdefault(i, [])
-            wildType.setdefault(i, [])
 
-            mutant[i].append(mut[i])
-            wildType[i].append(wt[i])
+'''
+Parse netlogo event log and return, per mutation status, integer arrays of the number of divisions and
+stratifications of every week (interval [week, week + 1)) and of the fate outcomes of the divisions (AA, AB and BB
+daughters, AB includes BA), together with the time spent in the week by the cells that can divide (A cells) and
+stratify (B cells), in cell-weeks, so that counts / exposure are the effective division and stratification rates.
+Every go divides or stratifies one cell, so the lines of a division or a stratification (including their move-cell
+lines) are the lines of its tick. The mutation status of a division is the one of its daughters, the status of a
+stratification is the status of the stratified B cell, before the first line of its tick
+'''
 
-    return (mutant, wildType)
+FATE_OUTCOMES = ["AA", "AB", "BB"]
 
 
+def parse_netlogo_events(csv):
+    initial, events = read_netlogo_event_log(csv)
+    if len(events) == 0:
+        return {}
+
+    times = events["time"].to_numpy(dtype=np.float64)
+    numOfWeeks = int(times[-1]) + 1
+    weeks = times.astype(np.int64)
+    event = events["event"].to_numpy()
+    cellType = events["cell-type"].to_numpy()
+    mutationStatus = events["mutation-status"].to_numpy()
+
+    # the variables of every agent before each line: its previous line, or its initial state
+    positions = np.searchsorted(initial["who"].to_numpy(), events["who"].to_numpy())
+    order = np.lexsort((np.arange(len(events)), positions))
+    previous = np.full(len(events), -1, dtype=np.int64)
+    sameAgent = positions[order[1:]] == positions[order[:-1]]
+    previous[order[1:][sameAgent]] = order[:-1][sameAgent]
+    previousType = np.where(previous >= 0, cellType[previous], initial["cell-type"].to_numpy()[positions])
+    previousStatus = np.where(previous >= 0, mutationStatus[previous], initial["mutation-status"].to_numpy()[positions])
+
+    # the lines of a tick that are not induction lines, with the event of the go of the tick
+    tick = events["tick"].to_numpy()
+    goLines = np.isin(event, ["divide", "stratify", "move"])
+    ticks, first = np.unique(tick[goLines], return_index=True)
+    goEvent = pd.Series(np.where(event == "move", None, event)[goLines]).groupby(tick[goLines]).first()
+    goEvent = goEvent.reindex(ticks).to_numpy()
+
+    divisions = event == "divide"
+    _, firstDivision = np.unique(tick[divisions], return_index=True)
+    numOfA = np.char.count(cellType[divisions].astype(str), "A")
+    outcome = np.add.reduceat(numOfA, firstDivision) if firstDivision.size > 0 else numOfA
+    divisionStatus = mutationStatus[divisions][firstDivision]
+    divisionWeek = weeks[divisions][firstDivision]
+
+    stratifications = goEvent == "stratify"
+    stratificationStatus = previousStatus[goLines][first][stratifications]
+    stratificationWeek = weeks[goLines][first][stratifications]
+
+    counts = {}
+    statuses = set(initial["mutation-status"]) | set(mutationStatus)
+    for status in sorted(statuses):
+        statusCounts = {
+            'divisions': np.bincount(divisionWeek[divisionStatus == status], minlength=numOfWeeks),
+            'stratifications': np.bincount(stratificationWeek[stratificationStatus == status], minlength=numOfWeeks),
+        }
+        for numOfADaughters, fateOutcome in zip([2, 1, 0], FATE_OUTCOMES):
+            selected = (divisionStatus == status) & (outcome == numOfADaughters)
+            statusCounts[fateOutcome] = np.bincount(divisionWeek[selected], minlength=numOfWeeks)
+        for exposure, dividing in [('division-exposure', "A"), ('stratification-exposure', "B")]:
+            isCell = (cellType == dividing) & (mutationStatus == status)
+            wasCell = (previousType == dividing) & (previousStatus == status)
+            initialCells = np.count_nonzero((initial["cell-type"] == dividing) & (initial["mutation-status"] == status))
+            statusCounts[exposure] = get_weekly_exposure(times, initialCells + np.cumsum(isCell.astype(np.int64) - wasCell),
+                                              initialCells, numOfWeeks)
+        # empty agents (mutation status 0) never divide or stratify
+        if any(values.any() for values in statusCounts.values()):
+            counts[status] = statusCounts
+
+    return counts
+
+
+'''
+Return the integral over every week of a number of cells that is initialCells from time 0 and numOfCells[k] from
+times[k] on, up to the last time
+'''
+
+
+def get_weekly_exposure(times, numOfCells, initialCells, numOfWeeks):
+    breakpoints = np.concatenate([[0.0], times])
+    values = np.concatenate([[initialCells], numOfCells]).astype(np.float64)
+    cumulative = np.concatenate([[0.0], np.cumsum(values[:-1] * np.diff(breakpoints))])
+
+    # integral from 0 to every week boundary (the integral stops at the last time)
+    boundaries = np.minimum(np.arange(numOfWeeks + 1, dtype=np.float64), times[-1])
+    segment = np.searchsorted(breakpoints, boundaries, side='right') - 1
+    integral = cumulative[segment] + values[segment] * (boundaries - breakpoints[segment])
+
+    return np.diff(integral)
+
 
 '''
 Group agents by clone id and return dictionary with key: cloneID and value: dataframe with clone members
@@ -188,29 +399,178 @@ def get_clones(agents):
     return clones
 
 
+'''
+Summarise every clone in a single groupby pass and return dataframe indexed by clone ID with columns:
+mutation-status, singles, doubles, cells (singles + 2 * doubles) and the clone bounding box (xmin, xmax, ymin, ymax).
+Clones are listed in order of appearance, as in get_clones
+'''
+
+
+def get_clone_summary(agents):
+    # ignore clones with ID = 0 (i.e ignore empty agents and initial B agents)
+    agents = agents[agents["cloneid"] != 0]
+
+    clones = pd.DataFrame({
+        "cloneid": agents["cloneid"].to_numpy(),
+        "mutation-status": agents["mutation-status"].astype(str).to_numpy(),
+        "singles": (agents["state"] == "single").to_numpy(dtype=np.int64),
+        "doubles": (agents["state"] == "double").to_numpy(dtype=np.int64),
+        "xcor": agents["xcor"].to_numpy(),
+        "ycor": agents["ycor"].to_numpy(),
+    })
+
+    summary = clones.groupby("cloneid", sort=False).agg(**{
+        "mutation-status": ("mutation-status", "first"),
+        "singles": ("singles", "sum"),
+        "doubles": ("doubles", "sum"),
+        "xmin": ("xcor", "min"),
+        "xmax": ("xcor", "max"),
+        "ymin": ("ycor", "min"),
+        "ymax": ("ycor", "max"),
+    })
+    summary.insert(3, "cells", summary["singles"] + 2 * summary["doubles"])
+
+    return summary
+
+
+'''
+Return the grid extent [min-pxcor, max-pxcor, min-pycor, max-pycor] of a snapshot.
+Agents of even columns are shifted down by half a patch, so pycor is the ceiling of ycor
+'''
+
+
+def get_grid_extent(agents):
+    pycor = np.ceil(agents["ycor"].to_numpy())
+
+    return [int(agents["xcor"].min()), int(agents["xcor"].max()), int(pycor.min()), int(pycor.max())]
+
+
+'''
+Assign every agent to a square tile of the grid and return the tile index of every agent
+together with the number of tiles along x and y. Tiles are numbered column by column (index = x * numOfTilesY + y).
+If no tile size is given the grid is split in 10 tiles along its shortest side
+'''
+
+
+def get_tile_index(agents, tileSize=None, gridExtent=None):
+    if gridExtent is None:
+        gridExtent = get_grid_extent(agents)
+    minPxcor, maxPxcor, minPycor, maxPycor = gridExtent
+    width = maxPxcor - minPxcor + 1
+    height = maxPycor - minPycor + 1
+
+    if tileSize is None:
+        tileSize = max(1, min(width, height) // 10)
+
+    numOfTilesX = -(-width // tileSize)
+    numOfTilesY = -(-height // tileSize)
+
+    tileX = ((agents["xcor"].to_numpy() - minPxcor) // tileSize).astype(np.int64)
+    tileY = np.floor((agents["ycor"].to_numpy() + 0.5 - minPycor) / tileSize).astype(np.int64)
+
+    return tileX * numOfTilesY + tileY, numOfTilesX, numOfTilesY
+
+
+'''
+Count the cell populations of every tile of the grid in a single pass (see get_cell_counts)
+'''
+
+
+def get_tile_counts(agents, tileSize=None, gridExtent=None):
+    tiles, numOfTilesX, numOfTilesY = get_tile_index(agents, tileSize, gridExtent)
+
+    return get_cell_counts(agents, tiles, numOfTilesX * numOfTilesY)
+
+
 '''
 Segregate grid to smaller sections and return list of dataframes
 '''
 
 
-def get_grid_chunks(agents):
-    chunks = []
+def get_grid_chunks(agents, tileSize=None, gridExtent=None):
+    tiles, numOfTilesX, numOfTilesY = get_tile_index(agents, tileSize, gridExtent)
+    groups = dict(list(agents.groupby(tiles)))
+
+    return [groups.get(tile, agents.iloc[0:0]) for tile in range(numOfTilesX * numOfTilesY)]
+
+
+'''
+Number of proliferating (alpha) and differentiating (beta) cells represented by each cell type
+'''
+
+ALPHA_CELLS = {"A": 1, "AA": 2, "AB": 1, "BA": 1}
+BETA_CELLS = {"B": 1, "BB": 2, "AB": 1, "BA": 1}
+
+
+'''
+Count bincount occurrences of a categorical column per group and return (number of groups x categories) dataframe
+'''
+
 
-    # This is for square dimensional grid only
-    grid_side = int(agents.shape[0] ** (1 / 2))  # .shape[0] returns number of dataframe rows (total number of agents)
-    chunk_side = int(grid_side / 10)
+def count_categories(column, groups, numOfGroups):
+    column = column.astype("category")
+    categories = column.cat.categories
+    codes = column.cat.codes.to_numpy().astype(np.int64)
 
-    # Create chunks according to chunk_side
-    for x in range(0, grid_side, chunk_side):
-        for y in range(0, grid_side, chunk_side):
-            xmax = x + chunk_side
-            ymin = y - 0.5
-            ymax = y + chunk_side - 0.5
-            chunk = agents[
-                (agents['xcor'] >= x) & (agents['xcor'] < xmax) & (agents['ycor'] >= ymin) & (agents['ycor'] < ymax)]
-            chunks.append(chunk)
+    valid = codes >= 0
+    counts = np.bincount(groups[valid] * len(categories) + codes[valid], minlength=numOfGroups * len(categories))
 
-    return chunks
+    return pd.DataFrame(counts.reshape(numOfGroups, len(categories)), columns=categories.astype(str))
+
+
+'''
+Count all the cell populations of a group of agents in a single pass and return dataframe with one row per group
+(a single row if no groups are given) and the following columns:
+ - A, B: number of proliferating and differentiating cells
+ - D, E: number of double and empty state agents
+ - singles, doubles, cells (singles + 2 * doubles), agents
+ - one column per mutation status with the number of cells of that mutation status
+'''
+
+
+def get_cell_counts(groupOfAgents, groups=None, numOfGroups=1):
+    if groups is None:
+        groups = np.zeros(groupOfAgents.shape[0], dtype=np.int64)
+
+    cellTypes = count_categories(groupOfAgents["cell-type"], groups, numOfGroups)
+    states = count_categories(groupOfAgents["state"], groups, numOfGroups)
+
+    counts = pd.DataFrame(index=range(numOfGroups))
+    counts["A"] = sum(cellTypes.get(cellType, 0) * n for cellType, n in ALPHA_CELLS.items())
+    counts["B"] = sum(cellTypes.get(cellType, 0) * n for cellType, n in BETA_CELLS.items())
+    counts["D"] = states.get("double", 0)
+    counts["E"] = states.get("empty", 0)
+    counts["singles"] = states.get("single", 0)
+    counts["doubles"] = states.get("double", 0)
+    counts["cells"] = counts["singles"] + 2 * counts["doubles"]
+    counts["agents"] = np.bincount(groups, minlength=numOfGroups)
+
+    # cells per mutation status: singles count once and doubles twice
+    cellWeights = (groupOfAgents["state"] == "single").to_numpy(dtype=np.int64) + \
+                  2 * (groupOfAgents["state"] == "double").to_numpy(dtype=np.int64)
+    mutationStatus = groupOfAgents["mutation-status"].astype("category")
+    codes = mutationStatus.cat.codes.to_numpy().astype(np.int64)
+    for code, mt in enumerate(mutationStatus.cat.categories.astype(str)):
+        counts[mt] = np.bincount(groups[codes == code], weights=cellWeights[codes == code],
+                                 minlength=numOfGroups).astype(np.int64)
+
+    return counts
+
+
+'''
+Return the cell counts of a snapshot as a series. The counts of the last snapshot are kept,
+so that workflows processing the same snapshot share a single counting pass
+'''
+
+lastSnapshotCounts = [None, None]
+
+
+def get_snapshot_cell_counts(agents):
+    if lastSnapshotCounts[0] is None or lastSnapshotCounts[0]() is not agents:
+        lastSnapshotCounts[0] = weakref.ref(agents)
+        lastSnapshotCounts[1] = get_cell_counts(agents).iloc[0]
+
+    return lastSnapshotCounts[1]
 
 
 '''
@@ -219,10 +579,9 @@ Count number of epithelial cells for a given group of agents
 
 
 def get_num_of_cells(groupOfAgents):
-    numOfsingle = groupOfAgents[groupOfAgents["state"] == "single"].shape[0]
-    numOfdouble = groupOfAgents[groupOfAgents["state"] == "double"].shape[0]
+    states = groupOfAgents["state"].value_counts()
 
-    return numOfdouble * 2 + numOfsingle
+    return int(states.get("double", 0)) * 2 + int(states.get("single", 0))
 
 
 '''
@@ -231,40 +590,164 @@ Count cell populations
 
 
 def get_cell_populations(groupOfAgents):
-  numOfAlpha = groupOfAgents[groupOfAgents["cell-type"] == "A"].shape[0]
-  numOfAlpha += (groupOfAgents[groupOfAgents["cell-type"] == "AA"].shape[0]) * 2
-  numOfAlpha += groupOfAgents[groupOfAgents["cell-type"] == "AB"].shape[0]
-  numOfAlpha += groupOfAgents[groupOfAgents["cell-type"] == "BA"].shape[0]
+    counts = get_cell_counts(groupOfAgents).iloc[0]
+
+    return [int(counts["A"]), int(counts["B"]), int(counts["D"]), int(counts["E"])]
+
+
+'''
+Calculate rho for a given group of agents
+'''
+
+
+def get_rho(groupOfAgents):
+    counts = get_cell_counts(groupOfAgents).iloc[0]
+
+    return int(counts["A"]) / (int(counts["A"]) + int(counts["B"]))
+
+
+'''
+Return the pairs of neighboring agents as two arrays of row positions (i < j) within the given group of agents.
+Neighbors that are not part of the group are ignored
+'''
 
-  numOfBeta = groupOfAgents[groupOfAgents["cell-type"] == "B"].shape[0]
-  numOfBeta += (groupOfAgents[groupOfAgents["cell-type"] == "BB"].shape[0]) * 2
-  numOfBeta += groupOfAgents[groupOfAgents["cell-type"] == "AB"].shape[0]
-  numOfBeta += groupOfAgents[groupOfAgents["cell-type"] == "BA"].shape[0]
 
-  numOfDouble = groupOfAgents[groupOfAgents["state"] == "double"].shape[0]
+def get_neighbor_pairs(agents):
+    who = agents['who'].to_numpy()
+    neighbors = get_neighbor_matrix(agents)
+    if who.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
 
-  numOfEmpty = groupOfAgents[groupOfAgents["state"] == "empty"].shape[0]
+    # map agent IDs to row positions, -1 for agents outside the group
+    position = np.full(max(who.max(), neighbors.max()) + 1, -1, dtype=np.int64)
+    position[who] = np.arange(who.size)
 
-  return [numOfAlpha, numOfBeta, numOfDouble, numOfEmpty]
+    i = np.repeat(np.arange(who.size), neighbors.shape[1])
+    j = neighbors.ravel()
+    valid = j >= 0
+    i, j = i[valid], position[j[valid]]
+    valid = j >= 0
+    i, j = i[valid], j[valid]
+
+    # keep every pair once, regardless of the direction it was listed in
+    pairs = np.unique(np.minimum(i, j) * who.size + np.maximum(i, j))
+    i, j = pairs // who.size, pairs % who.size
+    valid = i != j
+
+    return i[valid], j[valid]
 
 
 '''
-Calculate rho for a given group of agents
+Return the neighbourhood density of every agent of a snapshot, as num-of-cells six-neighbors in the models:
+single state neighbours count as one cell and double state neighbours as two. Neighbours that are not part of the
+given agents count as empty
 '''
 
 
-def get_rho(groupOfAgents):
-    numOfAlpha = groupOfAgents[groupOfAgents["cell-type"] == "A"].shape[0]
-    numOfAlpha += (groupOfAgents[groupOfAgents["cell-type"] == "AA"].shape[0]) * 2
-    numOfAlpha += groupOfAgents[groupOfAgents["cell-type"] == "AB"].shape[0]
-    numOfAlpha += groupOfAgents[groupOfAgents["cell-type"] == "BA"].shape[0]
+def get_neighborhood_density(agents):
+    who = agents['who'].to_numpy()
+    neighbors = get_neighbor_matrix(agents)
+    if who.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    state = agents['state'].astype(str).to_numpy()
+    cells = np.where(state == "single", 1, np.where(state == "double", 2, 0))
+
+    # cells per agent ID, the last entry (index -1) is the padding of the neighbour matrix
+    cellsOfAgent = np.zeros(max(who.max(), neighbors.max()) + 2, dtype=np.int64)
+    cellsOfAgent[who] = cells
+
+    return cellsOfAgent[neighbors].sum(axis=1)
+
+
+'''
+Return the feedback bias (density-bias in the models) of every agent, given their neighbourhood density and mutation
+status and the config.nls parameters of the model (see parse_config_parameters):
+ - downstream: -delta for p53 mutants in crowded neighbourhoods (density above crowdingCutOff)
+ - upstream: fdelta below crowdingCutOff, 0 at crowdingCutOff and -fdelta above, for all cells
+ - unified: as upstream for WT and N cells, -p53delta for p53 mutants in crowded neighbourhoods
+The bias is 0 for all agents when densityBias is off
+'''
+
+
+def get_feedback_bias(density, mutationStatus, parameters):
+    density = np.asarray(density)
+    mutationStatus = np.asarray(mutationStatus).astype(str)
+    bias = np.zeros(density.size, dtype=np.float64)
+    if not parameters.get('densityBias', True):
+        return bias
+
+    crowded = density > parameters['crowdingCutOff']
+    model = parameters.get('model')
+    if model == 'downstream':
+        bias[crowded & (mutationStatus == "p53")] = -parameters['delta']
+        return bias
+
+    upstreamBias = np.sign(parameters['crowdingCutOff'] - density) * parameters['fdelta']
+    if model == 'upstream':
+        return upstreamBias.astype(np.float64)
 
-    numOfBeta = groupOfAgents[groupOfAgents["cell-type"] == "B"].shape[0]
-    numOfBeta += (groupOfAgents[groupOfAgents["cell-type"] == "BB"].shape[0]) * 2
-    numOfBeta += groupOfAgents[groupOfAgents["cell-type"] == "AB"].shape[0]
-    numOfBeta += groupOfAgents[groupOfAgents["cell-type"] == "BA"].shape[0]
+    upstreamCells = np.isin(mutationStatus, ["WT", "N"])
+    bias[upstreamCells] = upstreamBias[upstreamCells]
+    bias[crowded & (mutationStatus == "p53")] = -parameters['p53delta']
 
-    return numOfAlpha / (numOfAlpha + numOfBeta)
+    return bias
+
+
+'''
+Return the connected component label of every node of a graph given as two arrays of edge end points.
+Components are found with a vectorised union-find: roots are hooked onto the smallest neighboring root
+and paths are compressed until every node points to the root (smallest node) of its component
+'''
+
+
+def get_connected_components(numOfNodes, i, j):
+    parent = np.arange(numOfNodes)
+
+    while True:
+        pi = parent[i]
+        pj = parent[j]
+        hook = pi != pj
+        if not hook.any():
+            return parent
+
+        np.minimum.at(parent, np.maximum(pi[hook], pj[hook]), np.minimum(pi[hook], pj[hook]))
+
+        grandparent = parent[parent]
+        while not np.array_equal(grandparent, parent):
+            parent = grandparent
+            grandparent = parent[parent]
+
+
+'''
+Return dataframe indexed by clone ID with the number of connected components of every clone and if it is fragmented.
+Epithelial cells are the graph nodes: a single state agent is one cell and a double state agent is two cells (a, b)
+that are connected only through neighboring cells of the same clone. Hence a double state agent without any
+neighboring cell of its own clone counts as two components, as in get_clone_graph
+'''
+
+
+def get_clone_components(agents):
+    agents = agents[(agents["cloneid"] != 0) & agents["state"].isin(["single", "double"])]
+
+    cloneids = agents["cloneid"].to_numpy()
+    i, j = get_neighbor_pairs(agents)
+    sameClone = cloneids[i] == cloneids[j]
+    i, j = i[sameClone], j[sameClone]
+
+    labels = get_connected_components(cloneids.size, i, j)
+
+    # agents without neighbors of their own clone
+    degree = np.bincount(i, minlength=cloneids.size) + np.bincount(j, minlength=cloneids.size)
+    isolatedDouble = (degree == 0) & (agents["state"].to_numpy() == "double")
+
+    components = pd.DataFrame({"cloneid": cloneids, "label": labels, "isolated-double": isolatedDouble})
+    components = components.groupby("cloneid").agg(components=("label", "nunique"),
+                                                   isolatedDoubles=("isolated-double", "sum"))
+    components["components"] += components.pop("isolatedDoubles")
+    components["fragmented"] = components["components"] > 1
+
+    return components
 
 
 '''
@@ -273,6 +756,7 @@ Return if a clone is fragmented or not
 
 
 def is_fragmented(cloneGraph):
+    import networkx as nx
     return not nx.is_connected(cloneGraph)
 
 
@@ -284,29 +768,24 @@ Create epithelial cell adjacency list for a given clone
 def get_clone_adjacencies(cloneAgents):
     adjacencies = {}
 
-    for index, agent1 in cloneAgents.iterrows():
-        if agent1["state"] == "single":
-            adjacencies.setdefault(str(agent1["who"]), [])
-            for index, agent2 in cloneAgents.iterrows():
-                if agent2["who"] in agent1["six-neighbors"]:
-                    if agent2["state"] == "single":
-                        adjacencies[str(agent1["who"])].append(str(agent2["who"]))
-                    elif agent2["state"] == "double":
-                        adjacencies[str(agent1["who"])].append(str(agent2["who"]) + 'a')
-                        adjacencies[str(agent1["who"])].append(str(agent2["who"]) + 'b')
-        elif agent1["state"] == "double":
-            adjacencies.setdefault(str(agent1["who"]) + 'a', [])
-            adjacencies.setdefault(str(agent1["who"]) + 'b', [])
-            for index, agent2 in cloneAgents.iterrows():
-                if agent2["who"] in agent1["six-neighbors"]:
-                    if agent2["state"] == "single":
-                        adjacencies[str(agent1["who"]) + 'a'].append(agent2["who"])
-                        adjacencies[str(agent1["who"]) + 'b'].append(agent2["who"])
-                    elif agent2["state"] == "double":
-                        adjacencies[str(agent1["who"]) + 'b'].append(str(agent2["who"]) + 'a')
-                        adjacencies[str(agent1["who"]) + 'a'].append(str(agent2["who"]) + 'a')
-                        adjacencies[str(agent1["who"]) + 'a'].append(str(agent2["who"]) + 'b')
-                        adjacencies[str(agent1["who"]) + 'b'].append(str(agent2["who"]) + 'b')
+    # single state agents are one node and double state agents two nodes (a, b)
+    nodes = []
+    for who, state in zip(cloneAgents["who"], cloneAgents["state"]):
+        if state == "single":
+            nodes.append([str(who)])
+        elif state == "double":
+            nodes.append([str(who) + 'a', str(who) + 'b'])
+        else:
+            nodes.append([])
+        for node in nodes[-1]:
+            adjacencies.setdefault(node, [])
+
+    i, j = get_neighbor_pairs(cloneAgents)
+    for agent1, agent2 in zip(i, j):
+        for node in nodes[agent1]:
+            adjacencies[node].extend(nodes[agent2])
+        for node in nodes[agent2]:
+            adjacencies[node].extend(nodes[agent1])
 
     return adjacencies
 
@@ -317,6 +796,7 @@ Create clone graph
 
 
 def get_clone_graph(cloneAgents):
+    import networkx as nx
     adjacencies = get_clone_adjacencies(cloneAgents)
     graph = nx.Graph(adjacencies)
 
@@ -329,13 +809,13 @@ Create adjacency list for automaton cells (different to biological cells)
 
 
 def get_adjacencies(agents):
-    adjacencies = {}
+    nodes = [str(who) for who in agents["who"]]
+    adjacencies = {node: [] for node in nodes}
 
-    for index, agent1 in agents.iterrows():
-        adjacencies.setdefault(str(agent1["who"]), [])
-        for index, agent2 in agents.iterrows():
-            if agent2["who"] in agent1["six-neighbors"]:
-                adjacencies[str(agent1["who"])].append(str(agent2["who"]))
+    i, j = get_neighbor_pairs(agents)
+    for agent1, agent2 in zip(i, j):
+        adjacencies[nodes[agent1]].append(nodes[agent2])
+        adjacencies[nodes[agent2]].append(nodes[agent1])
 
     return adjacencies
 
@@ -346,6 +826,7 @@ Create graph for an agent list
 
 
 def get_graph(agents):
+    import networkx as nx
     adjacencies = get_adjacencies(agents)
     graph = nx.Graph(adjacencies)
 
@@ -361,11 +842,9 @@ def log(log_file, analysis_name):
 
 
 def get_mutant_percentage(groupOfAgents, mutantType):
-    groupOfmutants = groupOfAgents[groupOfAgents["mutation-status"] == mutantType]
-    numOfmutants = get_num_of_cells(groupOfmutants)
-    numOfTotalCells = get_num_of_cells(groupOfAgents)
+    counts = get_cell_counts(groupOfAgents).iloc[0]
 
-    return (numOfmutants / numOfTotalCells) * 100
+    return (int(counts.get(mutantType, 0)) / int(counts["cells"])) * 100
 
 
 def plot(d):
@@ -388,27 +867,11 @@ def plot(d):
     #     'savefig': ''
     # }
 
-    x = d['data']['x']
-    #plt.rcParams.update({'font.size': 12})
-    for label, (y, format, std, ec, fc, errormode) in d['data']['y'].items():
-        std = np.array(std)
-        plt.plot(x[label], y, format, label=label, markersize=3)
-        if std.size > 0:
-            if errormode == 'shaded':
-                plt.fill_between(x[label], y - std, y + std, alpha=0.1, edgecolor=ec, facecolor=fc, linewidth=0)
-            if errormode == 'bar':
-                plt.errorbar(x[label], y, yerr=std, linestyle="None", elinewidth=0.5, ecolor='red', capsize=3, capthick=0.5)
-                #ax.errorbar(x, means, yerr=stdev, color='red', ls='--', marker='o', capsize=5, capthick=1, ecolor='black')
-
-    plt.ylabel(d['ylabel'])
-    plt.xlabel(d['xlabel'])
-    plt.title(d['title'])
-    plt.axis()
-    if len(d['data']['y']) > 1:
-        plt.legend()
-    plt.ylim(0)
-    plt.savefig(d['savefig'], dpi=300)
-    plt.close()
+    # drawn by render.draw_lines, unchanged figures are not redrawn
+    render_figure('lines', d)
+
+
+MUTANT_TYPES = ["p53", "N"]
 
 
 def split_clones(clones):
@@ -420,12 +883,9 @@ def split_clones(clones):
         if mutation_status == "WT":
             wt.setdefault(cloneID, pd.DataFrame)
             wt[cloneID] = cloneAgents
-        if mutation_status == "p53":
-            mutants.setdefault("p53", {}).setdefault(cloneID, pd.DataFrame)
-            mutants["p53"][cloneID] = cloneAgents
-        if mutation_status == "N":
-            mutants.setdefault("N", {}).setdefault(cloneID, pd.DataFrame)
-            mutants["N"][cloneID] = cloneAgents
+        if mutation_status in MUTANT_TYPES:
+            mutants.setdefault(mutation_status, {}).setdefault(cloneID, pd.DataFrame)
+            mutants[mutation_status][cloneID] = cloneAgents
 
     return [mutants, wt]
 
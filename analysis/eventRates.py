@@ -0,0 +1,130 @@
+from essentials import *
+from pipeline import run_workflows
+from stats import get_mean_std
+
+FORMATS = {'WT': 'k-o', 'p53': 'b-o', 'N': 'r-o'}
+
+'''
+Return the names of the config.nls parameters of the division rate, stratification rate and symmetric division
+probability of the cells of a mutation status (see set-SPparameters). The downstream model has a single set of
+parameters for all the cells
+'''
+
+
+def get_rate_parameters(mutationStatus, parameters):
+    if parameters.get('model') == 'downstream':
+        return 'lambda', 'gamma', 'r'
+    if mutationStatus == "N":
+        return 'lambdaMUT', 'gammaMUT', 'rMUT'
+    return 'lambdaWT', 'gammaWT', 'rWT'
+
+
+def plot_event_statistic_per_week(valuesPerWeekPerLabel, references, formats, ylabel, title, filename, c):
+    x = {}
+    y = {}
+    for label, valuesPerWeek in valuesPerWeekPerLabel.items():
+        weeks = list(sorted(valuesPerWeek.keys()))
+
+        avg = []
+        std = []
+        for week in weeks:
+            mean, sd = get_mean_std(valuesPerWeek[week])
+            avg.append(mean)
+            std.append(sd)
+
+        x[label] = weeks
+        y[label] = (avg, formats.get(label, 'g-o'), std, 'gray', 'gray', 'shaded')
+
+    # configured values, as dashed lines over the weeks of the measured values
+    allWeeks = sorted({week for weeks in x.values() for week in weeks})
+    for label, (value, format) in references.items():
+        x[label] = allWeeks
+        y[label] = ([value] * len(allWeeks), format, [], 'gray', 'gray', 'shaded')
+
+    d = {
+        'data': {
+            'x': x,
+            'y': y,
+        },
+        'xlabel': 'Weeks',
+        'ylabel': ylabel,
+        'title': title,
+        'savefig': c['analysis_output'] + filename
+    }
+
+    plot(d)
+
+
+def get_references(mutationStatuses, parameterIndex, c):
+    references = {}
+    for mutationStatus in mutationStatuses:
+        name = get_rate_parameters(mutationStatus, c['parameters'])[parameterIndex]
+        value = c['parameters'].get(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            references[name + ' (config)'] = (value, 'r--' if name.endswith('MUT') else 'k--')
+
+    return references
+
+
+def initEventRates(c):
+    return {'divisionRatePerWeek': {}, 'stratificationRatePerWeek': {}, 'fateOutcomesPerWeek': {}}
+
+
+'''
+Effective division and stratification rates of every week of a run (number of events per cell-week of the cells
+that can divide or stratify) and frequencies of the fate outcomes of the divisions, per mutation status
+'''
+
+
+def updateEventRates(results, seed, events, c):
+    weekRange = c.get('week_range')
+
+    for mutationStatus, counts in events.items():
+        for week in range(len(counts['divisions'])):
+            if weekRange is not None and not weekRange[0] <= week <= weekRange[1]:
+                continue
+
+            for rates, numOfEvents, exposure in [
+                    (results['divisionRatePerWeek'], counts['divisions'], counts['division-exposure']),
+                    (results['stratificationRatePerWeek'], counts['stratifications'],
+                     counts['stratification-exposure'])]:
+                if exposure[week] > 0:
+                    rates.setdefault(mutationStatus, {}).setdefault(week, [])
+                    rates[mutationStatus][week].append(float(numOfEvents[week] / exposure[week]))
+
+            if counts['divisions'][week] > 0:
+                fateOutcomes = results['fateOutcomesPerWeek'].setdefault(mutationStatus, {})
+                for fateOutcome in FATE_OUTCOMES:
+                    fateOutcomes.setdefault(fateOutcome, {}).setdefault(week, [])
+                    fateOutcomes[fateOutcome][week].append(float(counts[fateOutcome][week] /
+                                                                 counts['divisions'][week]))
+
+
+def plotEventRates(results, c):
+    plot_event_statistic_per_week(results['divisionRatePerWeek'],
+                                  get_references(results['divisionRatePerWeek'].keys(), 0, c), FORMATS,
+                                  'Divisions per progenitor (A) cell per week', "Effective division rate",
+                                  "division_rate_per_week_std.png", c)
+    plot_event_statistic_per_week(results['stratificationRatePerWeek'],
+                                  get_references(results['stratificationRatePerWeek'].keys(), 1, c), FORMATS,
+                                  'Stratifications per differentiating (B) cell per week',
+                                  "Effective stratification rate", "stratification_rate_per_week_std.png", c)
+
+    # the symmetric division probability is the expected frequency of AA and of BB divisions without fate bias
+    for mutationStatus, fateOutcomes in results['fateOutcomesPerWeek'].items():
+        plot_event_statistic_per_week(fateOutcomes, get_references([mutationStatus], 2, c),
+                                      {'AA': 'b-o', 'AB': 'g-o', 'BB': 'm-o'}, 'Proportion of divisions',
+                                      "Division fate outcomes of " + mutationStatus + " cells",
+                                      mutationStatus + "_fate_outcomes_per_week_std.png", c)
+
+
+eventRatesWorkflow = {
+    'name': 'eventRates',
+    'init': initEventRates,
+    'events': updateEventRates,
+    'plot': plotEventRates,
+}
+
+
+def eventRatesPerWeek(c, options):
+    run_workflows(c, options, [eventRatesWorkflow])
@@ -0,0 +1,159 @@
+import cProfile
+import datetime
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+'''
+Instrumentation of the analysis. When c['metrics'] is set (see start_metrics), every stage of a run (updating the
+catalogue and the snapshot store, reading every snapshot of every world file, the update of every
+workflow with every snapshot, saving, plotting and rendering) appends one JSON line to the metrics file, with the
+wall and CPU time of the stage, the peak resident set size of the process so far and the counts of the stage (files,
+rows, figures). Worker processes append their own lines to the same file, so the stages of the world files analysed
+with -j N are recorded as well. The lines of a run share its run id, and print_metrics_summary prints a table of the
+stages of the run. The metrics are not recorded when c['metrics'] is None
+'''
+
+METRICS_FILE = "metrics.jsonl"
+
+# open metrics files of this process, by (process id, path): forked workers open their own
+metricsFiles = {}
+
+
+def get_max_rss():
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxRss if sys.platform == 'darwin' else maxRss * 1024
+
+
+def write_metrics(metrics, record):
+    key = (os.getpid(), metrics['file'])
+    if key not in metricsFiles:
+        # line buffered, so that every record is a single append and the lines of the workers are not interleaved
+        metricsFiles[key] = open(metrics['file'], 'a', buffering=1)
+    metricsFiles[key].write(json.dumps(record) + "\n")
+
+
+def record_stage(c, stage, start, **fields):
+    metrics = c.get('metrics')
+    if metrics is None:
+        return
+    wall, cpu = start
+    write_metrics(metrics, dict({'run': metrics['run'], 'pid': os.getpid(), 'stage': stage}, **fields,
+                                wall=time.perf_counter() - wall, cpu=time.process_time() - cpu,
+                                max_rss_bytes=get_max_rss()))
+
+
+def start_stage():
+    return time.perf_counter(), time.process_time()
+
+
+'''
+Record the time of the stage run in the with block. The fields yielded can be updated with the counts of the stage
+'''
+
+
+@contextmanager
+def measure_stage(c, stage, **fields):
+    start = start_stage()
+    try:
+        yield fields
+    except BaseException:
+        fields['failed'] = True
+        raise
+    finally:
+        record_stage(c, stage, start, **fields)
+
+
+'''
+Yield the (week, agents) snapshots, recording the time to read (parse, load from the cache or the store, or replay)
+every snapshot and its number of rows as a 'read' stage
+'''
+
+
+def measure_snapshots(c, snapshots, **fields):
+    if c.get('metrics') is None:
+        yield from snapshots
+        return
+
+    snapshots = iter(snapshots)
+    while True:
+        start = start_stage()
+        try:
+            week, agents = next(snapshots)
+        except StopIteration:
+            return
+        record_stage(c, 'read', start, week=week, rows=len(agents), **fields)
+        yield week, agents
+
+
+def start_metrics(path):
+    run = datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '-' + str(os.getpid())
+    return {'file': path, 'run': run}
+
+
+def read_metrics(metrics):
+    records = []
+    with open(metrics['file']) as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('run') == metrics['run']:
+                records.append(record)
+
+    return records
+
+
+'''
+Print the number of records, total wall and CPU time, rows and largest peak RSS of every stage (and workflow) of the
+run. The time of the stages of worker processes is summed over the workers
+'''
+
+
+def print_metrics_summary(metrics, file=sys.stdout):
+    for key in [key for key in metricsFiles if key[1] == metrics['file']]:
+        metricsFiles.pop(key).close()
+
+    summary = {}
+    for record in read_metrics(metrics):
+        key = (record['stage'], record.get('workflow', ''))
+        stage = summary.setdefault(key, {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'rows': 0, 'max_rss_bytes': 0})
+        stage['count'] += 1
+        stage['wall'] += record['wall']
+        stage['cpu'] += record['cpu']
+        stage['rows'] += record.get('rows', 0)
+        stage['max_rss_bytes'] = max(stage['max_rss_bytes'], record['max_rss_bytes'])
+
+    print(f"{'stage':<12} {'workflow':<24} {'count':>7} {'wall (s)':>10} {'cpu (s)':>10} {'rows':>12} "
+          f"{'max RSS (MiB)':>14}", file=file)
+    for (stage, workflow), values in summary.items():
+        print(f"{stage:<12} {workflow:<24} {values['count']:>7} {values['wall']:>10.3f} {values['cpu']:>10.3f} "
+              f"{values['rows']:>12} {values['max_rss_bytes'] / 2 ** 20:>14.1f}", file=file)
+    print(f"metrics of run {metrics['run']} in {metrics['file']}", file=file)
+
+
+'''
+Profile the with block with cProfile and write the statistics to path (read them with pstats or snakeviz).
+Only the main process is profiled
+'''
+
+
+@contextmanager
+def profiling(path):
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"profile written to {path}")
@@ -1,16 +1,22 @@
-import matplotlib.pyplot as plt
-plt.switch_backend('agg')
-from averageCloneSize import *
-from mutantProportion import *
-from cellDensity import *
-from rho import *
-from cloneSizeDistribution import *
-from cellPopulations import *
+import os
+from arguments import parse_arguments
+from workflows import load_workflows
+from instrumentation import METRICS_FILE, start_metrics, measure_stage, print_metrics_summary, profiling
 
 
 def main():
     # options = parse_command_line_arguments(sys.argv[1:])
     options = parse_arguments()
+    with profiling(options.profile):
+        analyse(options)
+
+
+def analyse(options):
+    # the analysis modules are imported once the arguments are parsed, and only those of the selected workflows
+    from essentials import parse_config_files, parse_config_parameters
+    from pipeline import run_workflows, watch_workflows, get_world_files
+    from store import update_snapshot_store
+
     # analysisToRun = options['analysisToRun']
     analysisToRun = options.analysis
 
@@ -19,32 +25,42 @@ def main():
     netlogo_config = os.path.join(netlogo_model_dir, "config.nls")
 
     log_file = os.path.join(netlogo_model_dir, "log")
+    metrics = start_metrics(os.path.join(netlogo_model_dir, METRICS_FILE)) if options.metrics else None
     c = parse_config_files(netlogo_config)
+    c['netlogo_config'] = netlogo_config
+    c['parameters'] = parse_config_parameters(netlogo_config)
+    c['metrics'] = metrics
+    c['week_range'] = options.weeks
+    c['seed_range'] = options.seeds
     c['netlogo_output'] = os.path.join(netlogo_model_dir, "netlogo_output", "worlds/")
+    c['netlogo_snapshots'] = os.path.join(netlogo_model_dir, "netlogo_output", "snapshots/")
+    c['netlogo_events'] = os.path.join(netlogo_model_dir, "netlogo_output", "events/")
     c['analysis_output'] = os.path.join(netlogo_model_dir, "analysis_output/")
+    c['tile_size'] = options.tile_size
+    gridExtent = [options.min_pxcor, options.max_pxcor, options.min_pycor, options.max_pycor]
+    c['grid_extent'] = None if None in gridExtent else gridExtent
+    c['world_cache'] = None if options.no_cache else os.path.join(netlogo_model_dir, "netlogo_output", "worlds_cache/")
+    c['snapshot_store'] = None
 
-    if 'averageCloneSize' in analysisToRun:
-        avgCloneSizePerWeek(c, options)
-        log(log_file, 'averageCloneSize')
-
-    if 'cellPopulations' in analysisToRun:
-        mutantPercentagePerWeek(c, options)
-        log(log_file, 'mutantPercentage')
-        cellPopulationsPerWeek(c, options)
-        log(log_file, 'cellPopulations')
-
-    if 'cellDensity' in analysisToRun:
-        cellDensityPerWeek(c, options)
-        log(log_file, 'cellDensity')
-
-    if 'rho' in analysisToRun:
-        rhoPerWeek(c, options)
-        log(log_file, 'rho')
+    # consolidate the world files into the memory mapped snapshot store, which replaces the per-file cache
+    if options.store:
+        c['snapshot_store'] = os.path.join(netlogo_model_dir, "netlogo_output", "store/")
+        if options.var != 'use':
+            worldFiles = get_world_files(dict(c, week_range=None, seed_range=None))
+            with measure_stage(c, 'store', files=len(worldFiles)):
+                update_snapshot_store(c, worldFiles)
 
-    if 'cloneSizeDistribution' in analysisToRun:
-        cloneSizeDistributionPerWeek(c, options)
-        log(log_file, 'cloneSizeDistribution')
+    # every world csv is parsed once and shared by all the selected workflows
+    workflows = load_workflows(analysisToRun)
 
+    try:
+        if options.var == 'watch':
+            watch_workflows(c, options, workflows, log_file)
+        else:
+            run_workflows(c, options, workflows, log_file)
+    finally:
+        if metrics is not None:
+            print_metrics_summary(metrics)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,5 @@
 from essentials import *
-import os
+from pipeline import run_workflows
 
 
 def plot_mutant_percentage_per_week(mutantPercentagePerWeek, c):
@@ -32,26 +32,33 @@ def plot_mutant_percentage_per_week(mutantPercentagePerWeek, c):
         plot(d)
 
 
-def mutantPercentagePerWeek(c, options):
-    mutantPercentagePerWeek = {}
+def initMutantPercentage(c):
+    return {'mutantPercentagePerWeek': {}}
+
+
+def updateMutantPercentage(results, week, agents, c):
+    mutantPercentagePerWeek = results['mutantPercentagePerWeek']
 
-    if options.var == 'use':
-        mutantPercentagePerWeek = readVariableFromDisk('mutantPercentagePerWeek', c)
-    else:
-        for filename in os.listdir(c['netlogo_output']):
-            [week, seed] = re.findall(r"[-]?\d+|\d+", filename)
+    mutantTypes = agents["mutation-status"].unique()
+    counts = get_snapshot_cell_counts(agents)
 
-            week = int(week)
-            agents = parse_netlogo_world(c['netlogo_output'] + filename)
+    for mt in mutantTypes:
+        if mt != "0":  # Ignore empties
+            mutantPercentagePerWeek.setdefault(mt, {}).setdefault(week, [])
+            mutantPercentagePerWeek[mt][week].append((int(counts[mt]) / int(counts["cells"])) * 100)
 
-            mutantTypes = agents["mutation-status"].unique()
 
-            for mt in mutantTypes:
-                if mt != "0":  # Ignore empties
-                    mutantPercentagePerWeek.setdefault(mt, {}).setdefault(week, [])
-                    mutantPercentagePerWeek[mt][week].append(get_mutant_percentage(agents, mt))
+def plotMutantPercentage(results, c):
+    plot_mutant_percentage_per_week(results['mutantPercentagePerWeek'], c)
 
-    if options.var == 'save':
-        writeVariableToDisk(mutantPercentagePerWeek, 'mutantPercentagePerWeek', c)
 
-    plot_mutant_percentage_per_week(mutantPercentagePerWeek, c)
+mutantPercentageWorkflow = {
+    'name': 'mutantPercentage',
+    'init': initMutantPercentage,
+    'update': updateMutantPercentage,
+    'plot': plotMutantPercentage,
+}
+
+
+def mutantPercentagePerWeek(c, options):
+    run_workflows(c, options, [mutantPercentageWorkflow])
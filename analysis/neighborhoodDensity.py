@@ -0,0 +1,92 @@
+from essentials import *
+from pipeline import run_workflows
+from stats import IntegerHistogram, get_mean_std
+
+
+def plot_neighborhood_statistic_per_week(statisticPerWeek, ylabel, title, filename, c):
+    formats = {'WT': 'k-o', 'p53': 'b-o', 'N': 'r-o'}
+
+    x = {}
+    y = {}
+    for label, valuesPerWeek in statisticPerWeek.items():
+        weeks = list(sorted(valuesPerWeek.keys()))
+
+        avg = []
+        std = []
+        for week in weeks:
+            mean, sd = get_mean_std(valuesPerWeek[week])
+            avg.append(mean)
+            std.append(sd)
+
+        x[label] = weeks
+        y[label] = (avg, formats.get(label, 'g-o'), std, 'gray', 'gray', 'shaded')
+
+    d = {
+        'data': {
+            'x': x,
+            'y': y,
+        },
+        'xlabel': 'Weeks',
+        'ylabel': ylabel,
+        'title': title,
+        'savefig': c['analysis_output'] + filename
+    }
+
+    plot(d)
+
+
+'''
+Calculate the quantities that drive the density feedback of the models for every cell of a snapshot, per mutation
+status: the neighbourhood density (num-of-cells six-neighbors), if the neighbourhood is crowded (density above
+crowdingCutOff) and the resulting feedback bias. Empty agents are not cells and are left out
+'''
+
+
+def get_neighborhood_feedback(agents, parameters):
+    density = get_neighborhood_density(agents)
+    occupied = agents["state"].isin(["single", "double"]).to_numpy()
+    mutationStatus = agents["mutation-status"].astype(str).to_numpy()[occupied]
+    density = density[occupied]
+
+    feedback = pd.DataFrame({"mutation-status": mutationStatus, "density": density,
+                             "crowded": density > parameters['crowdingCutOff'],
+                             "feedback-bias": get_feedback_bias(density, mutationStatus, parameters)})
+
+    return feedback
+
+
+def initNeighborhoodDensity(c):
+    return {'neighborhoodDensityPerWeek': {}, 'crowdedPerWeek': {}, 'feedbackBiasPerWeek': {}}
+
+
+def updateNeighborhoodDensity(results, week, agents, c):
+    feedback = get_neighborhood_feedback(agents, c['parameters'])
+
+    for mutationStatus, cells in feedback.groupby("mutation-status"):
+        results['neighborhoodDensityPerWeek'].setdefault(mutationStatus, {}).setdefault(week, IntegerHistogram())
+        results['neighborhoodDensityPerWeek'][mutationStatus][week].extend(cells["density"].to_numpy())
+        results['crowdedPerWeek'].setdefault(mutationStatus, {}).setdefault(week, [])
+        results['crowdedPerWeek'][mutationStatus][week].append(float(cells["crowded"].mean()))
+        results['feedbackBiasPerWeek'].setdefault(mutationStatus, {}).setdefault(week, [])
+        results['feedbackBiasPerWeek'][mutationStatus][week].append(float(cells["feedback-bias"].mean()))
+
+
+def plotNeighborhoodDensity(results, c):
+    plot_neighborhood_statistic_per_week(results['neighborhoodDensityPerWeek'], 'Number of neighbouring cells',
+                                         "Neighbourhood cell density", "neighbourhood_density_std.png", c)
+    plot_neighborhood_statistic_per_week(results['crowdedPerWeek'], 'Proportion of cells',
+                                         "Cells in crowded neighbourhoods", "crowded_neighbourhoods_std.png", c)
+    plot_neighborhood_statistic_per_week(results['feedbackBiasPerWeek'], 'Average feedback bias',
+                                         "Density feedback bias", "feedback_bias_std.png", c)
+
+
+neighborhoodDensityWorkflow = {
+    'name': 'neighborhoodDensity',
+    'init': initNeighborhoodDensity,
+    'update': updateNeighborhoodDensity,
+    'plot': plotNeighborhoodDensity,
+}
+
+
+def neighborhoodDensityPerWeek(c, options):
+    run_workflows(c, options, [neighborhoodDensityWorkflow])
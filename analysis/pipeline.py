@@ -0,0 +1,456 @@
+from essentials import *
+from store import open_snapshot_store
+from replay import parse_netlogo_run, is_event_log
+from catalogue import open_catalogue, update_catalogue, query_world_files
+from render import rendering_stage
+from instrumentation import measure_stage, measure_snapshots
+from concurrent.futures import ProcessPoolExecutor
+import os
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+
+'''
+Workflows are described by a dictionary with the following keys:
+    'name': name of the workflow (used for logging)
+    'init': function(c) returning a dictionary of empty result variables (keys are the names of the pickled files)
+    'update': function(results, week, agents, c) adding the contribution of a single world snapshot to the results
+    'plot': function(results, c) producing the output plots
+Workflows that analyse the divisions and stratifications of the event logs (see parse_netlogo_events) have an
+'events' key instead of, or besides, 'update':
+    'events': function(results, seed, events, c) adding the contribution of the event log of a run to the results
+'''
+
+
+'''
+Load the result variables of a workflow from previous runs
+'''
+
+
+def read_workflow_results(workflow, c):
+    results = workflow['init'](c)
+    for variableName in results.keys():
+        results[variableName] = readVariableFromDisk(variableName, c)
+
+    return results
+
+
+'''
+Save the result variables of a workflow
+'''
+
+
+def write_workflow_results(workflow, results, c):
+    for variableName, variable in results.items():
+        writeVariableToDisk(variable, variableName, c)
+
+
+'''
+Merge the result variables computed from one group of world snapshots into the results of another group.
+Dictionaries are merged key by key, lists are concatenated and streaming statistics (see stats.py) are merged,
+so merging per-file results in file order reproduces the results of processing the files serially
+'''
+
+
+def merge_results(results, other):
+    for key, value in other.items():
+        if key not in results:
+            results[key] = value
+        elif isinstance(value, dict):
+            merge_results(results[key], value)
+        elif isinstance(value, list):
+            results[key].extend(value)
+        elif hasattr(value, 'merge'):
+            results[key].merge(value)
+        else:
+            raise TypeError(f'cannot merge result variable {key} of type {type(value).__name__}')
+
+    return results
+
+
+'''
+Return the list of [week, seed, path] of the netlogo world csv files, ordered by week and seed, followed by the
+snapshot files of get-snapshot (netlogo_output/snapshots/<model>_<seed>.csv) and the event logs of start-event-log
+(netlogo_output/events/<model>_<seed>.csv, see replay.py), which contain every week of a run and are listed with
+week None. Event logs are only analysed by the workflows with an 'events' key (see get_file_workflows). Files are
+listed from the catalogue (see catalogue.py), restricted to the c['week_range'] and c['seed_range'] (first, last)
+ranges when these are given
+'''
+
+
+def get_world_files(c):
+    with measure_stage(c, 'catalogue') as stage:
+        connection = open_catalogue(c)
+        try:
+            update_catalogue(c, connection)
+            worldFiles = query_world_files(connection, c.get('week_range'), c.get('seed_range'))
+        finally:
+            connection.close()
+        stage['files'] = len(worldFiles)
+
+    return worldFiles
+
+
+'''
+Yield (week, agents) for every world snapshot stored in a world file or a snapshot file.
+Files that are in the snapshot store (see store.py) are read from the store instead of being parsed
+'''
+
+
+def get_world_snapshots(worldFile, c):
+    week, seed, path = worldFile
+    if c.get('snapshot_store') is not None:
+        store = open_snapshot_store(c['snapshot_store'])
+        if store.contains(path):
+            for week, agents in store.get_snapshots(path, c.get('week_range')):
+                yield week, agents
+            return
+
+    if week is None:
+        for week, agents in parse_netlogo_run(path, c.get('week_range')):
+            yield week, agents
+    else:
+        yield week, load_netlogo_world(path, c.get('world_cache'))
+
+
+'''
+Return the workflows that analyse a world file. Event logs are only analysed by the workflows with an 'events' key,
+every other file by the workflows with an 'update' key: the snapshots of a run with an event log are analysed from
+its world or snapshot files, so they are not counted twice
+'''
+
+
+def is_event_log_file(worldFile):
+    week, seed, path = worldFile
+    return week is None and is_event_log(path)
+
+
+def get_file_workflows(worldFile, workflows):
+    key = 'events' if is_event_log_file(worldFile) else 'update'
+    return [workflow for workflow in workflows if key in workflow]
+
+
+'''
+Add the contribution of a world file to the results of the workflows that analyse it (see get_file_workflows): its
+snapshots, or the events of an event log. Files are only read if a workflow uses them
+'''
+
+
+def update_workflow_results(results, worldFile, workflows, c):
+    week, seed, path = worldFile
+    with measure_stage(c, 'file', file=os.path.basename(path), week=week, seed=seed) as stage:
+        if is_event_log_file(worldFile):
+            eventWorkflows = get_file_workflows(worldFile, workflows)
+            if eventWorkflows:
+                with measure_stage(c, 'read-events', seed=seed):
+                    events = parse_netlogo_events(path)
+            for workflow in eventWorkflows:
+                with measure_stage(c, 'events', workflow=workflow['name'], seed=seed):
+                    workflow['events'](results[workflow['name']], seed, events, c)
+            return
+
+        snapshotWorkflows = get_file_workflows(worldFile, workflows)
+        if snapshotWorkflows:
+            stage['snapshots'] = 0
+            for week, agents in measure_snapshots(c, get_world_snapshots(worldFile, c), seed=seed):
+                stage['snapshots'] += 1
+                for workflow in snapshotWorkflows:
+                    with measure_stage(c, 'update', workflow=workflow['name'], week=week, seed=seed,
+                                       rows=len(agents)):
+                        workflow['update'](results[workflow['name']], week, agents, c)
+
+
+'''
+Parse a single world file and return the results of every workflow for its snapshots only
+'''
+
+
+def process_world_file(worldFile, workflows, c):
+    fileResults = {}
+    for workflow in workflows:
+        fileResults[workflow['name']] = workflow['init'](c)
+
+    update_workflow_results(fileResults, worldFile, workflows, c)
+
+    return fileResults
+
+
+'''
+Yield the results of every workflow for each of the given world files, in file order.
+With jobs > 1 the world files are processed by a pool of worker processes
+'''
+
+
+def get_file_results(worldFiles, workflows, c, jobs=1):
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = max(1, len(worldFiles) // (jobs * 4))
+            yield from executor.map(process_world_file, worldFiles, [workflows] * len(worldFiles),
+                                    [c] * len(worldFiles), chunksize=chunksize)
+    else:
+        for worldFile in worldFiles:
+            yield process_world_file(worldFile, workflows, c)
+
+
+'''
+Incremental analysis: the results of a workflow for every world file are kept as partial results in
+analysis_output/partials/<workflow name>/, together with a manifest of the processed world files with their
+size and modification time, week and seed. Only new or changed world files are analysed and their partial results are merged
+into the saved results of the workflow. If a world file that was already processed has changed, the results
+are rebuilt from the partial results, merged in the order of a full run (see query_world_files) so that the rebuilt
+results are the same. World files that were deleted after being processed are kept
+'''
+
+
+def get_partials_dir(workflow, c):
+    return os.path.join(c['analysis_output'], "partials", workflow['name'])
+
+
+def read_partial(variableName, workflow, c):
+    with open(os.path.join(get_partials_dir(workflow, c), variableName + ".pkl"), 'rb') as fh:
+        return pickle.load(fh)
+
+
+def write_partial(variable, variableName, workflow, c):
+    partials_dir = get_partials_dir(workflow, c)
+    os.makedirs(partials_dir, exist_ok=True)
+
+    # write to a temporary file first, so that an interrupted run never leaves a truncated file behind
+    tmp_file = os.path.join(partials_dir, variableName + ".tmp")
+    with open(tmp_file, 'wb') as fh:
+        pickle.dump(variable, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, os.path.join(partials_dir, variableName + ".pkl"))
+
+
+# event logs have the file names of the snapshot files of their runs
+def get_partial_name(worldFile):
+    week, seed, path = worldFile
+    return ("events-" if is_event_log_file(worldFile) else "") + os.path.basename(path)
+
+
+def read_manifest(workflow, c):
+    try:
+        return read_partial("manifest", workflow, c)
+    except FileNotFoundError:
+        return {}
+
+
+# world files by week and seed, then the files of whole runs by seed, as listed by get_world_files
+def get_merge_order(manifest):
+    def order(filename):
+        week, seed = manifest[filename].get('week'), manifest[filename].get('seed')
+        return week is None, week or 0, seed or 0, filename
+
+    return sorted(manifest.keys(), key=order)
+
+
+def update_workflows(c, workflows, jobs=1, worldFiles=None):
+    if worldFiles is None:
+        worldFiles = get_world_files(c)
+
+    keys = {path: get_world_cache_key(path) for week, seed, path in worldFiles}
+    names = {worldFile[2]: get_partial_name(worldFile) for worldFile in worldFiles}
+    fileWorkflows = {worldFile[2]: get_file_workflows(worldFile, workflows) for worldFile in worldFiles}
+    manifests = {workflow['name']: read_manifest(workflow, c) for workflow in workflows}
+
+    def is_processed(workflow, path):
+        entry = manifests[workflow['name']].get(names[path])
+        return entry is not None and entry.get('key') == keys[path]
+
+    newFiles = [worldFile for worldFile in worldFiles
+                if not all(is_processed(workflow, worldFile[2]) for workflow in fileWorkflows[worldFile[2]])]
+
+    # start from the saved results, unless they have to be rebuilt from the partial results
+    results = {}
+    for workflow in workflows:
+        manifest = manifests[workflow['name']]
+        changed = any(names[path] in manifest and not is_processed(workflow, path)
+                      for week, seed, path in newFiles)
+        results[workflow['name']] = None
+        if manifest and not changed:
+            try:
+                results[workflow['name']] = read_workflow_results(workflow, c)
+            except FileNotFoundError:
+                pass
+
+    with measure_stage(c, 'analysis', files=len(newFiles)):
+        for worldFile, fileResults in zip(newFiles, get_file_results(newFiles, workflows, c, jobs)):
+            filename = names[worldFile[2]]
+            for workflow in fileWorkflows[worldFile[2]]:
+                if is_processed(workflow, worldFile[2]):
+                    continue
+                write_partial(fileResults[workflow['name']], filename, workflow, c)
+                manifests[workflow['name']][filename] = {'key': keys[worldFile[2]], 'week': worldFile[0],
+                                                         'seed': worldFile[1]}
+                if results[workflow['name']] is not None:
+                    merge_results(results[workflow['name']], fileResults[workflow['name']])
+
+    for workflow in workflows:
+        manifest = manifests[workflow['name']]
+        if results[workflow['name']] is None:
+            with measure_stage(c, 'rebuild', workflow=workflow['name'], files=len(manifest)):
+                results[workflow['name']] = workflow['init'](c)
+                for filename in get_merge_order(manifest):
+                    merge_results(results[workflow['name']], read_partial(filename, workflow, c))
+
+        with measure_stage(c, 'save', workflow=workflow['name']):
+            write_partial(manifest, "manifest", workflow, c)
+            write_workflow_results(workflow, results[workflow['name']], c)
+
+    return results, newFiles
+
+
+'''
+Parse every netlogo world csv once and pass the parsed agents to all the selected workflows.
+With jobs > 1 the world files are processed by a pool of worker processes and the per-file results
+are merged in file order, giving the same results as the serial run.
+With the 'update' option only new or changed world files are analysed (see update_workflows)
+'''
+
+
+def run_workflows(c, options, workflows, log_file=None):
+    results = {}
+    jobs = getattr(options, 'jobs', 1)
+
+    if options.var == 'use':
+        for workflow in workflows:
+            with measure_stage(c, 'load', workflow=workflow['name']):
+                results[workflow['name']] = read_workflow_results(workflow, c)
+    elif options.var == 'update':
+        results, newFiles = update_workflows(c, workflows, jobs)
+    else:
+        for workflow in workflows:
+            results[workflow['name']] = workflow['init'](c)
+
+        worldFiles = get_world_files(c)
+
+        with measure_stage(c, 'analysis', files=len(worldFiles)):
+            if jobs > 1:
+                for fileResults in get_file_results(worldFiles, workflows, c, jobs):
+                    for workflow in workflows:
+                        merge_results(results[workflow['name']], fileResults[workflow['name']])
+            else:
+                for worldFile in worldFiles:
+                    update_workflow_results(results, worldFile, workflows, c)
+
+    # the figures of all the workflows are rendered together, see render.py
+    with measure_stage(c, 'render') as stage:
+        with rendering_stage(jobs) as figures:
+            for workflow in workflows:
+                if options.var == 'save':
+                    with measure_stage(c, 'save', workflow=workflow['name']):
+                        write_workflow_results(workflow, results[workflow['name']], c)
+
+                with measure_stage(c, 'plot', workflow=workflow['name']):
+                    workflow['plot'](results[workflow['name']], c)
+
+                if log_file is not None:
+                    log(log_file, workflow['name'])
+        stage.update(figures)
+
+    return results
+
+
+'''
+Watch mode: analyse the world files while the simulations are still exporting them.
+The netlogo_output/worlds, netlogo_output/snapshots and netlogo_output/events directories are scanned every poll
+interval, or as soon as a file system notification arrives when the watchdog package is installed. A world file is
+complete once its size and modification time have not changed between two scans and it has not been modified for
+WORLD_FILE_SETTLE_TIME seconds. Complete files are added to the saved results with update_workflows and the plots
+are redrawn
+'''
+
+WORLD_FILE_SETTLE_TIME = 1.0
+
+
+def watch_world_files(paths, wakeUp):
+    if Observer is None:
+        return None
+
+    class WorldFilesHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            wakeUp.set()
+
+    observer = Observer()
+    for path in paths:
+        observer.schedule(WorldFilesHandler(), path)
+    observer.start()
+
+    return observer
+
+
+def get_complete_world_files(c, lastKeys):
+    completeFiles = []
+    incompleteFiles = []
+    keys = {}
+    for week, seed, path in get_world_files(c):
+        try:
+            keys[path] = get_world_cache_key(path)
+        except FileNotFoundError:
+            continue
+        if keys[path] == lastKeys.get(path) and time.time() - keys[path]['mtime'] / 1e9 >= WORLD_FILE_SETTLE_TIME:
+            completeFiles.append([week, seed, path])
+        else:
+            incompleteFiles.append([week, seed, path])
+
+    return completeFiles, incompleteFiles, keys
+
+
+def watch_workflows(c, options, workflows, log_file=None):
+    jobs = getattr(options, 'jobs', 1)
+    pollInterval = getattr(options, 'poll_interval', 5.0)
+    idleTimeout = getattr(options, 'idle_timeout', None)
+
+    paths = [path for path in [c['netlogo_output'], c.get('netlogo_snapshots'), c.get('netlogo_events')]
+             if path is not None]
+    for path in paths:
+        os.makedirs(path, exist_ok=True)
+    wakeUp = threading.Event()
+    observer = watch_world_files(paths, wakeUp)
+    print("Watching " + ", ".join(paths) + (" (polling)" if observer is None else ""))
+
+    lastKeys = {}
+    ingestedKeys = {}
+    lastIngestion = time.time()
+    try:
+        while idleTimeout is None or time.time() - lastIngestion < idleTimeout:
+            completeFiles, incompleteFiles, lastKeys = get_complete_world_files(c, lastKeys)
+            completeFiles = [worldFile for worldFile in completeFiles
+                             if ingestedKeys.get(worldFile[2]) != lastKeys[worldFile[2]]]
+
+            if completeFiles:
+                results, newFiles = update_workflows(c, workflows, jobs, completeFiles)
+                with measure_stage(c, 'render') as stage:
+                    with rendering_stage(jobs) as figures:
+                        for workflow in workflows:
+                            # plots may need weeks that have not been exported yet
+                            try:
+                                with measure_stage(c, 'plot', workflow=workflow['name']):
+                                    workflow['plot'](results[workflow['name']], c)
+                            except (KeyError, IndexError, ValueError) as e:
+                                print(f"{workflow['name']}: plots not updated ({type(e).__name__}: {e})")
+                    stage.update(figures)
+                if log_file is not None:
+                    log(log_file, f'watch ({len(completeFiles)} world files)')
+
+                lastIngestion = time.time()
+                for week, seed, path in completeFiles:
+                    ingestedKeys[path] = lastKeys[path]
+                    # snapshot files and event logs are still appended by the running simulation, so they are never
+                    # deleted
+                    if getattr(options, 'delete_ingested', False) and week is not None:
+                        os.remove(path)
+
+            # files that are still being exported are checked again as soon as they may have settled
+            wakeUp.wait(WORLD_FILE_SETTLE_TIME if incompleteFiles else pollInterval)
+            wakeUp.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
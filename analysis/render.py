@@ -0,0 +1,194 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+'''
+Rendering of the analysis figures. A figure is described by the name of its renderer and a picklable dictionary of
+its data, labels and output file ('savefig'), and is drawn with matplotlib's object oriented API (no pyplot state),
+so figures can be rendered in worker processes.
+Every rendered figure is recorded in figures.json next to it with a hash of its description and of the source of its
+renderer. A figure whose hash is unchanged and whose file exists is not rendered again, while a change of the data
+or of the style of a renderer redraws only the figures concerned.
+Within a rendering_stage, figures are collected and rendered together at the end of the stage, in a process pool
+when more than one job is given. This module does not import essentials, so that essentials can use it, and
+matplotlib is only imported when a figure is drawn
+'''
+
+FIGURE_DPI = 300
+FIGURE_CACHE = "figures.json"
+
+
+'''
+Line plots with optional shaded or bar errors, see essentials.plot for the description of d
+'''
+
+
+def draw_lines(fig, d):
+    ax = fig.subplots()
+    x = d['data']['x']
+    for label, (y, format, std, ec, fc, errormode) in d['data']['y'].items():
+        std = np.array(std)
+        ax.plot(x[label], y, format, label=label, markersize=3)
+        if std.size > 0:
+            if errormode == 'shaded':
+                ax.fill_between(x[label], y - std, y + std, alpha=0.1, edgecolor=ec, facecolor=fc, linewidth=0)
+            if errormode == 'bar':
+                ax.errorbar(x[label], y, yerr=std, linestyle="None", elinewidth=0.5, ecolor='red', capsize=3,
+                            capthick=0.5)
+
+    ax.set_ylabel(d['ylabel'])
+    ax.set_xlabel(d['xlabel'])
+    ax.set_title(d['title'])
+    if len(d['data']['y']) > 1:
+        ax.legend()
+    ax.set_ylim(0)
+
+
+'''
+2 x 2 grid of histograms. d['panels'] is a list of (title, bin edges, counts)
+'''
+
+
+def draw_histograms(fig, d):
+    ax = fig.subplots(nrows=2, ncols=2, sharex=True, sharey=True)
+    fig.suptitle(d['title'])
+
+    for a, (title, edges, counts) in zip(ax.flat, d['panels']):
+        a.hist(edges[:-1], bins=edges, weights=counts, edgecolor='gray')
+        a.set_title(title)
+    for a in ax.flat:
+        a.set(xlabel=d['xlabel'], ylabel=d['ylabel'])
+    # Hide x labels and tick labels for top plots and y ticks for right plots.
+    for a in ax.flat:
+        a.label_outer()
+
+
+'''
+Box plots from precomputed statistics (see Axes.bxp). d['boxes'] is a list of box statistics dictionaries
+'''
+
+
+def draw_boxplots(fig, d):
+    import matplotlib
+    ax = fig.subplots()
+    box = ax.bxp(d['boxes'], showfliers=True, patch_artist=True, flierprops={'marker': 'd', 'markersize': 4},
+                 medianprops={'color': 'black'})
+    colors = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+    for patch, color in zip(box['boxes'], colors * len(d['boxes'])):
+        patch.set_facecolor(color)
+    ax.set_title(d['title'])
+    ax.set_xlabel(d['xlabel'])
+    ax.set_ylabel(d['ylabel'])
+
+
+RENDERERS = {'lines': draw_lines, 'histograms': draw_histograms, 'boxplots': draw_boxplots}
+
+
+def draw_figure(kind, d):
+    from matplotlib.figure import Figure
+    fig = Figure()
+    RENDERERS[kind](fig, d)
+    fig.savefig(d['savefig'], dpi=FIGURE_DPI)
+
+
+def get_figure_hash(kind, d):
+    h = hashlib.sha1((inspect.getsource(RENDERERS[kind]) + str(FIGURE_DPI)).encode())
+    h.update(pickle.dumps((kind, d), protocol=pickle.HIGHEST_PROTOCOL))
+    return h.hexdigest()
+
+
+def read_figure_cache(directory):
+    try:
+        with open(os.path.join(directory, FIGURE_CACHE)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_figure_cache(directory, hashes):
+    tmp_file = os.path.join(directory, FIGURE_CACHE + '.' + str(os.getpid()) + '.tmp')
+    with open(tmp_file, 'w') as fh:
+        json.dump(hashes, fh, indent=1, sort_keys=True)
+    os.replace(tmp_file, os.path.join(directory, FIGURE_CACHE))
+
+
+'''
+Render a list of (kind, d) figures, skipping the figures that are unchanged since they were last rendered.
+Returns the number of rendered figures
+'''
+
+
+def render_figures(figures, jobs=1):
+    # a figure that is described twice is rendered once, with its last description
+    figures = {os.path.abspath(d['savefig']): (kind, d) for kind, d in figures}
+
+    caches = {}
+    pending = []
+    for path, (kind, d) in figures.items():
+        directory, filename = os.path.split(path)
+        cache = caches.setdefault(directory, read_figure_cache(directory))
+        figureHash = get_figure_hash(kind, d)
+        if cache.get(filename) != figureHash or not os.path.exists(path):
+            pending.append((path, kind, d, figureHash))
+
+    try:
+        if jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as executor:
+                futures = [(executor.submit(draw_figure, kind, d), path, figureHash)
+                           for path, kind, d, figureHash in pending]
+                for future, path, figureHash in futures:
+                    future.result()
+                    directory, filename = os.path.split(path)
+                    caches[directory][filename] = figureHash
+        else:
+            for path, kind, d, figureHash in pending:
+                draw_figure(kind, d)
+                directory, filename = os.path.split(path)
+                caches[directory][filename] = figureHash
+    finally:
+        # figures rendered before a failure are recorded, so they are not rendered again
+        for directory, cache in caches.items():
+            if os.path.isdir(directory):
+                write_figure_cache(directory, cache)
+
+    return len(pending)
+
+
+'''
+Render a figure, or add it to the figures of the current rendering stage
+'''
+
+pendingFigures = None
+
+
+def render_figure(kind, d):
+    if pendingFigures is not None:
+        pendingFigures.append((kind, d))
+    else:
+        render_figures([(kind, d)])
+
+
+@contextmanager
+def rendering_stage(jobs=1):
+    global pendingFigures
+    # number of figures of the stage and of rendered (changed) figures, set at the end of the stage
+    counts = {}
+    if pendingFigures is not None:
+        # nested stages render with the outer stage
+        yield counts
+        return
+
+    pendingFigures = []
+    try:
+        yield counts
+        figures = pendingFigures
+    finally:
+        pendingFigures = None
+
+    counts['figures'] = len(figures)
+    counts['rendered'] = render_figures(figures, jobs)
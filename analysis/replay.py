@@ -0,0 +1,105 @@
+from essentials import *
+
+'''
+Replay of the event logs written by start-event-log and log-event (report.nls) or by the native engine
+(simulation.py) to netlogo_output/events/<model>_<seed>.csv. An event log holds the variables of every agent at the
+end of setup ("initial" section, with the positions and six-neighbors of the agents) followed by one line per agent
+changed by divide, stratify, move-cell or the induction of mutants, with its new variables ("events" section, in
+the order of the simulation). The grid at any time is rebuilt from the initial state by applying the events up to
+that time, so the state of every week, or of any time between two weeks, is available from a single small file.
+Replaying forward in time only applies the events since the last replayed time; the events are applied in numpy
+batches in which only the last event of every agent is kept
+'''
+
+AGENT_COLUMNS = ["cell-type", "state", "cloneid", "creation-time", "mutation-status", "fate-bias"]
+STRING_COLUMNS = ["cell-type", "state", "mutation-status"]
+
+
+def is_event_log(csv):
+    with open(csv) as f:
+        return f.readline().rstrip("\n") == "initial"
+
+
+class EventLogReplay:
+
+    def __init__(self, csv):
+        initial, events = read_netlogo_event_log(csv)
+
+        self.who = initial["who"].to_numpy()
+        neighbors = parse_neighbors_strings("{turtles " + initial["six-neighbors"].astype(str) + "}")
+        self.topology = initial[["who", "xcor", "ycor"]].assign(time=np.nan)
+        for i, column in enumerate(NEIGHBOR_COLUMNS):
+            self.topology[column] = neighbors[:, i]
+
+        self.initial = {column: initial[column].to_numpy() for column in AGENT_COLUMNS}
+        self.times = events["time"].to_numpy(dtype=np.float64)
+        self.ticks = events["tick"].to_numpy()
+        self.positions = np.searchsorted(self.who, events["who"].to_numpy())
+        self.values = {column: events[column].to_numpy() for column in AGENT_COLUMNS}
+        self.reset()
+
+    def reset(self):
+        self.state = {column: values.copy() for column, values in self.initial.items()}
+        self.applied = 0
+
+    # apply the events from the last applied event up to (excluding) event number end
+    def apply_events(self, end):
+        positions = self.positions[self.applied:end]
+        if positions.size > 0:
+            # index of the last event of every agent of the batch
+            last = positions.size - 1 - np.unique(positions[::-1], return_index=True)[1]
+            rows = self.applied + last
+            for column, values in self.values.items():
+                self.state[column][self.positions[rows]] = values[rows]
+        self.applied = end
+
+    # dataframe of the agents after every event up to the given time, with the same columns as parse_netlogo_world
+    def get_agents(self, time):
+        return self.get_agents_after(int(np.searchsorted(self.times, time, side='right')))
+
+    # dataframe of the agents after the first end events
+    def get_agents_after(self, end):
+        if end < self.applied:
+            self.reset()
+        self.apply_events(end)
+
+        df = self.topology.copy()
+        for column in AGENT_COLUMNS:
+            df[column] = self.state[column].copy()
+            if column in STRING_COLUMNS:
+                df[column] = df[column].astype("category")
+
+        return df[["who", "xcor", "ycor", "cell-type", "state", "time", "cloneid", "creation-time",
+                   "mutation-status", "fate-bias"] + NEIGHBOR_COLUMNS]
+
+    # yield (week, agents) for the weeks of get-snapshot, optionally within a (first, last) range of weeks: the
+    # snapshot of a week is the state at the end of the go (tick) of the first event at or after the start of the
+    # week, so later events of the same time (e.g. of released daughters) are not included. Weeks after the last
+    # logged event (not simulated yet) are not yielded
+    def get_snapshots(self, weekRange=None):
+        week = 0 if weekRange is None else weekRange[0]
+        while weekRange is None or week <= weekRange[1]:
+            first = np.searchsorted(self.times, week, side='left')
+            if first == self.times.size:
+                return
+            yield week, self.get_agents_after(int(np.searchsorted(self.ticks, self.ticks[first], side='right')))
+            week += 1
+
+
+def replay_event_log(csv, weekRange=None):
+    return EventLogReplay(csv).get_snapshots(weekRange)
+
+
+'''
+Yield (week, agents) for every week of a file holding a whole run: a snapshot file of get-snapshot or an event log
+'''
+
+
+def parse_netlogo_run(csv, weekRange=None):
+    if is_event_log(csv):
+        yield from replay_event_log(csv, weekRange)
+        return
+
+    for week, agents in parse_netlogo_snapshots(csv):
+        if weekRange is None or weekRange[0] <= week <= weekRange[1]:
+            yield week, agents
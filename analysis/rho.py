@@ -1,13 +1,13 @@
 from essentials import *
-import os
+from pipeline import run_workflows
+from stats import Histogram
 
 
 def plot_rho_per_week(rhoPerWeek, c):
-    numberOfweeks = len(rhoPerWeek)
     avgRho = []
     std = []
 
-    weeks = range(numberOfweeks)
+    weeks = list(sorted(rhoPerWeek.keys()))
 
     for week in weeks:
         avgRho.append(np.array(rhoPerWeek[week]).mean())
@@ -30,56 +30,53 @@ def plot_rho_per_week(rhoPerWeek, c):
 
 
 def plot_local_rho(localRhoPerWeek, c):
-    fig, ax = plt.subplots(nrows=2, ncols=2, sharex=True, sharey=True)
-    fig.suptitle("Local rho")
-
-    ax[0, 0].hist(np.array(localRhoPerWeek[10]), edgecolor='gray')
-    ax[0, 0].set_title('week 10')
-    ax[0, 1].hist(np.array(localRhoPerWeek[30]), edgecolor='gray')
-    ax[0, 1].set_title('week 30')
-    ax[1, 0].hist(np.array(localRhoPerWeek[50]), edgecolor='gray')
-    ax[1, 0].set_title('week 50')
-    ax[1, 1].hist(np.array(localRhoPerWeek[70]), edgecolor='gray')
-    ax[1, 1].set_title('week 70')
-    for a in ax.flat:
-        a.set(xlabel='local rho', ylabel='frequency')
-    # Hide x labels and tick labels for top plots and y ticks for right plots.
-    for a in ax.flat:
-        a.label_outer()
-
-    plt.savefig(c['analysis_output'] + "local_rho_hist.png", dpi=300)
-    plt.close()
+    d = {
+        'panels': [('week ' + str(week),) + localRhoPerWeek[week].rebin() for week in [10, 30, 50, 70]
+                   if week in localRhoPerWeek],
+        'xlabel': 'local rho',
+        'ylabel': 'frequency',
+        'title': "Local rho",
+        'savefig': c['analysis_output'] + "local_rho_hist.png"
+    }
+
+    render_figure('histograms', d)
+
+
+LOCAL_RHO_BIN_WIDTH = 0.01
+
+
+def initRho(c):
+    return {'rhoPerWeek': {}, 'localRhoPerWeek': {}}
+
+
+def updateRho(results, week, agents, c):
+    rhoPerWeek = results['rhoPerWeek']
+    localRhoPerWeek = results['localRhoPerWeek']
+
+    rhoPerWeek.setdefault(week, [])
+    counts = get_snapshot_cell_counts(agents)
+    rho = int(counts["A"]) / (int(counts["A"]) + int(counts["B"]))
+    rhoPerWeek[week].append(rho)
+
+    tiles = get_tile_counts(agents, c.get('tile_size'), c.get('grid_extent'))  # counts per grid section
+    tiles = tiles[tiles["A"] + tiles["B"] > 0]
+    localRho = tiles["A"] / (tiles["A"] + tiles["B"])
+    localRhoPerWeek.setdefault(week, Histogram(LOCAL_RHO_BIN_WIDTH))
+    localRhoPerWeek[week].extend(((localRho / tiles["agents"]) * 100).to_numpy())
+
+
+def plotRho(results, c):
+    plot_rho_per_week(results['rhoPerWeek'], c)
+    plot_local_rho(results['localRhoPerWeek'], c)
+
+
+rhoWorkflow = {
+    'name': 'rho',
+    'init': initRho,
+    'update': updateRho,
+    'plot': plotRho,
+}
 
 
 def rhoPerWeek(c, options):
-    rhoPerWeek = {}
-    localRhoPerWeek = {}
-
-    if options.var == 'use':
-        rhoPerWeek = readVariableFromDisk('rhoPerWeek', c)
-        localRhoPerWeek = readVariableFromDisk('localRhoPerWeek', c)
-    else:
-        for filename in os.listdir(c['netlogo_output']):
-            [week, seed] = re.findall(r"[-]?\d+|\d+", filename)
-
-            week = int(week)
-            agents = parse_netlogo_world(c['netlogo_output'] + filename)
-
-            rhoPerWeek.setdefault(week, [])
-            rho = get_rho(agents)
-            rhoPerWeek[week].append(rho)
-
-            if week == 10 or week == 30 or week == 50 or week == 70:  # week % 20 == 0 and week !=0:
-                chunks = get_grid_chunks(agents)  # split grid to smaller sections
-                localRhoPerWeek.setdefault(week, [])
-                chunkSize = chunks[0].shape[0]
-                for chunk in chunks:
-                    localRho = (get_rho(chunk) / chunkSize) * 100
-                    localRhoPerWeek[week].append(localRho)
-
-    if options.var == 'save':
-        writeVariableToDisk(rhoPerWeek, 'rhoPerWeek', c)
-        writeVariableToDisk(localRhoPerWeek, 'localRhoPerWeek', c)
-
-    plot_rho_per_week(rhoPerWeek, c)
-    plot_local_rho(localRhoPerWeek, c)
+    run_workflows(c, options, [rhoWorkflow])
@@ -0,0 +1,440 @@
+from essentials import *
+from topology import get_topology, NEIGHBORHOODS
+import contextlib
+import heapq
+import random
+
+'''
+Native event driven implementation of the unified SP model (models/unified/densityFeedback.nlogo), following the
+rules of go, divide, stratify, density-bias, select-division-type and set-nextTime of the NetLogo model.
+The next event is taken from a binary heap of the next event times of the A and B cells instead of scanning every
+agent per event. Events made obsolete by a change of a cell are invalidated lazily: every heap entry carries the
+version of its cell and entries of an older version are skipped when popped.
+Cell state is kept in flat lists indexed by the agent number (who). Snapshots are written in the format of
+get-snapshot (report.nls), so the analysis reads them directly from netlogo_output/snapshots, and with
+generate_events the event log of start-event-log and log-event is written to netlogo_output/events (see replay.py)
+'''
+
+# cell types, with the number of cells of each type and the daughters released by double occupancies
+CELL_TYPES = ["empty", "A", "B", "AA", "AB", "BA", "BB"]
+EMPTY, A, B = 0, 1, 2
+CELL_COUNT = [0, 1, 1, 2, 2, 2, 2]
+DOUBLE_OF = {(A, A): 3, (A, B): 4, (B, A): 5, (B, B): 6}
+DAUGHTERS = {code: daughters for daughters, code in DOUBLE_OF.items()}
+STATES = ["empty", "single", "single", "double", "double", "double", "double"]
+
+# empty agents have mutation status 0 in the NetLogo model (set-cell "empty" 0 0 0)
+MUTATION_STATUSES = ["0", "WT", "p53", "N"]
+NO_MUTATION, WT, P53, NOTCH = 0, 1, 2, 3
+
+
+def get_grid_extent_from_model(nlogo):
+    # min-pxcor, max-pxcor, min-pycor and max-pycor are the 17th to 20th values of the GRAPHICS-WINDOW section
+    with open(nlogo) as f:
+        lines = f.read().split("\n")
+    start = lines.index("GRAPHICS-WINDOW") + 1
+
+    return [int(value) for value in lines[start + 16:start + 20]]
+
+
+class UnifiedModel:
+
+    def __init__(self, parameters, gridExtent, seed):
+        # go changes the induction parameters, so the caller's parameters are copied
+        self.p = dict(parameters)
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.currentTime = 0.0
+        self.cloneCnt = 0
+        self.snapshotCnt = 0.0
+        self.ticks = 0
+        self.eventLog = None
+        self.currentEvent = None
+
+        # rhoWT is set to the expression gammaWT / (lambdaWT + gammaWT) in config.nls
+        self.rates = {WT: (self.p['lambdaWT'], self.p['gammaWT'], self.p['rWT']),
+                      P53: (self.p['lambdaWT'], self.p['gammaWT'], self.p['rWT']),
+                      NOTCH: (self.p['lambdaMUT'], self.p['gammaMUT'], self.p['rMUT'])}
+        self.rhoWT = self.p['gammaWT'] / (self.p['lambdaWT'] + self.p['gammaWT'])
+
+        # agents are numbered as the patches of the topology
+        topology = get_topology(gridExtent, self.p['division-bias'])
+        self.xcor, self.ycor = topology["xcor"], topology["ycor"]
+        self.sixNeighbors, self.immediateNeighbors, self.extendedNeighbors = \
+            [[[j for j in row if j >= 0] for row in topology[neighborhood].tolist()] for neighborhood in NEIGHBORHOODS]
+
+        n = len(self.xcor)
+        self.cellType = [B] * n
+        self.cloneid = [0] * n
+        self.creationTime = [0.0] * n
+        self.mutation = [WT] * n
+        self.fateBias = [0.0] * n
+        self.divisionRate = [0.0] * n
+        self.stratificationRate = [0.0] * n
+        self.symmetricProb = [0.0] * n
+        self.time = [0.0] * n
+
+        self.events = []
+        self.version = [0] * n
+        self.sequence = 0
+
+    # set-cell
+    def set_cell(self, i, cellType, parentCloneID, mut, fateBias):
+        self.cellType[i] = cellType
+        self.creationTime[i] = self.currentTime
+        self.mutation[i] = mut
+        self.fateBias[i] = fateBias
+        if mut in self.rates:
+            self.divisionRate[i], self.stratificationRate[i], self.symmetricProb[i] = self.rates[mut]
+
+        if cellType == EMPTY:
+            self.cloneid[i] = parentCloneID
+            self.divisionRate[i] = self.stratificationRate[i] = self.symmetricProb[i] = 0.0
+
+        self.schedule(i)
+
+    # (re)schedule the next event of an agent, only A and B cells have events
+    def schedule(self, i):
+        self.version[i] += 1
+        if self.cellType[i] == A or self.cellType[i] == B:
+            heapq.heappush(self.events, (self.time[i], self.sequence, i, self.version[i]))
+            self.sequence += 1
+
+    # set-nextTime
+    def next_time(self, rate, elapsedTime):
+        if elapsedTime < 1 / rate:
+            return self.random.expovariate(1 / (1 / rate - elapsedTime)) + self.currentTime
+        return self.currentTime
+
+    # create-daughter-cell
+    def create_daughter_cell(self, i, parentCloneID, cellType, rate, elapsedTime, mut, fateBias):
+        self.cloneid[i] = parentCloneID
+        self.time[i] = self.next_time(rate, elapsedTime)
+        self.set_cell(i, cellType, parentCloneID, mut, fateBias)
+        self.log_event(i, self.currentEvent)
+
+    # move-cell
+    def move_cell(self, agFrom, agTo):
+        for values in [self.cellType, self.cloneid, self.time, self.creationTime, self.mutation, self.fateBias,
+                       self.divisionRate, self.stratificationRate, self.symmetricProb]:
+            values[agTo] = values[agFrom]
+        self.schedule(agTo)
+        self.log_event(agTo, "move")
+
+    def initialize_clone(self, i):
+        self.cloneCnt += 1
+        self.cloneid[i] = self.cloneCnt
+
+    def initialize_clones(self, agents, event=None):
+        agents = list(agents)
+        self.random.shuffle(agents)
+        for i in agents:
+            self.initialize_clone(i)
+            self.log_event(i, event)
+
+    def num_of_cells(self, agents):
+        return sum(CELL_COUNT[self.cellType[i]] for i in agents)
+
+    def mutant_proportion(self, mut):
+        return self.num_of_cells(i for i in range(len(self.cellType)) if self.mutation[i] == mut) / \
+               self.num_of_cells(range(len(self.cellType)))
+
+    # insert-notch and insert-p53
+    def insert_mutants(self, mut, fateBias, excluded):
+        candidates = [i for i in range(len(self.cellType)) if self.cellType[i] == A and self.mutation[i] != excluded]
+        while self.mutant_proportion(mut) < self.p['induction']:
+            i = self.random.choice(candidates)
+            self.mutation[i] = mut
+            self.fateBias[i] = fateBias
+            self.divisionRate[i], self.stratificationRate[i], self.symmetricProb[i] = self.rates[mut]
+
+        self.initialize_clones((i for i in range(len(self.cellType)) if self.mutation[i] == mut), "induce")
+
+    def insert_notch(self):
+        self.insert_mutants(NOTCH, self.p['notchdelta'], P53)
+
+    def insert_p53(self):
+        self.insert_mutants(P53, self.p['p53delta'], NOTCH)
+
+    # setup and setup-cells
+    def setup(self):
+        n = len(self.cellType)
+        for i in range(n):
+            self.set_cell(i, B, 0, WT, 0.0)
+
+        numOfA = 0
+        while numOfA / n < self.rhoWT:
+            i = self.random.randrange(n)
+            numOfA += self.cellType[i] != A
+            self.set_cell(i, A, 0, WT, 0.0)
+
+        if self.p['induction'] == 0:
+            self.initialize_clones(i for i in range(n) if self.cellType[i] == A)
+        else:
+            if self.p['notch-induction-time'] == 0:
+                self.insert_notch()
+            if self.p['p53-induction-time'] == 0:
+                self.insert_p53()
+
+        for i in range(n):
+            if self.cellType[i] == A:
+                self.time[i] = self.next_time(self.divisionRate[i], 0)
+            elif self.cellType[i] == B:
+                self.time[i] = self.next_time(self.stratificationRate[i], 0)
+            self.schedule(i)
+
+    # density-bias
+    def density_bias(self, neighborhoodDensity, mut):
+        crowdingCutOff = self.p['crowdingCutOff']
+        if mut == NOTCH or mut == WT:
+            if neighborhoodDensity < crowdingCutOff:
+                return self.p['fdelta']
+            if neighborhoodDensity == crowdingCutOff:
+                return 0
+            return -1 * self.p['fdelta']
+        if mut == P53 and neighborhoodDensity > crowdingCutOff:
+            return -1 * self.p['p53delta']
+        return 0
+
+    # select-division-type
+    def select_division_type(self, fateBias, feedbackBias, symmetricProb, sixNeighborhoodDensity):
+        if sixNeighborhoodDensity > 8:
+            pAA = 0
+            pAB = 1 / 2 - symmetricProb
+            pBB = 2 * symmetricProb
+        else:
+            pAA = symmetricProb * (1 + fateBias + feedbackBias)
+            pAB = 1 / 2 - symmetricProb
+            pBB = symmetricProb * (1 - fateBias - feedbackBias)
+        pBA = pAB
+
+        if pAA > 2 * symmetricProb:
+            pAA = 2 * symmetricProb
+        if pBB < 0:
+            pBB = 0
+
+        rnd = self.random.random()
+        if rnd < pAA:
+            return A, A
+        if rnd < pAA + pAB:
+            return A, B
+        if rnd < pAA + pAB + pBA:
+            return B, A
+        return B, B
+
+    # get-random-common-neighbor
+    def get_random_common_neighbor(self, ag1, ag2):
+        common = [i for i in self.immediateNeighbors[ag1] if i in self.immediateNeighbors[ag2]]
+        if not common:
+            raise RuntimeError(f'agents {ag1} and {ag2} have no common immediate neighbor')
+        return self.random.choice(common)
+
+    def one_of(self, agents, condition):
+        agents = [i for i in agents if condition(i)]
+        return self.random.choice(agents) if agents else None
+
+    def divide(self, i, divisionType):
+        self.currentEvent = "divide"
+        parentCloneID, mut, fateBias = self.cloneid[i], self.mutation[i], self.fateBias[i]
+        rateType = {A: self.divisionRate[i], B: self.stratificationRate[i]}
+        daughter1, daughter2 = divisionType
+
+        emptyImmediate = self.one_of(self.immediateNeighbors[i], lambda j: self.cellType[j] == EMPTY)
+        if emptyImmediate is not None:
+            self.create_daughter_cell(i, parentCloneID, daughter1, rateType[daughter1], 0, mut, fateBias)
+            self.create_daughter_cell(emptyImmediate, parentCloneID, daughter2, rateType[daughter2], 0, mut, fateBias)
+            return
+
+        if self.p['diffusion']:
+            emptyExtended = self.one_of(self.extendedNeighbors[i], lambda j: self.cellType[j] == EMPTY)
+            if emptyExtended is not None:
+                commonNeighbor = self.get_random_common_neighbor(i, emptyExtended)
+                self.move_cell(commonNeighbor, emptyExtended)
+                self.create_daughter_cell(i, parentCloneID, daughter1, rateType[daughter1], 0, mut, fateBias)
+                self.create_daughter_cell(commonNeighbor, parentCloneID, daughter2, rateType[daughter2], 0, mut,
+                                          fateBias)
+                return
+
+        # double occupancy
+        self.set_cell(i, DOUBLE_OF[divisionType], parentCloneID, mut, fateBias)
+        self.log_event(i, self.currentEvent)
+
+    def release_double(self, double, first, second):
+        parentCloneID, mut, fateBias = self.cloneid[double], self.mutation[double], self.fateBias[double]
+        elapsedTime = self.currentTime - self.creationTime[double]
+        daughter1, daughter2 = DAUGHTERS[self.cellType[double]]
+        rateType = {A: self.divisionRate[double], B: self.stratificationRate[double]}
+
+        self.create_daughter_cell(first, parentCloneID, daughter1, rateType[daughter1], elapsedTime, mut, fateBias)
+        self.create_daughter_cell(second, parentCloneID, daughter2, rateType[daughter2], elapsedTime, mut, fateBias)
+
+    def stratify(self, i):
+        self.currentEvent = "stratify"
+        isDouble = lambda j: CELL_COUNT[self.cellType[j]] == 2
+
+        immediateDouble = self.one_of(self.immediateNeighbors[i], isDouble)
+        if immediateDouble is not None:
+            self.release_double(immediateDouble, i, immediateDouble)
+            return
+
+        if self.p['diffusion']:
+            extendedDouble = self.one_of(self.extendedNeighbors[i], isDouble)
+            if extendedDouble is not None:
+                commonNeighbor = self.get_random_common_neighbor(i, extendedDouble)
+                self.move_cell(commonNeighbor, i)
+                self.release_double(extendedDouble, extendedDouble, commonNeighbor)
+                return
+
+        # empties have no clone ID, mutation status or fate bias
+        self.set_cell(i, EMPTY, 0, NO_MUTATION, 0.0)
+        self.log_event(i, self.currentEvent)
+
+    def next_event(self):
+        while True:
+            time, sequence, i, version = heapq.heappop(self.events)
+            if version == self.version[i]:
+                return i
+
+    # go: process one event, return False once the simulation has finished
+    def go(self):
+        i = self.next_event()
+        self.currentTime = self.time[i]
+
+        if self.p['induction'] > 0:
+            if self.p['notch-induction-time'] > 0 and self.currentTime >= self.p['notch-induction-time']:
+                self.insert_notch()
+                self.p['notch-induction-time'] = 0
+
+            if self.p['p53-induction-time'] > 0 and self.currentTime >= self.p['p53-induction-time']:
+                self.insert_p53()
+                self.p['p53-induction-time'] = 0
+
+            if self.p['notch-induction-time'] <= 0 and self.p['p53-induction-time'] <= 0:
+                self.initialize_clones((j for j in range(len(self.cellType))
+                                        if self.cellType[j] == A and self.mutation[j] == WT), "clone")
+                self.p['induction'] = 0
+
+        if self.currentTime >= self.p['sims-duration'] + 1:
+            return False
+
+        if self.cellType[i] == A:
+            feedbackBias = 0
+            sixNeighborhoodDensity = 0
+            if self.p['densityBias']:
+                sixNeighborhoodDensity = self.num_of_cells(self.sixNeighbors[i])
+                feedbackBias = self.density_bias(sixNeighborhoodDensity, self.mutation[i])
+
+            divisionType = self.select_division_type(self.fateBias[i], feedbackBias, self.symmetricProb[i],
+                                                     sixNeighborhoodDensity)
+            self.divide(i, divisionType)
+        else:
+            self.stratify(i)
+
+        self.ticks += 1
+        return True
+
+    # get-snapshot, the topology is written with the first snapshot
+    def write_snapshot(self, snapshotFile):
+        if self.currentTime < self.snapshotCnt:
+            return
+
+        lines = []
+        if self.snapshotCnt == 0:
+            lines += ["topology", "who,xcor,ycor,six-neighbors"]
+            lines += [f"{i},{self.xcor[i]:g},{self.ycor[i]:g},{' '.join(map(str, sorted(self.sixNeighbors[i])))}"
+                      for i in range(len(self.cellType))]
+            lines += ["snapshots", "week,who,cell-type,state,cloneid,creation-time,mutation-status,fate-bias"]
+
+        week = int(self.currentTime)
+        lines += [f"{week},{i},{self.get_variables(i)}" for i in range(len(self.cellType))]
+
+        with open(snapshotFile, 'w' if self.snapshotCnt == 0 else 'a') as fh:
+            fh.write("\n".join(lines) + "\n")
+        self.snapshotCnt += 1.0
+
+    # start-event-log, the variables of every agent at the end of setup
+    def start_event_log(self, eventLog):
+        self.eventLog = eventLog
+        self.eventLog.write("initial\nwho,xcor,ycor,six-neighbors,cell-type,state,cloneid,creation-time,"
+                            "mutation-status,fate-bias\n")
+        for i in range(len(self.cellType)):
+            self.eventLog.write(f"{i},{self.xcor[i]:g},{self.ycor[i]:g},"
+                                f"{' '.join(map(str, sorted(self.sixNeighbors[i])))},{self.get_variables(i)}\n")
+        self.eventLog.write("events\ntick,time,event,who,cell-type,state,cloneid,creation-time,mutation-status,"
+                            "fate-bias\n")
+
+    # log-event, only once the event log has been started
+    def log_event(self, i, event):
+        if self.eventLog is not None and event is not None:
+            self.eventLog.write(f"{self.ticks},{self.currentTime!r},{event},{i},{self.get_variables(i)}\n")
+
+    def get_variables(self, i):
+        return f"{CELL_TYPES[self.cellType[i]]},{STATES[self.cellType[i]]},{self.cloneid[i]}," \
+               f"{self.creationTime[i]!r},{MUTATION_STATUSES[self.mutation[i]]},{self.fateBias[i]!r}"
+
+    def run(self, snapshotFile, eventFile=None):
+        self.setup()
+        with open(eventFile, 'w') if eventFile is not None else contextlib.nullcontext() as eventLog:
+            if eventLog is not None:
+                self.start_event_log(eventLog)
+            while self.go():
+                self.write_snapshot(snapshotFile)
+
+
+'''
+Run the unified model of a model directory (config.nls parameters, grid of the .nlogo file) and write the snapshots
+to netlogo_output/snapshots/<model>_<seed>.csv, and the event log to netlogo_output/events/<model>_<seed>.csv when
+generate_events is set
+'''
+
+
+def run_simulation(model_dir, seed=None, gridExtent=None):
+    parameters = parse_config_parameters(os.path.join(model_dir, "config.nls"))
+    if parameters.get('model') != "unified":
+        raise ValueError(f'{model_dir}: the native engine implements the unified model only')
+
+    if seed is None:
+        seed = parameters['predefinedSeed'] if parameters['predefinedSeed'] != 0 else \
+            random.SystemRandom().randint(-2 ** 31, 2 ** 31 - 1)
+    if gridExtent is None:
+        gridExtent = get_grid_extent_from_model(os.path.join(model_dir, "densityFeedback.nlogo"))
+
+    snapshotsDir = os.path.join(model_dir, "netlogo_output", "snapshots")
+    os.makedirs(snapshotsDir, exist_ok=True)
+    snapshotFile = os.path.join(snapshotsDir, f"{parameters['model']}_{seed}.csv")
+
+    eventFile = None
+    if parameters.get('generate_events'):
+        eventsDir = os.path.join(model_dir, "netlogo_output", "events")
+        os.makedirs(eventsDir, exist_ok=True)
+        eventFile = os.path.join(eventsDir, f"{parameters['model']}_{seed}.csv")
+
+    UnifiedModel(parameters, gridExtent, seed).run(snapshotFile, eventFile)
+
+    return snapshotFile
+
+
+def parse_simulation_arguments():
+    parser = argparse.ArgumentParser(description='Run the unified SP model with the native event driven engine and '
+                                                 'write its snapshots to netlogo_output/snapshots')
+    parser.add_argument('-m', '--model_dir', help='directory containing the model files (config.nls, .nlogo)',
+                        required=True, metavar='PATH')
+    parser.add_argument('--seed', help='random seed, DEFAULT: predefinedSeed of config.nls, or a new seed if it is 0',
+                        type=int)
+    for gridLimit in ['min-pxcor', 'max-pxcor', 'min-pycor', 'max-pycor']:
+        parser.add_argument('--' + gridLimit, help=f'{gridLimit} of the simulated grid, DEFAULT: as in the .nlogo file',
+                            type=int, metavar='N')
+
+    return parser.parse_args()
+
+
+def main():
+    options = parse_simulation_arguments()
+    gridExtent = [options.min_pxcor, options.max_pxcor, options.min_pycor, options.max_pycor]
+
+    snapshotFile = run_simulation(options.model_dir, options.seed, None if None in gridExtent else gridExtent)
+    print(snapshotFile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import math
+import numpy as np
+
+'''
+Streaming statistics for aggregating per-week values over very large numbers of snapshots in bounded memory.
+Every accumulator can be updated with the values of one snapshot at a time and merged with an accumulator
+built from other snapshots (e.g. in another process), so per-clone values never have to be kept in lists
+'''
+
+
+'''
+Online mean and variance (Welford's algorithm, with Chan's formula for merging)
+'''
+
+
+class RunningStats:
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        other = RunningStats()
+        other.count = values.size
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        self.merge(other)
+
+    def merge(self, other):
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        return self
+
+    # population variance, as numpy's var/std
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count > 0 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+'''
+Exact histogram of non-negative integer values (e.g. clone sizes), stored as counts per value
+'''
+
+
+class IntegerHistogram:
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.int64)
+        if values.size == 0:
+            return
+        self.merge_counts(np.bincount(values))
+
+    def add(self, value):
+        self.extend([value])
+
+    def merge_counts(self, counts):
+        if counts.size > self.counts.size:
+            counts = counts.copy()
+            counts[:self.counts.size] += self.counts
+            self.counts = counts
+        else:
+            self.counts[:counts.size] += counts
+
+    def merge(self, other):
+        self.merge_counts(other.counts)
+        return self
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    @property
+    def values(self):
+        return np.flatnonzero(self.counts)
+
+    @property
+    def mean(self):
+        values = self.values
+        return float((values * self.counts[values]).sum() / self.count) if self.count > 0 else math.nan
+
+    @property
+    def std(self):
+        values = self.values
+        if self.count == 0:
+            return math.nan
+        return math.sqrt(float((((values - self.mean) ** 2) * self.counts[values]).sum() / self.count))
+
+    # quantile with linear interpolation between the closest ranks, as numpy's default percentile method
+    def quantile(self, q):
+        cumulative = np.cumsum(self.counts)
+        position = q * (self.count - 1)
+        lower = int(np.searchsorted(cumulative, math.floor(position), side='right'))
+        upper = int(np.searchsorted(cumulative, math.ceil(position), side='right'))
+        return lower + (upper - lower) * (position - math.floor(position))
+
+    @property
+    def min(self):
+        return int(self.values[0])
+
+    @property
+    def max(self):
+        return int(self.values[-1])
+
+    # box plot statistics (see matplotlib's Axes.bxp), whiskers extend to the furthest values within whis * IQR
+    def boxplot_stats(self, whis=1.5):
+        # an empty box (e.g. all clones of this type are extinct) is drawn as nothing
+        if self.count == 0:
+            return {'med': math.nan, 'q1': math.nan, 'q3': math.nan, 'mean': math.nan,
+                    'whislo': math.nan, 'whishi': math.nan, 'fliers': np.zeros(0)}
+
+        q1, median, q3 = self.quantile(0.25), self.quantile(0.5), self.quantile(0.75)
+        values = self.values
+        inside = values[(values >= q1 - whis * (q3 - q1)) & (values <= q3 + whis * (q3 - q1))]
+
+        return {'med': median, 'q1': q1, 'q3': q3, 'mean': self.mean,
+                'whislo': inside.min(), 'whishi': inside.max(),
+                'fliers': values[(values < inside.min()) | (values > inside.max())]}
+
+
+'''
+Histogram of real values with fixed width bins that are created as values arrive.
+Mean and variance are tracked exactly alongside the binned counts
+'''
+
+
+class Histogram:
+
+    def __init__(self, binWidth):
+        self.binWidth = binWidth
+        self.bins = {}
+        self.stats = RunningStats()
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        self.stats.extend(values)
+        indices, counts = np.unique(np.floor(values / self.binWidth).astype(np.int64), return_counts=True)
+        for index, count in zip(indices.tolist(), counts.tolist()):
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def add(self, value):
+        self.extend([value])
+
+    def merge(self, other):
+        if other.binWidth != self.binWidth:
+            raise ValueError(f'cannot merge histograms with bin widths {self.binWidth} and {other.binWidth}')
+        self.stats.merge(other.stats)
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        return self
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    @property
+    def mean(self):
+        return self.stats.mean
+
+    @property
+    def std(self):
+        return self.stats.std
+
+    # return (bin edges, counts) of the histogram re-binned to numOfBins equal bins over its range, as matplotlib's hist
+    def rebin(self, numOfBins=10):
+        indices = np.array(sorted(self.bins.keys()), dtype=np.int64)
+        counts = np.array([self.bins[index] for index in indices], dtype=np.int64)
+        centres = (indices + 0.5) * self.binWidth
+        counts, edges = np.histogram(centres, bins=numOfBins, weights=counts)
+        return edges, counts
+
+
+'''
+Return the mean and standard deviation of a list of values or of a streaming accumulator
+'''
+
+
+def get_mean_std(values):
+    if hasattr(values, 'merge'):
+        return values.mean, values.std
+
+    values = np.array(values)
+    return values.mean(), values.std()
@@ -0,0 +1,219 @@
+from essentials import *
+from replay import parse_netlogo_run, is_event_log
+import json
+import shutil
+
+'''
+Consolidated store of world snapshots, for random access to any week and seed without parsing csv files.
+Every agent variable used by the analysis is stored as a fixed width numpy array laid out as [seed, week, agent]
+and opened with memory mapping, so reading a subset of weeks or seeds only touches the pages of that subset:
+    cell-type, state, mutation-status, fate-bias: uint8 codes of the values listed in meta.json
+    cloneid: int32
+    creation-time: float32
+The grid topology is static during a run and is stored once per seed as [seed, agent] arrays (xcor, ycor and the
+six-neighbors matrix). Agents are indexed by their who number. present[seed, week] is True for the stored snapshots.
+meta.json also records the world files the store was built from, with the size and modification time of each
+'''
+
+SNAPSHOT_STORE_VERSION = 1
+STORE_CODE_COLUMNS = ["cell-type", "state", "mutation-status", "fate-bias"]
+STORE_COLUMNS = {"cloneid": np.int32, "creation-time": np.float32}
+STORE_COLUMNS.update({column: np.uint8 for column in STORE_CODE_COLUMNS})
+
+
+def get_store_array_path(storeDir, name):
+    return os.path.join(storeDir, name + ".npy")
+
+
+'''
+Build the snapshot store from the given world files (see pipeline.get_world_files), replacing an existing store.
+numOfWeeks is the number of weeks stored per seed (weeks 0 to numOfWeeks - 1)
+'''
+
+
+def build_snapshot_store(worldFiles, storeDir, numOfWeeks):
+    seeds = sorted({seed for week, seed, path in worldFiles})
+    maxWeek = max([week for week, seed, path in worldFiles if week is not None], default=0)
+    numOfWeeks = max(numOfWeeks, maxWeek + 1)
+
+    sources = {}
+    categories = {column: [] for column in STORE_CODE_COLUMNS}
+    arrays = None
+
+    # build the store next to the old one, so that an interrupted build never leaves a partial store behind
+    tmpDir = storeDir.rstrip('/') + ".tmp"
+    shutil.rmtree(tmpDir, ignore_errors=True)
+    os.makedirs(tmpDir)
+
+    for worldFile in worldFiles:
+        week, seed, path = worldFile
+        s = seeds.index(seed)
+        snapshots = parse_netlogo_run(path) if week is None else [(week, parse_netlogo_world(path))]
+        weeks = []
+
+        for week, agents in snapshots:
+            if week >= numOfWeeks:
+                raise ValueError(f'{path}: week {week} is beyond the {numOfWeeks} weeks of the snapshot store')
+            agents = agents.sort_values("who")
+            if not np.array_equal(agents["who"].to_numpy(), np.arange(len(agents))):
+                raise ValueError(f'{path}: agents are not numbered from 0 to {len(agents) - 1}')
+
+            if arrays is None:
+                arrays = create_store_arrays(tmpDir, len(seeds), numOfWeeks, len(agents))
+
+            # the topology of a run is taken from its first snapshot and has to be the same in all the others
+            if not arrays["present"][s].any():
+                arrays["xcor"][s] = agents["xcor"].to_numpy()
+                arrays["ycor"][s] = agents["ycor"].to_numpy()
+                arrays["neighbors"][s] = get_neighbor_matrix(agents)
+            elif not (np.array_equal(arrays["xcor"][s], agents["xcor"].to_numpy(dtype=np.float32)) and
+                      np.array_equal(arrays["ycor"][s], agents["ycor"].to_numpy(dtype=np.float32))):
+                raise ValueError(f'{path}: grid topology differs from the other snapshots of seed {seed}')
+
+            for column in STORE_CODE_COLUMNS:
+                values = agents[column].astype(str) if column != "fate-bias" else agents[column].astype(float)
+                for value in values.unique():
+                    if value not in categories[column]:
+                        categories[column].append(value)
+                codes = {value: code for code, value in enumerate(categories[column])}
+                arrays[column][s, week] = values.map(codes).to_numpy(dtype=np.uint8)
+            arrays["cloneid"][s, week] = agents["cloneid"].to_numpy()
+            arrays["creation-time"][s, week] = agents["creation-time"].to_numpy()
+            arrays["present"][s, week] = True
+            weeks.append(int(week))
+
+        sources[os.path.basename(path)] = {'key': get_world_cache_key(path), 'seed': seed, 'weeks': weeks}
+
+    if arrays is not None:
+        for array in arrays.values():
+            array.flush()
+
+    meta = {'version': SNAPSHOT_STORE_VERSION, 'seeds': seeds, 'weeks': numOfWeeks,
+            'agents': 0 if arrays is None else int(arrays["xcor"].shape[1]),
+            'categories': categories, 'sources': sources}
+    with open(os.path.join(tmpDir, "meta.json"), 'w') as fh:
+        json.dump(meta, fh)
+
+    del arrays
+    shutil.rmtree(storeDir, ignore_errors=True)
+    os.replace(tmpDir, storeDir)
+    openStores.pop(storeDir, None)
+
+
+def create_store_arrays(storeDir, numOfSeeds, numOfWeeks, numOfAgents):
+    shapes = {"present": ((numOfSeeds, numOfWeeks), np.bool_),
+              "xcor": ((numOfSeeds, numOfAgents), np.float32),
+              "ycor": ((numOfSeeds, numOfAgents), np.float32),
+              "neighbors": ((numOfSeeds, numOfAgents, NEIGHBORS_WIDTH), np.int32)}
+    for column, dtype in STORE_COLUMNS.items():
+        shapes[column] = ((numOfSeeds, numOfWeeks, numOfAgents), dtype)
+
+    return {name: np.lib.format.open_memmap(get_store_array_path(storeDir, name), mode='w+', dtype=dtype, shape=shape)
+            for name, (shape, dtype) in shapes.items()}
+
+
+'''
+Memory mapped snapshot store
+'''
+
+
+class SnapshotStore:
+
+    def __init__(self, storeDir):
+        with open(os.path.join(storeDir, "meta.json")) as fh:
+            meta = json.load(fh)
+        if meta['version'] != SNAPSHOT_STORE_VERSION:
+            raise ValueError(f'{storeDir}: snapshot store version {meta["version"]} is not supported')
+
+        self.storeDir = storeDir
+        self.seeds = meta['seeds']
+        self.numOfWeeks = meta['weeks']
+        self.numOfAgents = meta['agents']
+        self.categories = meta['categories']
+        self.sources = meta['sources']
+        self.arrays = {}
+
+    # arrays are memory mapped on first use
+    def get_array(self, name):
+        if name not in self.arrays:
+            self.arrays[name] = np.load(get_store_array_path(self.storeDir, name), mmap_mode='r')
+        return self.arrays[name]
+
+    # True if the world file is stored and has not changed since
+    def contains(self, path):
+        source = self.sources.get(os.path.basename(path))
+        return source is not None and source['key'] == get_world_cache_key(path)
+
+    # memory mapped [seed, week, agent] values of a column for a selection of weeks and seeds (default: all)
+    def select(self, column, weeks=None, seeds=None):
+        array = self.get_array(column)
+        if seeds is not None:
+            array = array[[self.seeds.index(seed) for seed in seeds]]
+        if weeks is not None:
+            array = array[:, list(weeks)]
+        return array
+
+    # dataframe of a snapshot, with the same columns as parse_netlogo_world ("time" is not stored)
+    def get_agents(self, seed, week):
+        s = self.seeds.index(seed)
+        if not self.get_array("present")[s, week]:
+            raise KeyError(f'no snapshot of week {week} and seed {seed} in {self.storeDir}')
+
+        df = pd.DataFrame({"who": np.arange(self.numOfAgents, dtype=np.int64),
+                           "xcor": self.get_array("xcor")[s].astype(np.float64),
+                           "ycor": self.get_array("ycor")[s].astype(np.float64)})
+        for column in ["cell-type", "state"]:
+            df[column] = pd.Categorical.from_codes(self.get_array(column)[s, week], self.categories[column])
+        df["time"] = np.nan
+        df["cloneid"] = self.get_array("cloneid")[s, week].astype(np.int64)
+        df["creation-time"] = self.get_array("creation-time")[s, week].astype(np.float64)
+        df["mutation-status"] = pd.Categorical.from_codes(self.get_array("mutation-status")[s, week],
+                                                          self.categories["mutation-status"])
+        df["fate-bias"] = np.array(self.categories["fate-bias"], dtype=np.float64)[self.get_array("fate-bias")[s, week]]
+
+        neighbors = self.get_array("neighbors")[s]
+        for i, column in enumerate(NEIGHBOR_COLUMNS):
+            df[column] = neighbors[:, i]
+
+        return df
+
+    # yield (week, agents) for every stored snapshot of a world file, optionally within a (first, last) range of weeks
+    def get_snapshots(self, path, weekRange=None):
+        source = self.sources[os.path.basename(path)]
+        for week in source['weeks']:
+            if weekRange is None or weekRange[0] <= week <= weekRange[1]:
+                yield week, self.get_agents(source['seed'], week)
+
+
+'''
+Open snapshot stores once per process
+'''
+
+openStores = {}
+
+
+def open_snapshot_store(storeDir):
+    if storeDir not in openStores:
+        openStores[storeDir] = SnapshotStore(storeDir)
+
+    return openStores[storeDir]
+
+
+'''
+Build the snapshot store of c['snapshot_store'] from the world files, unless it is up to date
+'''
+
+
+def update_snapshot_store(c, worldFiles):
+    # the snapshots of the runs are analysed from their world and snapshot files, not from their event logs
+    worldFiles = [worldFile for worldFile in worldFiles if worldFile[0] is not None or not is_event_log(worldFile[2])]
+    storeDir = c['snapshot_store']
+    if os.path.exists(os.path.join(storeDir, "meta.json")):
+        store = open_snapshot_store(storeDir)
+        if store.sources.keys() == {os.path.basename(path) for week, seed, path in worldFiles} and \
+                all(store.contains(path) for week, seed, path in worldFiles):
+            return store
+
+    build_snapshot_store(worldFiles, storeDir, c['weeks'] + 1)
+
+    return open_snapshot_store(storeDir)
@@ -0,0 +1,279 @@
+from essentials import *
+from simulation import run_simulation
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import json
+import shutil
+import subprocess
+import sys
+
+'''
+Parameter sweeps: every combination of a grid of config.nls parameter values is simulated for a range of seeds,
+either with NetLogo in headless mode or with the native engine (simulation.py, unified model only).
+Every combination gets its own copy of the model directory, with the parameters patched into config.nls, so that
+main.py can analyse it as any other model directory. Every run (combination and seed) is simulated in a temporary
+copy of the combination directory with predefinedSeed set to the seed, and its outputs are then moved to the
+netlogo_output directory of the combination.
+Runs are scheduled on a pool of worker processes, failed runs are retried, and the status, attempts and outputs of
+every run are recorded in the sweep manifest (sweep.json), so an interrupted sweep only simulates the missing runs.
+The models use a random seed when predefinedSeed is 0, so 0 is not a valid seed of a sweep
+'''
+
+MODEL_FILES = ["densityFeedback.nlogo", "config.nls", "SP_essentials.nls", "report.nls"]
+OUTPUT_DIRS = ["worlds", "views", "snapshots", "events"]
+
+
+def get_combination_name(parameters):
+    return "_".join(f"{name}={value}" for name, value in parameters.items()) or "default"
+
+
+'''
+Return the list of runs of a sweep, one per combination of the parameter values and seed
+'''
+
+
+def get_runs(parameterGrid, seeds):
+    runs = []
+    names = list(parameterGrid.keys())
+    for values in itertools.product(*[parameterGrid[name] for name in names]):
+        parameters = dict(zip(names, values))
+        for seed in seeds:
+            runs.append({'id': f"{get_combination_name(parameters)}/{seed}", 'parameters': parameters, 'seed': seed})
+
+    return runs
+
+
+'''
+Set parameters of a netlogo config file, every parameter has to be set in the file already
+'''
+
+
+def patch_config(netlogo_conf, parameters):
+    with open(netlogo_conf) as f:
+        content = f.read()
+
+    for name, value in parameters.items():
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        content, count = re.subn(rf"^(\s*set\s+{re.escape(name)}\s+)[^;\n]*?(\s*(;.*)?)$",
+                                 lambda match: match.group(1) + str(value) + match.group(2), content,
+                                 count=1, flags=re.M)
+        if count == 0:
+            raise ValueError(f'{netlogo_conf}: parameter {name} is not set in the config file')
+
+    with open(netlogo_conf, 'w') as f:
+        f.write(content)
+
+
+def copy_model(model_dir, target_dir, parameters):
+    os.makedirs(target_dir, exist_ok=True)
+    for filename in MODEL_FILES:
+        shutil.copy2(os.path.join(model_dir, filename), target_dir)
+    patch_config(os.path.join(target_dir, "config.nls"), parameters)
+
+    for outputDir in OUTPUT_DIRS:
+        os.makedirs(os.path.join(target_dir, "netlogo_output", outputDir), exist_ok=True)
+    os.makedirs(os.path.join(target_dir, "analysis_output", "dump_vars"), exist_ok=True)
+
+
+def get_experiment_name(nlogo):
+    with open(nlogo) as f:
+        return re.search(r'<experiment name="([^"]+)"', f.read()).group(1)
+
+
+'''
+Simulate a single run in a temporary copy of its combination directory and move its outputs to the combination
+directory. Runs in a worker process, returns the list of outputs (relative to the sweep directory)
+'''
+
+
+def execute_run(run, settings):
+    combinationDir = os.path.join(settings['sweep_dir'], get_combination_name(run['parameters']))
+    runDir = os.path.join(combinationDir, "runs", str(run['seed']))
+    shutil.rmtree(runDir, ignore_errors=True)
+    copy_model(combinationDir, runDir, {'predefinedSeed': run['seed']})
+
+    gridExtent = settings['grid_extent']
+    if settings['engine'] == 'native':
+        run_simulation(runDir, run['seed'], gridExtent)
+    else:
+        netlogo = settings['netlogo']
+        command = ["java", "-Dfile.encoding=UTF-8", "-cp", netlogo, "org.nlogo.headless.Main"] \
+            if netlogo.endswith(".jar") else [netlogo]
+        model = os.path.abspath(os.path.join(runDir, "densityFeedback.nlogo"))
+        command += ["--model", model, "--experiment", get_experiment_name(model)]
+        if gridExtent is not None:
+            for gridLimit, value in zip(['min-pxcor', 'max-pxcor', 'min-pycor', 'max-pycor'], gridExtent):
+                command += ["--" + gridLimit, str(value)]
+        # the netlogo launcher script has to be started from the netlogo installation directory
+        subprocess.run(command, cwd=os.path.dirname(os.path.abspath(netlogo)), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=settings['timeout'])
+
+    outputs = []
+    for outputDir in OUTPUT_DIRS:
+        source = os.path.join(runDir, "netlogo_output", outputDir)
+        for filename in sorted(os.listdir(source)):
+            target = os.path.join(combinationDir, "netlogo_output", outputDir, filename)
+            os.replace(os.path.join(source, filename), target)
+            outputs.append(os.path.relpath(target, settings['sweep_dir']))
+    shutil.rmtree(runDir)
+
+    return outputs
+
+
+def read_manifest(sweep_dir):
+    manifest_file = os.path.join(sweep_dir, "sweep.json")
+    if not os.path.exists(manifest_file):
+        return {'runs': {}}
+
+    with open(manifest_file) as fh:
+        return json.load(fh)
+
+
+def write_manifest(manifest, sweep_dir):
+    tmp_file = os.path.join(sweep_dir, "sweep.json.tmp")
+    with open(tmp_file, 'w') as fh:
+        json.dump(manifest, fh, indent=1)
+    os.replace(tmp_file, os.path.join(sweep_dir, "sweep.json"))
+
+
+def is_done(record, sweep_dir):
+    return record.get('status') == 'done' and \
+           all(os.path.exists(os.path.join(sweep_dir, output)) for output in record['outputs'])
+
+
+'''
+Run a sweep of a model directory. parameterGrid maps config.nls parameter names to lists of values.
+Returns the manifest of the sweep
+'''
+
+
+def run_sweep(model_dir, sweep_dir, parameterGrid, seeds, engine='native', jobs=1, retries=2, netlogo=None,
+              gridExtent=None, timeout=None):
+    if engine == 'netlogo' and netlogo is None:
+        raise ValueError('the path to the netlogo launcher (netlogo-headless.sh or netlogo jar) is required')
+    if 0 in seeds:
+        raise ValueError('seed 0 makes the models use a random seed, the seeds of a sweep have to be non zero')
+
+    os.makedirs(sweep_dir, exist_ok=True)
+    manifest = read_manifest(sweep_dir)
+    manifest.update({'model': os.path.abspath(model_dir), 'engine': engine, 'parameters': parameterGrid})
+    settings = {'sweep_dir': sweep_dir, 'engine': engine, 'netlogo': netlogo, 'grid_extent': gridExtent,
+                'timeout': timeout}
+
+    runs = get_runs(parameterGrid, seeds)
+    pending = [run for run in runs if not is_done(manifest['runs'].get(run['id'], {}), sweep_dir)]
+    print(f"{len(runs) - len(pending)} of {len(runs)} runs already done")
+
+    for parameters in {get_combination_name(run['parameters']): run['parameters'] for run in pending}.values():
+        copy_model(model_dir, os.path.join(sweep_dir, get_combination_name(parameters)), parameters)
+
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        # every future maps to its run and to the pool it was submitted to
+        futures = {executor.submit(execute_run, run, settings): (run, executor) for run in pending}
+        while futures:
+            for future in as_completed(list(futures.keys())):
+                run, runExecutor = futures.pop(future)
+                record = manifest['runs'].setdefault(run['id'], {'parameters': run['parameters'],
+                                                                 'seed': run['seed'], 'attempts': 0})
+                record['attempts'] += 1
+                try:
+                    record.update({'status': 'done', 'outputs': future.result()})
+                    record.pop('error', None)
+                    print(f"{run['id']}: done")
+                except Exception as e:
+                    record.update({'status': 'failed', 'outputs': [], 'error': f'{type(e).__name__}: {e}'})
+                    print(f"{run['id']}: failed ({record['error']})")
+                    # a worker process died (e.g. killed when out of memory): the pool fails all its runs and cannot
+                    # take new ones, so the runs are retried in a new pool
+                    if isinstance(e, BrokenProcessPool) and runExecutor is executor:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = ProcessPoolExecutor(max_workers=jobs)
+                    if record['attempts'] <= retries:
+                        futures[executor.submit(execute_run, run, settings)] = (run, executor)
+                write_manifest(manifest, sweep_dir)
+                # resubmitted runs are waited for by the next round of as_completed
+                break
+    finally:
+        executor.shutdown()
+
+    failed = [runId for runId, record in manifest['runs'].items() if record['status'] != 'done']
+    if failed:
+        print(f"{len(failed)} runs failed: {', '.join(failed)}")
+
+    return manifest
+
+
+def parse_sweep_arguments():
+    # "name=value1,value2,..." with values converted as in config.nls
+    def parse_parameter(value):
+        if '=' not in value:
+            raise argparse.ArgumentTypeError(f'{value} is not a parameter, use NAME=VALUE1,VALUE2,...')
+        name, values = value.split('=', 1)
+        converted = []
+        for item in values.split(','):
+            converted.append({"true": True, "false": False}.get(item, item))
+            for convert in (int, float):
+                try:
+                    converted[-1] = convert(item)
+                    break
+                except ValueError:
+                    pass
+        return name, converted
+
+    def parse_seeds(value):
+        match = re.fullmatch(r"(-?\d+)(?:-(-?\d+))?", value)
+        if not match:
+            raise argparse.ArgumentTypeError(f'{value} is not a valid range, use FIRST-LAST or a single value')
+        first = int(match.group(1))
+        seeds = list(range(first, (first if match.group(2) is None else int(match.group(2))) + 1))
+        if 0 in seeds:
+            raise argparse.ArgumentTypeError(f'{value} contains seed 0, which makes the models use a random seed')
+        return seeds
+
+    description = textwrap.dedent('''
+    Simulate every combination of the given parameter values for a range of seeds, on a pool of worker processes.
+    USAGE EXAMPLES:
+    sweep.py -m path/to/unified -o path/to/sweep -p fdelta=0.5,1.0 -p crowdingCutOff=5,6 --seeds 1-10 -j 4
+    sweep.py -m path/to/downstream -o path/to/sweep -p induction=0.01,0.05 --seeds 1-10 --engine netlogo --netlogo path/to/netlogo-headless.sh
+    ''')
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, description=description)
+    parser.add_argument('-m', '--model_dir', help='directory containing the model files', required=True, metavar='PATH')
+    parser.add_argument('-o', '--sweep_dir', help='output directory of the sweep, one model directory per combination',
+                        required=True, metavar='PATH')
+    parser.add_argument('-p', '--parameter', help='config.nls parameter and its values, can be repeated',
+                        type=parse_parameter, action='append', default=[], metavar='NAME=VALUE1,VALUE2,...')
+    parser.add_argument('--seeds', help='range of seeds, DEFAULT: 1', type=parse_seeds, default=[1],
+                        metavar='FIRST-LAST')
+    parser.add_argument('--engine', help='simulation engine, DEFAULT: native', choices=('native', 'netlogo'),
+                        default='native')
+    parser.add_argument('--netlogo', help='netlogo-headless.sh (or .bat) or the netlogo jar, for the netlogo engine',
+                        metavar='PATH')
+    parser.add_argument('-j', '--jobs', help='number of simultaneous runs, DEFAULT:1', type=int, default=1,
+                        metavar='N')
+    parser.add_argument('--retries', help='number of times a failed run is retried, DEFAULT:2', type=int, default=2,
+                        metavar='N')
+    parser.add_argument('--timeout', help='maximum duration of a netlogo run, DEFAULT: no limit', type=float,
+                        metavar='SECONDS')
+    for gridLimit in ['min-pxcor', 'max-pxcor', 'min-pycor', 'max-pycor']:
+        parser.add_argument('--' + gridLimit, help=f'{gridLimit} of the simulated grid, DEFAULT: as in the .nlogo file',
+                            type=int, metavar='N')
+
+    return parser.parse_args()
+
+
+def main():
+    options = parse_sweep_arguments()
+    gridExtent = [options.min_pxcor, options.max_pxcor, options.min_pycor, options.max_pycor]
+
+    manifest = run_sweep(options.model_dir, options.sweep_dir, dict(options.parameter), options.seeds,
+                         options.engine, options.jobs, options.retries, options.netlogo,
+                         None if None in gridExtent else gridExtent, options.timeout)
+    if any(record['status'] != 'done' for record in manifest['runs'].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
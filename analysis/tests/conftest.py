@@ -0,0 +1,69 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# the analysis modules are imported by name, as by main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "models")
+
+
+# results with the accumulators (histograms, running statistics) replaced by their state, so they can be compared
+def get_state(results):
+    if isinstance(results, dict):
+        return {key: get_state(value) for key, value in results.items()}
+    if isinstance(results, (list, tuple)):
+        return [get_state(value) for value in results]
+    if isinstance(results, np.ndarray):
+        return results.tolist()
+    if hasattr(results, '__dict__'):
+        return get_state(vars(results))
+    return results
+
+
+# agents of a full grid with random cell types, clone IDs and mutation statuses, with the columns of parse_netlogo_world
+def get_random_world(gridExtent, seed=0):
+    import pandas as pd
+    from essentials import NEIGHBOR_COLUMNS
+    from topology import get_topology
+
+    topology = get_topology(gridExtent)
+    rng = np.random.default_rng(seed)
+    n = len(topology["xcor"])
+    cellType = rng.choice(["empty", "A", "B", "AA", "AB", "BA", "BB"], size=n)
+    state = np.where(cellType == "empty", "empty", np.where(np.char.str_len(cellType) == 2, "double", "single"))
+    occupied = state != "empty"
+    agents = pd.DataFrame({
+        "who": rng.permutation(n), "xcor": topology["xcor"], "ycor": topology["ycor"],
+        "cell-type": pd.Categorical(cellType), "state": pd.Categorical(state), "time": 0.0,
+        "cloneid": np.where(occupied, rng.integers(0, 20, size=n), 0), "creation-time": 0.0,
+        "mutation-status": pd.Categorical(np.where(occupied, rng.choice(["WT", "p53", "N"], size=n), "0")),
+        "fate-bias": 0.0})
+    whoOfPatch = agents["who"].to_numpy()
+    for i, column in enumerate(NEIGHBOR_COLUMNS):
+        neighbors = topology["six-neighbors"][:, i]
+        agents[column] = np.where(neighbors >= 0, whoOfPatch[neighbors], -1)
+
+    return agents
+
+
+'''
+Simulate the unified model with the native engine in a copy of models/unified, with the given config.nls parameters,
+and return the model directory
+'''
+
+
+@pytest.fixture
+def simulate_unified(tmp_path):
+    from simulation import run_simulation
+    from sweep import copy_model
+
+    def simulate(seed, side=10, name="unified", **parameters):
+        modelDir = str(tmp_path / name)
+        parameters = dict({'sims-duration': 10, 'generate_snapshot': True, 'generate_events': True}, **parameters)
+        copy_model(os.path.join(MODELS_DIR, "unified"), modelDir, parameters)
+        run_simulation(modelDir, seed, [0, side - 1, 0, side - 1])
+        return modelDir
+
+    return simulate
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from benchmark import create_synthetic_model
+from conftest import get_random_world
+from essentials import get_cell_counts, get_cell_populations, get_mutant_percentage, parse_netlogo_world
+from pipeline import get_world_files
+
+
+# the per-population filters that get_cell_counts replaces
+
+def baseline_get_num_of_cells(groupOfAgents):
+    numOfsingle = groupOfAgents[groupOfAgents["state"] == "single"].shape[0]
+    numOfdouble = groupOfAgents[groupOfAgents["state"] == "double"].shape[0]
+
+    return numOfdouble * 2 + numOfsingle
+
+
+def baseline_get_cell_populations(groupOfAgents):
+    numOfAlpha = groupOfAgents[groupOfAgents["cell-type"] == "A"].shape[0]
+    numOfAlpha += (groupOfAgents[groupOfAgents["cell-type"] == "AA"].shape[0]) * 2
+    numOfAlpha += groupOfAgents[groupOfAgents["cell-type"] == "AB"].shape[0]
+    numOfAlpha += groupOfAgents[groupOfAgents["cell-type"] == "BA"].shape[0]
+
+    numOfBeta = groupOfAgents[groupOfAgents["cell-type"] == "B"].shape[0]
+    numOfBeta += (groupOfAgents[groupOfAgents["cell-type"] == "BB"].shape[0]) * 2
+    numOfBeta += groupOfAgents[groupOfAgents["cell-type"] == "AB"].shape[0]
+    numOfBeta += groupOfAgents[groupOfAgents["cell-type"] == "BA"].shape[0]
+
+    numOfDouble = groupOfAgents[groupOfAgents["state"] == "double"].shape[0]
+    numOfEmpty = groupOfAgents[groupOfAgents["state"] == "empty"].shape[0]
+
+    return [numOfAlpha, numOfBeta, numOfDouble, numOfEmpty]
+
+
+def baseline_get_mutant_percentage(groupOfAgents, mutantType):
+    groupOfmutants = groupOfAgents[groupOfAgents["mutation-status"] == mutantType]
+    numOfmutants = baseline_get_num_of_cells(groupOfmutants)
+    numOfTotalCells = baseline_get_num_of_cells(groupOfAgents)
+
+    return (numOfmutants / numOfTotalCells) * 100
+
+
+def assert_counts_equal_baseline(agents):
+    assert get_cell_populations(agents) == baseline_get_cell_populations(agents)
+    for mutantType in ["WT", "p53", "N"]:
+        assert get_mutant_percentage(agents, mutantType) == pytest.approx(
+            baseline_get_mutant_percentage(agents, mutantType))
+
+    counts = get_cell_counts(agents).iloc[0]
+    assert counts["cells"] == baseline_get_num_of_cells(agents)
+    assert counts["agents"] == len(agents)
+
+
+def test_cell_counts_equal_baseline(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=15, numOfClones=10, numOfSeeds=1, numOfWeeks=3)
+
+    for week, seed, path in get_world_files(c):
+        assert_counts_equal_baseline(parse_netlogo_world(path))
+    assert_counts_equal_baseline(get_random_world([0, 13, 0, 7]))
+
+
+def test_grouped_cell_counts_equal_baseline():
+    agents = get_random_world([0, 9, 0, 9], seed=3)
+    groups = np.random.default_rng(3).integers(0, 5, size=len(agents))
+
+    counts = get_cell_counts(agents, groups, 6)
+
+    for group in range(6):
+        groupOfAgents = agents[groups == group]
+        row = counts.iloc[group]
+        assert [row["A"], row["B"], row["D"], row["E"]] == baseline_get_cell_populations(groupOfAgents)
+        assert row["cells"] == baseline_get_num_of_cells(groupOfAgents)
+        for mutantType in ["WT", "p53", "N"]:
+            assert row[mutantType] == baseline_get_num_of_cells(
+                groupOfAgents[groupOfAgents["mutation-status"] == mutantType])
+    # the last group has no agents
+    assert counts.iloc[5].sum() == 0
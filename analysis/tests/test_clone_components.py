@@ -0,0 +1,59 @@
+import networkx as nx
+import pandas as pd
+import pytest
+from benchmark import create_synthetic_model
+from essentials import NEIGHBOR_COLUMNS, get_clone_components, get_clone_graph, parse_netlogo_world
+from pipeline import get_world_files
+from topology import get_topology
+
+GRID = [0, 5, 0, 5]
+
+
+# agents of a 6 x 6 grid numbered by patch, given the (state, cloneid) of the occupied patches, all others empty
+def get_grid_agents(cells):
+    neighbors = get_topology(GRID)["six-neighbors"]
+    agents = pd.DataFrame({"who": range(36), "state": "empty", "cloneid": 0})
+    for patch, (state, cloneid) in cells.items():
+        agents.loc[patch, ["state", "cloneid"]] = [state, cloneid]
+    for i, column in enumerate(NEIGHBOR_COLUMNS):
+        agents[column] = neighbors[:, i]
+
+    return agents
+
+
+def get_graph_components(agents, cloneid):
+    cloneAgents = agents[(agents["cloneid"] == cloneid) & agents["state"].isin(["single", "double"])]
+    return nx.number_connected_components(get_clone_graph(cloneAgents))
+
+
+def test_components_equal_clone_graph(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=20, numOfClones=30, numOfSeeds=1, numOfWeeks=3)
+
+    for week, seed, path in get_world_files(c):
+        agents = parse_netlogo_world(path)
+        components = get_clone_components(agents)
+
+        cloneids = set(agents.loc[agents["state"].isin(["single", "double"]), "cloneid"]) - {0}
+        assert set(components.index) == cloneids
+        for cloneid in cloneids:
+            expected = get_graph_components(agents, cloneid)
+            assert components.loc[cloneid, "components"] == expected
+            assert components.loc[cloneid, "fragmented"] == (expected > 1)
+        assert components["fragmented"].any() and not components["fragmented"].all()
+
+
+@pytest.mark.parametrize("cells, expected", [
+    # the two cells of a double without neighbouring cells of its clone are not connected
+    ({0: ("double", 1), 1: ("single", 2)}, 2),
+    # a single connects both cells of a neighbouring double
+    ({14: ("double", 1), 15: ("single", 1)}, 1),
+    # two islands of the same clone
+    ({0: ("single", 1), 1: ("double", 1), 21: ("single", 1), 22: ("single", 1)}, 2),
+])
+def test_hand_built_components(cells, expected):
+    agents = get_grid_agents(cells)
+
+    components = get_clone_components(agents)
+
+    assert components.loc[1, "components"] == expected == get_graph_components(agents, 1)
+    assert components.loc[1, "fragmented"] == (expected > 1)
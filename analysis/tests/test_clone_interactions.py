@@ -0,0 +1,45 @@
+import pandas as pd
+from cloneInteractions import get_clone_interactions, initCloneInteractions, updateCloneInteractions
+from essentials import NEIGHBOR_COLUMNS
+from topology import get_topology
+
+# occupied patches of a 6 x 6 grid, as (state, cloneid, mutation status):
+#  - WT clone 1: a single (14) next to a double (15)
+#  - N clone 2: two neighbouring singles (20, 21) and a third single (13) that does not touch them, in contact with
+#    clone 1 through 4 pairs of agents (13-14, 14-20, 15-20, 15-21), in both orders of their who numbers
+#  - p53 clone 3: two singles that are not neighbours, 8 touching clone 1 (8-14, 8-15) and 33 touching nothing
+#  - WT clone 4: an isolated double (0), whose two cells are not connected
+CELLS = {14: ("single", 1, "WT"), 15: ("double", 1, "WT"),
+         13: ("single", 2, "N"), 20: ("single", 2, "N"), 21: ("single", 2, "N"),
+         8: ("single", 3, "p53"), 33: ("single", 3, "p53"),
+         0: ("double", 4, "WT")}
+
+
+def get_grid_agents():
+    neighbors = get_topology([0, 5, 0, 5])["six-neighbors"]
+    agents = pd.DataFrame({"who": range(36), "state": "empty", "cloneid": 0, "mutation-status": "0"})
+    for patch, cell in CELLS.items():
+        agents.loc[patch, ["state", "cloneid", "mutation-status"]] = list(cell)
+    for i, column in enumerate(NEIGHBOR_COLUMNS):
+        agents[column] = neighbors[:, i]
+
+    return agents
+
+
+def test_clone_interactions_of_a_hand_built_grid():
+    boundaryLength, statistics = get_clone_interactions(get_grid_agents())
+
+    assert boundaryLength == {"N": 4, "p53": 2}
+    # the clone pairs 1-2 and 1-3 are counted once each, whatever the number of agent pairs in contact
+    assert statistics["neighboringClones"].to_dict() == {"N": 1.0, "WT": 1.0, "p53": 1.0}
+    assert statistics["fragmentationRate"].to_dict() == {"N": 1.0, "WT": 0.5, "p53": 1.0}
+
+
+def test_update_clone_interactions():
+    results = initCloneInteractions({})
+    for week in [3, 4]:
+        updateCloneInteractions(results, week, get_grid_agents(), {})
+
+    assert results['boundaryLengthPerWeek'] == {"N": {3: [4], 4: [4]}, "p53": {3: [2], 4: [2]}}
+    assert results['neighboringClonesPerWeek']["WT"] == {3: [1.0], 4: [1.0]}
+    assert results['fragmentationRatePerWeek']["p53"] == {3: [1.0], 4: [1.0]}
@@ -0,0 +1,68 @@
+import pandas as pd
+from benchmark import create_synthetic_model
+from essentials import get_clone_summary, parse_netlogo_world
+from pipeline import get_world_files
+
+
+# the per-clone dataframes that get_clone_summary replaces
+
+def baseline_get_clones(agents):
+    agents = agents[agents["cloneid"] != 0]
+    cloneIDs = agents['cloneid'].unique()
+    clones = {elem: pd.DataFrame for elem in cloneIDs}
+    for cloneID in clones.keys():
+        clones[cloneID] = agents[agents['cloneid'] == cloneID].reset_index(drop=True)
+
+    return clones
+
+
+def baseline_split_clones(clones):
+    mutants = {}
+    wt = {}
+    for cloneID, cloneAgents in clones.items():
+        mutation_status = cloneAgents.loc[0, "mutation-status"]
+        if mutation_status == "WT":
+            wt.setdefault(cloneID, pd.DataFrame)
+            wt[cloneID] = cloneAgents
+        if mutation_status == "p53":
+            mutants.setdefault("p53", {}).setdefault(cloneID, pd.DataFrame)
+            mutants["p53"][cloneID] = cloneAgents
+        if mutation_status == "N":
+            mutants.setdefault("N", {}).setdefault(cloneID, pd.DataFrame)
+            mutants["N"][cloneID] = cloneAgents
+
+    return [mutants, wt]
+
+
+def baseline_get_num_of_cells(groupOfAgents):
+    numOfsingle = groupOfAgents[groupOfAgents["state"] == "single"].shape[0]
+    numOfdouble = groupOfAgents[groupOfAgents["state"] == "double"].shape[0]
+
+    return numOfdouble * 2 + numOfsingle
+
+
+def test_clone_summary_equals_baseline_clones(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=20, numOfClones=30, numOfSeeds=1, numOfWeeks=3)
+
+    for week, seed, path in get_world_files(c):
+        agents = parse_netlogo_world(path)
+        clones = baseline_get_clones(agents)
+        mutants, wt = baseline_split_clones(clones)
+
+        summary = get_clone_summary(agents)
+
+        # clones are listed in order of appearance
+        assert list(summary.index) == list(clones.keys())
+        for cloneID, cloneAgents in clones.items():
+            clone = summary.loc[cloneID]
+            assert clone["mutation-status"] == cloneAgents.loc[0, "mutation-status"]
+            assert clone["singles"] == (cloneAgents["state"] == "single").sum()
+            assert clone["doubles"] == (cloneAgents["state"] == "double").sum()
+            assert clone["cells"] == baseline_get_num_of_cells(cloneAgents)
+            assert (clone["xmin"], clone["xmax"]) == (cloneAgents["xcor"].min(), cloneAgents["xcor"].max())
+            assert (clone["ymin"], clone["ymax"]) == (cloneAgents["ycor"].min(), cloneAgents["ycor"].max())
+
+        assert list(summary.index[summary["mutation-status"] == "WT"]) == list(wt.keys())
+        for mutant in ["p53", "N"]:
+            assert list(summary.index[summary["mutation-status"] == mutant]) == list(mutants.get(mutant, {}).keys())
+        assert set(mutants) == {"p53", "N"}
@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from essentials import FATE_OUTCOMES, parse_config_parameters, parse_netlogo_events
+from simulation import A, B, MUTATION_STATUSES, UnifiedModel
+from sweep import copy_model
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "models", "unified")
+
+
+# the engine, counting its divisions and stratifications per week, mutation status and fate outcome
+class CountingModel(UnifiedModel):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.counts = []
+
+    def divide(self, i, divisionType):
+        outcome = {(A, A): "AA", (A, B): "AB", (B, A): "AB", (B, B): "BB"}[divisionType]
+        self.counts.append((int(self.currentTime), MUTATION_STATUSES[self.mutation[i]], 'divisions', outcome))
+        super().divide(i, divisionType)
+
+    def stratify(self, i):
+        self.counts.append((int(self.currentTime), MUTATION_STATUSES[self.mutation[i]], 'stratifications', None))
+        super().stratify(i)
+
+
+def test_event_counts_equal_engine_counts(tmp_path):
+    modelDir = str(tmp_path / "unified")
+    # mutants are induced at week 2, so the counts of several mutation statuses change within the run
+    copy_model(MODEL_DIR, modelDir, {'sims-duration': 12, 'induction': 0.1, 'notch-induction-time': 2,
+                                     'p53-induction-time': 2})
+    eventFile = str(tmp_path / "events.csv")
+    model = CountingModel(parse_config_parameters(os.path.join(modelDir, "config.nls")), [0, 11, 0, 11], 7)
+    model.run(str(tmp_path / "snapshots.csv"), eventFile)
+
+    counts = parse_netlogo_events(eventFile)
+    assert sorted(counts) == ["N", "WT", "p53"]
+
+    numOfWeeks = len(counts["WT"]['divisions'])
+    assert numOfWeeks == max(week for week, status, kind, outcome in model.counts) + 1
+    assert sorted(counts) == sorted({status for week, status, kind, outcome in model.counts})
+    for status, statusCounts in counts.items():
+        for kind in ['divisions', 'stratifications']:
+            expected = np.bincount([week for week, s, k, outcome in model.counts if s == status and k == kind],
+                                   minlength=numOfWeeks)
+            assert np.array_equal(statusCounts[kind], expected)
+        for fateOutcome in FATE_OUTCOMES:
+            expected = np.bincount([week for week, s, k, outcome in model.counts
+                                    if s == status and outcome == fateOutcome], minlength=numOfWeeks)
+            assert np.array_equal(statusCounts[fateOutcome], expected)
+        assert np.array_equal(sum(statusCounts[fateOutcome] for fateOutcome in FATE_OUTCOMES),
+                              statusCounts['divisions'])
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import pytest
+import main
+from benchmark import create_synthetic_model
+from instrumentation import METRICS_FILE, read_metrics
+from workflows import load_workflows
+
+
+def analyse(monkeypatch, modelDir, *arguments):
+    monkeypatch.setattr(sys, 'argv', ["main.py", "-m", modelDir, "-a", "cellPopulations,averageCloneSize",
+                                      *arguments, "save"])
+    main.main()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_metrics_record_every_stage(tmp_path, monkeypatch, jobs):
+    create_synthetic_model(str(tmp_path), side=10, numOfClones=4, numOfSeeds=2, numOfWeeks=3)
+
+    analyse(monkeypatch, str(tmp_path), "-j", str(jobs), "--metrics")
+
+    # one run is recorded in the metrics file of the model directory
+    runs = set()
+    with open(tmp_path / METRICS_FILE) as fh:
+        runs.update(json.loads(line)['run'] for line in fh)
+    assert len(runs) == 1
+    records = read_metrics({'file': str(tmp_path / METRICS_FILE), 'run': runs.pop()})
+
+    stages = {}
+    for record in records:
+        stages.setdefault(record['stage'], []).append(record)
+    numOfFiles = 6
+    workflows = [workflow['name'] for workflow in load_workflows(['cellPopulations', 'averageCloneSize'])]
+    assert {stage: len(stageRecords) for stage, stageRecords in stages.items()} == \
+           {'catalogue': 1, 'file': numOfFiles, 'read': numOfFiles, 'update': numOfFiles * len(workflows),
+            'analysis': 1, 'save': len(workflows), 'plot': len(workflows), 'render': 1}
+    assert sorted(record['workflow'] for record in stages['save']) == sorted(workflows)
+    assert sum(record['rows'] for record in stages['read']) == numOfFiles * 100
+    assert all(record['wall'] >= 0 and record['cpu'] >= 0 and record['max_rss_bytes'] > 0 for record in records)
+
+    # the world files of -j N are analysed and recorded by the worker processes
+    workerPids = {record['pid'] for stage in ['file', 'read', 'update'] for record in stages[stage]}
+    if jobs == 1:
+        assert workerPids == {os.getpid()}
+    else:
+        assert os.getpid() not in workerPids
+    assert {record['pid'] for record in stages['catalogue'] + stages['save'] + stages['render']} == {os.getpid()}
+
+
+def test_metrics_are_not_written_without_the_option(tmp_path, monkeypatch):
+    create_synthetic_model(str(tmp_path), side=10, numOfClones=4, numOfSeeds=2, numOfWeeks=3)
+
+    analyse(monkeypatch, str(tmp_path), "-j", "2")
+
+    assert not os.path.exists(tmp_path / METRICS_FILE)
+    assert os.path.exists(tmp_path / "analysis_output")
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from essentials import get_feedback_bias, get_neighborhood_density, parse_config_parameters, parse_netlogo_snapshots
+from neighborhoodDensity import get_neighborhood_feedback
+from simulation import CELL_TYPES, MUTATION_STATUSES, UnifiedModel
+
+
+def test_density_and_bias_equal_engine(simulate_unified):
+    # p53 and N mutants are induced at week 1, with a low cut off so that all three rules apply
+    modelDir = simulate_unified(seed=4, side=12, **{'sims-duration': 6, 'induction': 0.2, 'notch-induction-time': 1,
+                                                    'p53-induction-time': 1, 'crowdingCutOff': 5})
+    parameters = parse_config_parameters(os.path.join(modelDir, "config.nls"))
+    model = UnifiedModel(parameters, [0, 11, 0, 11], 4)
+    biases = set()
+
+    for week, agents in parse_netlogo_snapshots(os.path.join(modelDir, "netlogo_output", "snapshots", "unified_4.csv")):
+        model.cellType = [CELL_TYPES.index(cellType) for cellType in agents["cell-type"].astype(str)]
+        model.mutation = [MUTATION_STATUSES.index(status) for status in agents["mutation-status"].astype(str)]
+        density = [model.num_of_cells(model.sixNeighbors[i]) for i in agents["who"]]
+        bias = [model.density_bias(density[i], model.mutation[i]) for i in range(len(agents))]
+        biases.update(bias)
+
+        assert get_neighborhood_density(agents).tolist() == density
+        assert get_feedback_bias(density, agents["mutation-status"], parameters).tolist() == bias
+
+        feedback = get_neighborhood_feedback(agents, parameters)
+        occupied = (agents["state"].astype(str) != "empty").to_numpy()
+        assert feedback["density"].tolist() == np.array(density)[occupied].tolist()
+        assert feedback["feedback-bias"].tolist() == np.array(bias)[occupied].tolist()
+        assert feedback["crowded"].tolist() == (np.array(density)[occupied] > 5).tolist()
+    assert set(feedback["mutation-status"]) == {"WT", "p53", "N"}
+    assert biases == {parameters['fdelta'], 0, -parameters['fdelta'], -parameters['p53delta']}
+
+
+DENSITIES = [3, 5, 6, 7, 9]
+STATUSES = ["WT", "p53", "N", "p53", "WT"]
+
+
+@pytest.mark.parametrize("parameters, expected", [
+    # density-bias of the downstream model: p53 mutants are biased to differentiate above the cut off
+    ({'model': 'downstream', 'densityBias': True, 'crowdingCutOff': 6, 'delta': 0.5}, [0, 0, 0, -0.5, 0]),
+    # upstream model: every cell is biased to divide below the cut off and to differentiate above it
+    ({'model': 'upstream', 'densityBias': True, 'crowdingCutOff': 6, 'fdelta': 0.8}, [0.8, 0.8, 0, -0.8, -0.8]),
+    # unified model: upstream rule for WT and N cells, downstream rule for p53 mutants
+    ({'model': 'unified', 'densityBias': True, 'crowdingCutOff': 6, 'fdelta': 0.8, 'p53delta': 0.95},
+     [0.8, 0, 0, -0.95, -0.8]),
+    ({'model': 'upstream', 'densityBias': False, 'crowdingCutOff': 6, 'fdelta': 0.8}, [0, 0, 0, 0, 0]),
+    ({'model': 'unified', 'densityBias': False, 'crowdingCutOff': 6, 'fdelta': 0.8, 'p53delta': 0.95},
+     [0, 0, 0, 0, 0]),
+])
+def test_feedback_bias_rules(parameters, expected):
+    assert get_feedback_bias(DENSITIES, STATUSES, parameters).tolist() == expected
+
+
+def test_density_of_doubles_and_missing_neighbors():
+    # a line of agents: empty, single, double, and a neighbour (who 9) that is not part of the agents
+    agents = pd.DataFrame({"who": [0, 1, 2], "state": ["empty", "single", "double"]})
+    neighbors = [[1, 2, 9, -1, -1, -1], [0, 2, -1, -1, -1, -1], [0, 1, -1, -1, -1, -1]]
+    for i in range(6):
+        agents[f"six-neighbors-{i}"] = [row[i] for row in neighbors]
+
+    assert get_neighborhood_density(agents).tolist() == [3, 2, 1]
@@ -0,0 +1,76 @@
+import pandas as pd
+from benchmark import create_synthetic_model
+from essentials import NEIGHBOR_COLUMNS, parse_neighbors_strings, parse_netlogo_world
+from pipeline import get_world_files
+
+
+# the string parser and the world parser that parse_neighbors_strings and parse_netlogo_world replace
+
+def baseline_parse_neighbors_string(string):
+    neighbors = string.split(' ')
+    neighbors.pop(0)
+    neighbors[-1] = neighbors[-1][:-1]
+    return [int(n) for n in neighbors]
+
+
+def baseline_parse_netlogo_world(csv):
+    top_rows_to_exclude = 0
+    bottom_rows_to_exclude = 0
+    with open(csv) as f:
+        for i, l in enumerate(f):
+            if l.startswith("\"TURTLES\""):
+                top_rows_to_exclude = i + 1
+            if l.startswith("\"PATCHES\""):
+                bottom_rows_to_exclude = i - 1
+
+    df = pd.read_csv(csv, skiprows=top_rows_to_exclude, nrows=bottom_rows_to_exclude - top_rows_to_exclude - 1)
+    df = df.loc[:, ["who", "xcor", "ycor", "six-neighbors", "cell-type", "state", "time", "cloneid", "creation-time",
+                    "mutation-status", "fate-bias"]]
+    for column in ["cell-type", "state", "mutation-status"]:
+        df[column] = df[column].apply(lambda x: x.replace('"', ''))
+    df["six-neighbors"] = df["six-neighbors"].apply(lambda x: baseline_parse_neighbors_string(x))
+
+    return df
+
+
+def assert_world_equals_baseline(agents, expected, ordered):
+    columns = ["who", "xcor", "ycor", "cell-type", "state", "time", "cloneid", "creation-time", "mutation-status",
+               "fate-bias"]
+    actual = agents[columns].copy()
+    for column in ["cell-type", "state", "mutation-status"]:
+        actual[column] = actual[column].astype(str).astype(object)
+    pd.testing.assert_frame_equal(actual, expected[columns], check_dtype=False)
+
+    neighbors = [[j for j in row if j >= 0] for row in agents[NEIGHBOR_COLUMNS].to_numpy().tolist()]
+    if not ordered:
+        neighbors = [sorted(row) for row in neighbors]
+        expected = expected.assign(**{"six-neighbors": expected["six-neighbors"].apply(sorted)})
+    assert neighbors == expected["six-neighbors"].tolist()
+
+
+def test_neighbors_strings_equal_baseline():
+    strings = pd.Series(["{turtles 26 48 43 39 33 91}", "{turtles 3 1}", "{turtles 7}", "{turtles 0 12 5 9 1 4}"])
+
+    expected = [baseline_parse_neighbors_string(string) for string in strings]
+    assert [[j for j in row if j >= 0] for row in parse_neighbors_strings(strings).tolist()] == expected
+    assert parse_neighbors_strings(pd.Series(["{turtles}"])).tolist() == [[-1] * 6]
+
+
+def test_world_equals_baseline(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=12, numOfClones=5, numOfSeeds=1, numOfWeeks=2)
+
+    for week, seed, path in get_world_files(c):
+        expected = baseline_parse_netlogo_world(path)
+        # the neighbours of a full grid are taken from the topology, in the order of define-neighbors
+        assert_world_equals_baseline(parse_netlogo_world(path), expected, ordered=False)
+
+        # a world that is not a full grid is parsed from its six-neighbors strings, in their order
+        with open(path) as fh:
+            lines = fh.read().split("\n")
+        patches = lines.index('"PATCHES"')
+        partial = str(tmp_path / "partial.csv")
+        with open(partial, 'w') as fh:
+            fh.write("\n".join(lines[:patches - 2] + lines[patches - 1:]))
+        expected = baseline_parse_netlogo_world(partial)
+        assert len(expected) == 143
+        assert_world_equals_baseline(parse_netlogo_world(partial), expected, ordered=True)
@@ -0,0 +1,48 @@
+import argparse
+import os
+from benchmark import create_synthetic_model
+from conftest import get_state
+from pipeline import run_workflows
+from workflows import WORKFLOWS, load_workflows
+
+
+def test_week_range_not_starting_at_zero(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=10, numOfClones=5, numOfSeeds=2, numOfWeeks=25)
+    c['week_range'] = [18, 24]
+
+    results = run_workflows(c, argparse.Namespace(var='save', jobs=1), load_workflows(list(WORKFLOWS)))
+
+    weeks = list(range(18, 25))
+    assert sorted(results['cellPopulations']['cellPopulations']) == weeks
+    assert sorted(results['rho']['rhoPerWeek']) == weeks
+    assert sorted(results['cellDensity']['cellDensityPerWeek']) == weeks
+    assert sorted(results['averageCloneSize']['totalWTCloneSizePerWeek']) == weeks
+    assert sorted(results['cloneSizeDistribution']['WTnumberOfClones']) == weeks
+    assert all(len(values) == 2 for values in results['rho']['rhoPerWeek'].values())
+    assert os.path.exists(os.path.join(c['analysis_output'], "boxplot_WT_clone_size.png"))
+
+
+def test_update_rebuild_merges_in_seed_order(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=8, numOfClones=3, numOfSeeds=11, numOfWeeks=2)
+    workflows = load_workflows(['rho', 'cellPopulations'])
+
+    saved = run_workflows(c, argparse.Namespace(var='save', jobs=1), workflows)
+    run_workflows(c, argparse.Namespace(var='update', jobs=1), workflows)
+
+    # a changed world file rebuilds the results from the partial results of all the files
+    path = os.path.join(c['netlogo_output'], "unified_0_2.csv")
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    updated = run_workflows(c, argparse.Namespace(var='update', jobs=1), workflows)
+
+    assert updated['rho']['rhoPerWeek'] == saved['rho']['rhoPerWeek']
+    assert updated['mutantPercentage'] == saved['mutantPercentage']
+
+
+def test_parallel_results_equal_serial_results(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=10, numOfClones=5, numOfSeeds=3, numOfWeeks=4)
+    workflows = load_workflows(list(WORKFLOWS))
+
+    serial = run_workflows(c, argparse.Namespace(var='save', jobs=1), workflows)
+    parallel = run_workflows(c, argparse.Namespace(var='save', jobs=2), workflows)
+
+    assert get_state(parallel) == get_state(serial)
@@ -0,0 +1,46 @@
+import os
+from render import read_figure_cache, render_figure, render_figures, rendering_stage
+
+
+def get_lines(directory, name, y):
+    return ('lines', {
+        'data': {'x': {'run': [0, 1, 2]}, 'y': {'run': (y, 'b-', [], None, None, None)}},
+        'xlabel': 'Weeks',
+        'ylabel': 'Value',
+        'title': name,
+        'savefig': os.path.join(str(directory), name + ".png"),
+    })
+
+
+def test_unchanged_figures_are_not_rendered_again(tmp_path):
+    figures = [get_lines(tmp_path, "first", [1, 2, 3]), get_lines(tmp_path, "second", [3, 2, 1])]
+
+    assert render_figures(figures) == 2
+    assert sorted(read_figure_cache(str(tmp_path))) == ["first.png", "second.png"]
+    mtime = os.stat(tmp_path / "second.png").st_mtime_ns
+
+    # only the figure whose data changed is redrawn
+    assert render_figures([get_lines(tmp_path, "first", [1, 2, 4]), figures[1]]) == 1
+    assert os.stat(tmp_path / "second.png").st_mtime_ns == mtime
+
+    # a deleted figure is redrawn
+    os.remove(tmp_path / "second.png")
+    assert render_figures(figures) == 2
+    assert os.path.exists(tmp_path / "second.png")
+
+
+def test_rendering_stage_renders_in_worker_processes(tmp_path):
+    with rendering_stage(jobs=2) as counts:
+        for i in range(3):
+            render_figure(*get_lines(tmp_path, f"figure{i}", [i, i + 1, i + 2]))
+        # figures are rendered at the end of the stage
+        assert not os.path.exists(tmp_path / "figure0.png")
+
+    assert counts == {'figures': 3, 'rendered': 3}
+    assert all(os.path.exists(tmp_path / f"figure{i}.png") for i in range(3))
+
+    with rendering_stage(jobs=2) as counts:
+        for i in range(3):
+            render_figure(*get_lines(tmp_path, f"figure{i}", [i, i + 1, i + 2]))
+
+    assert counts == {'figures': 3, 'rendered': 0}
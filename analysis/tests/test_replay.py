@@ -0,0 +1,46 @@
+import os
+import pandas as pd
+import pytest
+from essentials import parse_netlogo_snapshots
+from replay import AGENT_COLUMNS, EventLogReplay, parse_netlogo_run, replay_event_log
+
+
+def get_run_files(modelDir, seed):
+    output = os.path.join(modelDir, "netlogo_output")
+    return os.path.join(output, "snapshots", f"unified_{seed}.csv"), os.path.join(output, "events", f"unified_{seed}.csv")
+
+
+# the seeds cover weeks that start with simultaneous events (daughters released by a stratification)
+@pytest.mark.parametrize("seed", [1, 3, 5, 8])
+def test_replay_equals_snapshots(simulate_unified, seed):
+    snapshotFile, eventFile = get_run_files(simulate_unified(seed=seed), seed)
+
+    snapshots = list(parse_netlogo_snapshots(snapshotFile))
+    replayed = list(replay_event_log(eventFile))
+
+    assert [week for week, agents in replayed] == [week for week, agents in snapshots]
+    for (week, agents), (replayedWeek, replayedAgents) in zip(snapshots, replayed):
+        pd.testing.assert_frame_equal(replayedAgents, agents, check_categorical=False, check_dtype=False)
+
+
+def test_replay_of_a_week_range(simulate_unified):
+    snapshotFile, eventFile = get_run_files(simulate_unified(seed=2), 2)
+
+    snapshots = dict(parse_netlogo_run(snapshotFile, (4, 6)))
+    replayed = dict(parse_netlogo_run(eventFile, (4, 6)))
+
+    assert sorted(replayed) == sorted(snapshots) == [4, 5, 6]
+    for week in snapshots:
+        pd.testing.assert_frame_equal(replayed[week], snapshots[week], check_categorical=False, check_dtype=False)
+
+
+def test_replay_backwards_in_time(simulate_unified):
+    snapshotFile, eventFile = get_run_files(simulate_unified(seed=2), 2)
+    replay = EventLogReplay(eventFile)
+
+    later = replay.get_agents(7.5)
+    earlier = replay.get_agents(2.5)
+
+    fresh = EventLogReplay(eventFile)
+    for time, agents in [(2.5, earlier), (7.5, later)]:
+        pd.testing.assert_frame_equal(fresh.get_agents(time)[AGENT_COLUMNS], agents[AGENT_COLUMNS])
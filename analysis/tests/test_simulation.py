@@ -0,0 +1,55 @@
+import filecmp
+import os
+from essentials import NEIGHBOR_COLUMNS, parse_config_parameters, parse_netlogo_snapshots
+from simulation import CELL_COUNT, CELL_TYPES, STATES, UnifiedModel
+from sweep import copy_model
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "models", "unified")
+
+
+def get_snapshot_file(modelDir, seed):
+    return os.path.join(modelDir, "netlogo_output", "snapshots", f"unified_{seed}.csv")
+
+
+def test_snapshots_are_read_by_the_analysis(simulate_unified):
+    modelDir = simulate_unified(seed=3, side=10, **{'sims-duration': 8})
+
+    snapshots = list(parse_netlogo_snapshots(get_snapshot_file(modelDir, 3)))
+
+    assert [week for week, agents in snapshots] == list(range(9))
+    states = dict(zip(CELL_TYPES, STATES))
+    cellCounts = dict(zip(CELL_TYPES, CELL_COUNT))
+    for week, agents in snapshots:
+        assert len(agents) == 100
+        assert sorted(agents["who"]) == list(range(100))
+        assert (agents["state"].astype(str) == agents["cell-type"].astype(str).map(states)).all()
+        # every agent has six neighbours on the hexagonal torus
+        assert (agents[NEIGHBOR_COLUMNS].to_numpy() >= 0).all()
+        # the basal layer neither empties nor fills up with doubles
+        assert 0 < agents["cell-type"].astype(str).map(cellCounts).sum() < 200
+
+
+def test_runs_are_reproducible(simulate_unified):
+    first = simulate_unified(seed=5, name="first")
+    second = simulate_unified(seed=5, name="second")
+    other = simulate_unified(seed=6, name="other")
+
+    assert filecmp.cmp(get_snapshot_file(first, 5), get_snapshot_file(second, 5), shallow=False)
+    assert not filecmp.cmp(get_snapshot_file(first, 5), get_snapshot_file(other, 6), shallow=False)
+
+
+def test_parameters_are_not_changed_by_a_run(tmp_path):
+    modelDir = str(tmp_path / "unified")
+    copy_model(MODEL_DIR, modelDir, {'sims-duration': 4, 'induction': 0.2, 'notch-induction-time': 1,
+                                     'p53-induction-time': 1})
+    parameters = parse_config_parameters(os.path.join(modelDir, "config.nls"))
+    expected = dict(parameters)
+
+    # mutants are induced in every model built from the same parameters
+    for name in ["first", "second"]:
+        snapshotFile = str(tmp_path / f"{name}.csv")
+        UnifiedModel(parameters, [0, 9, 0, 9], 1).run(snapshotFile)
+        week, agents = list(parse_netlogo_snapshots(snapshotFile))[-1]
+        assert set(agents["mutation-status"].astype(str)) >= {"p53", "N"}
+
+    assert parameters == expected
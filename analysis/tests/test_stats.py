@@ -0,0 +1,90 @@
+import math
+import numpy as np
+import pytest
+from matplotlib import cbook
+from render import render_figures
+from stats import Histogram, IntegerHistogram, RunningStats, get_mean_std
+
+rng = np.random.default_rng(1)
+SAMPLE = rng.geometric(0.05, size=1001)
+
+
+# accumulators of the two halves of a sample, merged
+def get_merged(accumulator, sample):
+    first, second = accumulator(), accumulator()
+    first.extend(sample[:len(sample) // 3])
+    for value in sample[len(sample) // 3:]:
+        second.add(value)
+    return first.merge(second)
+
+
+@pytest.mark.parametrize("accumulator", [RunningStats, IntegerHistogram, lambda: Histogram(0.5)])
+def test_merged_mean_std_equal_numpy(accumulator):
+    merged = get_merged(accumulator, SAMPLE)
+
+    assert merged.count == SAMPLE.size
+    # the standard deviation of the baseline is numpy's population standard deviation (ddof=0)
+    assert merged.mean == pytest.approx(np.mean(SAMPLE))
+    assert merged.std == pytest.approx(np.std(SAMPLE))
+    assert get_mean_std(merged) == pytest.approx((np.mean(SAMPLE), np.std(SAMPLE)))
+    assert get_mean_std(list(SAMPLE)) == pytest.approx((np.mean(SAMPLE), np.std(SAMPLE)))
+
+
+def test_merging_empty_accumulators():
+    stats = RunningStats().merge(RunningStats())
+    assert stats.count == 0
+    assert math.isnan(stats.std)
+
+    histogram = IntegerHistogram()
+    histogram.extend([])
+    assert histogram.merge(IntegerHistogram()).count == 0
+    assert math.isnan(histogram.mean) and math.isnan(histogram.std)
+
+    # values that are not finite are not binned
+    histogram = Histogram(0.5)
+    histogram.extend([np.nan, np.inf])
+    assert histogram.count == 0 and histogram.bins == {}
+
+    with pytest.raises(ValueError):
+        Histogram(0.5).merge(Histogram(1.0))
+
+
+@pytest.mark.parametrize("sample", [SAMPLE, np.array([7]), np.array([1, 1, 2, 9, 9, 9, 40])])
+def test_integer_histogram_quantiles_and_boxplot_stats(sample):
+    histogram = get_merged(IntegerHistogram, sample)
+
+    for q in [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]:
+        assert histogram.quantile(q) == pytest.approx(np.quantile(sample, q))
+    assert (histogram.min, histogram.max) == (sample.min(), sample.max())
+
+    stats = histogram.boxplot_stats()
+    [expected] = cbook.boxplot_stats(sample)
+    for key in ['med', 'q1', 'q3', 'mean', 'whislo', 'whishi']:
+        assert stats[key] == pytest.approx(expected[key]), key
+    assert sorted(set(stats['fliers'])) == sorted(set(expected['fliers']))
+
+
+def test_boxplot_stats_of_an_empty_histogram(tmp_path):
+    stats = IntegerHistogram().boxplot_stats()
+
+    assert all(math.isnan(stats[key]) for key in ['med', 'q1', 'q3', 'mean', 'whislo', 'whishi'])
+    assert stats['fliers'].size == 0
+
+    # an empty box is drawn next to the others
+    boxes = [dict(stats, label=20), dict(get_merged(IntegerHistogram, SAMPLE).boxplot_stats(), label=40)]
+    d = {'boxes': boxes, 'xlabel': 'Week', 'ylabel': 'Clone size', 'title': 'WT',
+         'savefig': str(tmp_path / "boxplot.png")}
+    assert render_figures([('boxplots', d)]) == 1
+    assert (tmp_path / "boxplot.png").exists()
+
+
+def test_histogram_rebin_equals_numpy():
+    # values at the centres of the bins of the histogram are binned as by numpy
+    values = (rng.integers(0, 50, size=500) + 0.5) * 0.2
+    histogram = get_merged(lambda: Histogram(0.2), values)
+
+    edges, counts = histogram.rebin(10)
+    expectedCounts, expectedEdges = np.histogram(values, bins=10)
+
+    assert edges == pytest.approx(expectedEdges)
+    assert counts.tolist() == expectedCounts.tolist()
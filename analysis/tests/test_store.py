@@ -0,0 +1,38 @@
+import argparse
+import os
+import pandas as pd
+from benchmark import create_synthetic_model
+from conftest import get_state
+from essentials import parse_netlogo_world
+from pipeline import get_world_files, run_workflows
+from store import update_snapshot_store
+from workflows import WORKFLOWS, load_workflows
+
+
+def test_store_snapshots_equal_world_files(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=10, numOfClones=5, numOfSeeds=2, numOfWeeks=4)
+    c['snapshot_store'] = os.path.join(c['netlogo_output'], "store/")
+    worldFiles = get_world_files(c)
+    store = update_snapshot_store(c, worldFiles)
+
+    for week, seed, path in worldFiles:
+        assert store.contains(path)
+        [(storedWeek, agents)] = list(store.get_snapshots(path))
+        expected = parse_netlogo_world(path).sort_values("who").reset_index(drop=True)
+        # the time column is not stored
+        columns = agents.columns.drop("time")
+        assert storedWeek == week
+        pd.testing.assert_frame_equal(agents[columns], expected[columns], check_categorical=False, check_dtype=False)
+
+
+def test_store_results_equal_csv_results(tmp_path):
+    c = create_synthetic_model(str(tmp_path), side=10, numOfClones=5, numOfSeeds=2, numOfWeeks=6)
+    workflows = load_workflows(list(WORKFLOWS))
+
+    csvResults = run_workflows(c, argparse.Namespace(var='save', jobs=1), workflows)
+
+    c['snapshot_store'] = os.path.join(c['netlogo_output'], "store/")
+    update_snapshot_store(c, get_world_files(c))
+    storeResults = run_workflows(c, argparse.Namespace(var='save', jobs=1), workflows)
+
+    assert get_state(storeResults) == get_state(csvResults)
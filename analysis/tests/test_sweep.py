@@ -0,0 +1,28 @@
+import os
+import pytest
+import sweep
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "models", "unified")
+
+
+def crash_first_run(run, settings):
+    # the worker process of the first run dies, as when it is killed for memory
+    marker = os.path.join(settings['sweep_dir'], "crashed")
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return []
+
+
+def test_seed_zero_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        sweep.run_sweep(MODEL_DIR, str(tmp_path), {}, [0, 1])
+
+
+def test_runs_are_retried_after_a_worker_dies(tmp_path, monkeypatch):
+    monkeypatch.setattr(sweep, 'execute_run', crash_first_run)
+
+    manifest = sweep.run_sweep(MODEL_DIR, str(tmp_path), {}, [1, 2], jobs=1, retries=1)
+
+    assert all(record['status'] == 'done' for record in manifest['runs'].values())
+    assert sorted(manifest['runs']) == ['default/1', 'default/2']
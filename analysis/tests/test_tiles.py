@@ -0,0 +1,64 @@
+import pytest
+from conftest import get_random_world
+from essentials import get_cell_populations, get_grid_chunks, get_tile_counts
+
+
+# the chunks that get_tile_counts replaces, for square grids with 10 chunks per side
+def baseline_get_grid_chunks(agents):
+    chunks = []
+    grid_side = int(agents.shape[0] ** (1 / 2))
+    chunk_side = int(grid_side / 10)
+    for x in range(0, grid_side, chunk_side):
+        for y in range(0, grid_side, chunk_side):
+            xmax = x + chunk_side
+            ymin = y - 0.5
+            ymax = y + chunk_side - 0.5
+            chunk = agents[
+                (agents['xcor'] >= x) & (agents['xcor'] < xmax) & (agents['ycor'] >= ymin) & (agents['ycor'] < ymax)]
+            chunks.append(chunk)
+
+    return chunks
+
+
+# the same chunks for any grid and chunk side
+def get_chunks(agents, width, height, chunk_side):
+    chunks = []
+    for x in range(0, width, chunk_side):
+        for y in range(0, height, chunk_side):
+            chunk = agents[(agents['xcor'] >= x) & (agents['xcor'] < x + chunk_side) &
+                           (agents['ycor'] >= y - 0.5) & (agents['ycor'] < y + chunk_side - 0.5)]
+            chunks.append(chunk)
+
+    return chunks
+
+
+def assert_tiles_equal_chunks(agents, chunks, tileSize=None, gridExtent=None):
+    counts = get_tile_counts(agents, tileSize, gridExtent)
+    tiles = get_grid_chunks(agents, tileSize, gridExtent)
+
+    assert len(counts) == len(tiles) == len(chunks)
+    for i, chunk in enumerate(chunks):
+        row = counts.iloc[i]
+        assert [row["A"], row["B"], row["D"], row["E"]] == get_cell_populations(chunk)
+        assert row["agents"] == len(chunk)
+        assert list(tiles[i]["who"]) == list(chunk["who"])
+
+
+@pytest.mark.parametrize("side", [20, 30, 25])
+def test_default_tiles_equal_baseline_chunks(side):
+    agents = get_random_world([0, side - 1, 0, side - 1])
+
+    assert_tiles_equal_chunks(agents, baseline_get_grid_chunks(agents))
+
+
+@pytest.mark.parametrize("width, height, tileSize", [(14, 8, 3), (30, 20, None), (20, 30, 7), (9, 21, 4), (12, 12, 12)])
+def test_tiles_of_non_square_grids(width, height, tileSize):
+    agents = get_random_world([0, width - 1, 0, height - 1], seed=width)
+    # without a tile size the shortest side is split in 10 tiles
+    chunkSide = tileSize or max(1, min(width, height) // 10)
+
+    chunks = get_chunks(agents, width, height, chunkSide)
+
+    assert_tiles_equal_chunks(agents, chunks, tileSize, [0, width - 1, 0, height - 1])
+    # the grid extent of a full grid is found from the agents
+    assert_tiles_equal_chunks(agents, chunks, tileSize)
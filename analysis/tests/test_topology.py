@@ -0,0 +1,77 @@
+import math
+import numpy as np
+import pytest
+from benchmark import create_synthetic_model
+from essentials import NEIGHBOR_COLUMNS, parse_netlogo_world
+from pipeline import get_world_files
+from topology import (EXTENDED_NEIGHBORS, IMMEDIATE_NEIGHBORS, NEIGHBORHOODS, SIX_NEIGHBORS, get_agent_neighbors,
+                      get_patch_index, get_topology, topologies)
+
+
+# define-neighbors of SP_essentials.nls, one agent and one point at a time: the patch of a point is the patch whose
+# square [pxcor - 0.5, pxcor + 0.5) x [pycor - 0.5, pycor + 0.5) contains it, on the wrapped world
+def define_neighbors(gridExtent, offsets):
+    minPxcor, maxPxcor, minPycor, maxPycor = gridExtent
+    width, height = maxPxcor - minPxcor + 1, maxPycor - minPycor + 1
+    neighbors = []
+    for pxcor in range(minPxcor, maxPxcor + 1):
+        for pycor in range(minPycor, maxPycor + 1):
+            xcor, ycor = pxcor, pycor - 0.5 if pxcor % 2 == 0 else pycor
+            agentset = set()
+            for dx, dy in offsets[pxcor % 2]:
+                x = (math.floor(xcor + dx + 0.5) - minPxcor) % width
+                y = (math.floor(ycor + dy + 0.5) - minPycor) % height
+                agentset.add(x * height + y)
+            neighbors.append(agentset)
+
+    return neighbors
+
+
+@pytest.mark.parametrize("gridExtent", [[0, 9, 0, 9], [-4, 5, -3, 4], [0, 3, 0, 2], [0, 1, 0, 1]])
+@pytest.mark.parametrize("divisionBias", [True, False])
+def test_topology_equals_define_neighbors(gridExtent, divisionBias):
+    topology = get_topology(gridExtent, divisionBias)
+
+    offsets = [SIX_NEIGHBORS, IMMEDIATE_NEIGHBORS[divisionBias], EXTENDED_NEIGHBORS[divisionBias]]
+    for neighborhood, neighborhoodOffsets in zip(NEIGHBORHOODS, offsets):
+        expected = define_neighbors(gridExtent, neighborhoodOffsets)
+        rows = [[j for j in row if j >= 0] for row in topology[neighborhood].tolist()]
+        # agentsets hold every agent once
+        assert all(len(row) == len(set(row)) for row in rows)
+        assert [set(row) for row in rows] == expected
+
+    patches = get_patch_index(topology["xcor"], topology["ycor"], gridExtent)
+    assert np.array_equal(patches, np.arange(len(patches)))
+
+
+def test_topology_cache(tmp_path):
+    topology = get_topology([0, 5, 0, 7], True, str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # a new process reads the topology from the cache directory
+    topologies.clear()
+    cached = get_topology([0, 5, 0, 7], True, str(tmp_path))
+    assert cached.keys() == topology.keys()
+    assert all(np.array_equal(cached[name], topology[name]) for name in topology)
+
+
+def test_world_neighbors_equal_define_neighbors(tmp_path):
+    # the agents of the synthetic worlds are numbered in random patch order
+    c = create_synthetic_model(str(tmp_path), side=12, numOfClones=4, numOfSeeds=1, numOfWeeks=2)
+    gridExtent = [0, 11, 0, 11]
+    sixNeighbors = define_neighbors(gridExtent, SIX_NEIGHBORS)
+
+    for week, seed, path in get_world_files(c):
+        agents = parse_netlogo_world(path)
+        # the patch of every agent is the patch its position falls in
+        pxcor = np.floor(agents["xcor"].to_numpy() + 0.5).astype(int)
+        pycor = np.floor(agents["ycor"].to_numpy() + 0.5).astype(int)
+        whoOfPatch = dict(zip(pxcor * 12 + pycor, agents["who"]))
+        expected = [{whoOfPatch[patch] for patch in sixNeighbors[x * 12 + y]} for x, y in zip(pxcor, pycor)]
+
+        assert [set(row) - {-1} for row in agents[NEIGHBOR_COLUMNS].to_numpy().tolist()] == expected
+
+        # agents that do not fill the grid are not mapped to the topology
+        who, xcor, ycor = agents["who"].to_numpy(), agents["xcor"].to_numpy(), agents["ycor"].to_numpy()
+        assert get_agent_neighbors(who[1:], xcor[1:], ycor[1:], gridExtent, get_topology(gridExtent)) is None
+
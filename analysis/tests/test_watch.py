@@ -0,0 +1,74 @@
+import argparse
+import os
+import shutil
+import threading
+import time
+import pipeline
+from benchmark import create_synthetic_model
+from pipeline import run_workflows, watch_workflows
+from workflows import load_workflows
+
+
+def test_watch_analyses_every_file_once(tmp_path, monkeypatch, simulate_unified):
+    c = create_synthetic_model(str(tmp_path / "model"), side=10, numOfClones=4, numOfSeeds=2, numOfWeeks=3)
+    c['netlogo_snapshots'] = str(tmp_path / "model" / "netlogo_output" / "snapshots") + "/"
+    workflows = load_workflows(['cellPopulations'])
+
+    # the world files and a snapshot file of another run are exported while the model directory is watched
+    staging = str(tmp_path / "staging")
+    shutil.move(c['netlogo_output'], staging)
+    engineDir = simulate_unified(seed=9, side=10, **{'sims-duration': 3})
+    snapshotFile = os.path.join(engineDir, "netlogo_output", "snapshots", "unified_9.csv")
+
+    monkeypatch.setattr(pipeline, 'Observer', None)
+    monkeypatch.setattr(pipeline, 'WORLD_FILE_SETTLE_TIME', 0.5)
+    analysed = []
+    update_workflows = pipeline.update_workflows
+
+    def recording_update_workflows(c, workflows, jobs=1, worldFiles=None):
+        analysed.extend(os.path.basename(path) for week, seed, path in worldFiles)
+        return update_workflows(c, workflows, jobs, worldFiles)
+
+    monkeypatch.setattr(pipeline, 'update_workflows', recording_update_workflows)
+
+    options = argparse.Namespace(var='watch', jobs=1, poll_interval=0.05, idle_timeout=2.0, delete_ingested=True)
+    errors = []
+
+    def watch():
+        try:
+            watch_workflows(c, options, workflows)
+        except Exception as e:
+            errors.append(e)
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    time.sleep(0.2)
+
+    for filename in ["unified_0_1.csv", "unified_0_2.csv", "unified_1_1.csv"]:
+        shutil.copy(os.path.join(staging, filename), c['netlogo_output'])
+    while os.listdir(c['netlogo_output']) and watcher.is_alive():
+        time.sleep(0.05)
+
+    # a world file is only analysed once it has not changed for the settle time, though it is polled in between
+    for filename in ["unified_1_2.csv", "unified_2_1.csv", "unified_2_2.csv"]:
+        with open(os.path.join(staging, filename)) as fh:
+            content = fh.read()
+        with open(os.path.join(c['netlogo_output'], filename), 'w') as fh:
+            fh.write(content[:len(content) // 2])
+            fh.flush()
+            time.sleep(0.25)
+            fh.write(content[len(content) // 2:])
+    shutil.copy(snapshotFile, c['netlogo_snapshots'])
+
+    watcher.join(timeout=60)
+    assert not watcher.is_alive()
+    assert errors == []
+
+    assert sorted(analysed) == sorted(os.listdir(staging) + ["unified_9.csv"])
+    # world files are deleted once analysed, run files are still written by their simulation
+    assert os.listdir(c['netlogo_output']) == []
+    assert os.listdir(c['netlogo_snapshots']) == ["unified_9.csv"]
+
+    results = run_workflows(c, argparse.Namespace(var='use'), workflows)
+    percentagePerWeek = results['mutantPercentage']['mutantPercentagePerWeek']['WT']
+    assert {week: len(values) for week, values in percentagePerWeek.items()} == {0: 3, 1: 3, 2: 3, 3: 1}
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+ANALYSIS_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def test_workflows_do_not_import_networkx_or_matplotlib_until_needed(tmp_path):
+    # a new interpreter, as main.py, since the modules imported by the other tests stay in sys.modules
+    script = textwrap.dedent('''
+        import sys
+        modelDir = sys.argv[1]
+        sys.argv = ["main.py", "-m", modelDir, "save"]
+
+        def imported():
+            return sorted(name for name in ["networkx", "matplotlib"] if name in sys.modules)
+
+        from arguments import parse_arguments
+        from workflows import WORKFLOWS, load_workflows
+        parse_arguments()
+        assert imported() == [], imported()
+
+        from benchmark import create_synthetic_model
+        from pipeline import get_world_files, update_workflow_results
+        c = create_synthetic_model(modelDir, side=10, numOfClones=4, numOfSeeds=1, numOfWeeks=2)
+        workflows = load_workflows(list(WORKFLOWS))
+        results = {workflow['name']: workflow['init'](c) for workflow in workflows}
+        for worldFile in get_world_files(c):
+            update_workflow_results(results, worldFile, workflows, c)
+        assert imported() == [], imported()
+
+        # matplotlib is imported to draw the figures, networkx for the clone graphs
+        from render import render_figures
+        render_figures([('lines', {'data': {'x': {'run': [0, 1]}, 'y': {'run': ([1, 2], 'b-', [], None, None, None)}},
+                                   'xlabel': 'Weeks', 'ylabel': 'Value', 'title': 'run',
+                                   'savefig': modelDir + "/run.png"})])
+        assert imported() == ["matplotlib"], imported()
+
+        from essentials import get_clone_graph, parse_netlogo_world
+        agents = parse_netlogo_world(get_world_files(c)[0][2])
+        get_clone_graph(agents[agents["cloneid"] == agents["cloneid"].iloc[0]])
+        assert imported() == ["matplotlib", "networkx"], imported()
+    ''')
+
+    subprocess.run([sys.executable, "-c", script, str(tmp_path)], cwd=ANALYSIS_DIR, check=True)
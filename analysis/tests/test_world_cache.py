@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+import essentials
+from benchmark import create_synthetic_model
+from essentials import load_netlogo_world, parse_netlogo_world
+
+
+def test_world_cache(tmp_path, monkeypatch):
+    c = create_synthetic_model(str(tmp_path), side=10, numOfClones=4, numOfSeeds=1, numOfWeeks=1)
+    path = os.path.join(c['netlogo_output'], "unified_0_1.csv")
+    cacheDir = str(tmp_path / "worlds_cache")
+    parsed = parse_netlogo_world(path)
+
+    parses = []
+
+    def counting_parse(csv, cache_dir=None):
+        parses.append(csv)
+        return parse_netlogo_world(csv, cache_dir)
+
+    monkeypatch.setattr(essentials, 'parse_netlogo_world', counting_parse)
+
+    # the first load parses the world, the second one reads the cache
+    pd.testing.assert_frame_equal(load_netlogo_world(path, cacheDir), parsed)
+    pd.testing.assert_frame_equal(load_netlogo_world(path, cacheDir), parsed)
+    assert len(parses) == 1
+
+    # a new cache version invalidates the cache
+    monkeypatch.setattr(essentials, 'WORLD_CACHE_VERSION', essentials.WORLD_CACHE_VERSION + 1)
+    pd.testing.assert_frame_equal(load_netlogo_world(path, cacheDir), parsed)
+    assert len(parses) == 2
+
+    # so does a change of the modification time of the world
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    pd.testing.assert_frame_equal(load_netlogo_world(path, cacheDir), parsed)
+    pd.testing.assert_frame_equal(load_netlogo_world(path, cacheDir), parsed)
+    assert len(parses) == 3
+
+    # a corrupt cache entry is parsed again
+    with open(os.path.join(cacheDir, "unified_0_1.csv.pkl"), 'wb') as fh:
+        fh.write(b"corrupt")
+    pd.testing.assert_frame_equal(load_netlogo_world(path, cacheDir), parsed)
+    assert len(parses) == 4
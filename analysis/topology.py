@@ -0,0 +1,137 @@
+import os
+import numpy as np
+
+'''
+Topology of the wrapping hexagonal grid of the SP models, shared by the analysis and the native engine.
+The neighbourhoods of define-neighbors (SP_essentials.nls) are computed once per grid shape and division-bias setting
+as fixed width int32 matrices of patch indices, padded with -1 where a neighbourhood has fewer (distinct) agents.
+Patches are numbered column by column (index = (pxcor - min-pxcor) * height + pycor - min-pycor), which is also the
+agent numbering of the native engine; snapshots with any other numbering are mapped to patches by their coordinates.
+This module does not import essentials, so that essentials can use it
+'''
+
+TOPOLOGY_VERSION = 1
+
+# neighbourhoods of define-neighbors, as [dx, dy] offsets from the agent for even and odd columns
+SIX_NEIGHBORS = ([[0, 1], [1, 0], [1, -1], [0, -1], [-1, -1], [-1, 0]],
+                 [[0, 1], [1, 1], [1, 0], [0, -1], [-1, 0], [-1, 1]])
+IMMEDIATE_NEIGHBORS = {True: ([[1, 0], [1, -1], [-1, -1], [-1, 0]],
+                              [[1, 1], [1, 0], [-1, 0], [-1, 1]]),
+                       False: SIX_NEIGHBORS}
+EXTENDED_NEIGHBORS = {True: ([[2, 1], [2, 0], [2, -1], [-2, -1], [-2, 0], [-2, 1]],
+                             [[2, 1], [2, 0], [2, -1], [-2, -1], [-2, 0], [-2, 1]]),
+                      False: ([[0, 2], [1, 1], [2, 1], [2, 0], [2, -1], [1, -2], [0, -2], [-1, -2], [-2, -1], [-2, 0],
+                               [-2, 1], [-1, 1]],
+                              [[0, 2], [1, 1.5], [2, 1], [2, 0], [2, -1], [1, -1], [0, -2], [-1, -1], [-2, -1], [-2, 0],
+                               [-2, 1], [-1, 2]])}
+
+NEIGHBORHOODS = ["six-neighbors", "immediate-neighbors", "extended-neighbors"]
+
+
+'''
+Return the patch index of agents from their coordinates. Agents of even columns are shifted down by half a patch,
+so pycor is ycor rounded up
+'''
+
+
+def get_patch_index(xcor, ycor, gridExtent):
+    minPxcor, maxPxcor, minPycor, maxPycor = gridExtent
+    height = maxPycor - minPycor + 1
+
+    return (np.rint(xcor).astype(np.int64) - minPxcor) * height + np.ceil(ycor).astype(np.int64) - minPycor
+
+
+'''
+Return the agent positions of a wrapping hexagonal grid (one agent per patch, even columns shifted down by half a
+patch) and, for every neighbourhood offset list, the (patches x offsets) matrix of neighbouring patches as
+"turtles-on patches at-points" would find them. Agentsets do not contain the same agent twice, so repeated
+neighbours (on grids narrower than the neighbourhood) are replaced by -1
+'''
+
+
+def get_hex_grid(gridExtent, *offsets):
+    minPxcor, maxPxcor, minPycor, maxPycor = gridExtent
+    width, height = maxPxcor - minPxcor + 1, maxPycor - minPycor + 1
+
+    pxcor = np.repeat(np.arange(minPxcor, maxPxcor + 1), height)
+    pycor = np.tile(np.arange(minPycor, maxPycor + 1), width)
+    xcor = pxcor.astype(np.float64)
+    ycor = np.where(pxcor % 2 == 0, pycor - 0.5, pycor).astype(np.float64)
+
+    neighborhoods = []
+    for evenOffsets, oddOffsets in offsets:
+        even = np.array(evenOffsets, dtype=np.float64)
+        odd = np.array(oddOffsets, dtype=np.float64)
+        d = np.where((pxcor % 2 == 0)[:, None, None], even[None], odd[None])
+
+        # points are rounded to the patch they fall in, on the wrapped world
+        x = (np.floor(xcor[:, None] + d[:, :, 0] + 0.5).astype(np.int64) - minPxcor) % width
+        y = (np.floor(ycor[:, None] + d[:, :, 1] + 0.5).astype(np.int64) - minPycor) % height
+        neighbors = (x * height + y).astype(np.int32)
+
+        for k in range(1, neighbors.shape[1]):
+            repeated = (neighbors[:, :k] == neighbors[:, k:k + 1]).any(axis=1)
+            neighbors[repeated, k] = -1
+        neighborhoods.append(neighbors)
+
+    return xcor, ycor, neighborhoods
+
+
+'''
+Return the topology of a grid as a dictionary of arrays indexed by patch: xcor, ycor and the six-neighbors,
+immediate-neighbors and extended-neighbors matrices. Topologies are kept in memory for the process and, if a cache
+directory is given, saved there as .npz files
+'''
+
+topologies = {}
+
+
+def get_topology(gridExtent, divisionBias=False, cacheDir=None):
+    key = tuple(int(limit) for limit in gridExtent) + (bool(divisionBias),)
+    if key in topologies:
+        return topologies[key]
+
+    cacheFile = None
+    if cacheDir is not None:
+        cacheFile = os.path.join(cacheDir, "topology_v{}_{}_{}_{}_{}_{}.npz".format(TOPOLOGY_VERSION, *key[:4],
+                                                                                  "bias" if key[4] else "nobias"))
+    if cacheFile is not None and os.path.exists(cacheFile):
+        with np.load(cacheFile) as arrays:
+            topology = {name: arrays[name] for name in arrays.files}
+    else:
+        xcor, ycor, neighborhoods = get_hex_grid(gridExtent, SIX_NEIGHBORS, IMMEDIATE_NEIGHBORS[key[4]],
+                                                 EXTENDED_NEIGHBORS[key[4]])
+        topology = dict(zip(NEIGHBORHOODS, neighborhoods), xcor=xcor, ycor=ycor)
+        if cacheFile is not None:
+            os.makedirs(cacheDir, exist_ok=True)
+            tmpFile = cacheFile[:-len(".npz")] + '.' + str(os.getpid()) + ".tmp.npz"
+            np.savez(tmpFile, **topology)
+            os.replace(tmpFile, cacheFile)
+
+    topologies[key] = topology
+    return topology
+
+
+'''
+Return the (agents x neighbours) matrix of the who numbers of the neighbours of every agent of a snapshot, for a
+neighbourhood of the topology, padded with -1. Returns None if the agents do not fill the grid with one agent per
+patch, as the models do
+'''
+
+
+def get_agent_neighbors(who, xcor, ycor, gridExtent, topology, neighborhood="six-neighbors"):
+    minPxcor, maxPxcor, minPycor, maxPycor = gridExtent
+    numOfPatches = (maxPxcor - minPxcor + 1) * (maxPycor - minPycor + 1)
+    if len(who) != numOfPatches:
+        return None
+
+    patches = get_patch_index(xcor, ycor, gridExtent)
+    whoOfPatch = np.full(numOfPatches + 1, -1, dtype=np.int64)
+    if patches.min() < 0 or patches.max() >= numOfPatches:
+        return None
+    whoOfPatch[patches] = who
+    if (whoOfPatch[:-1] < 0).any():
+        return None
+
+    # index -1 (padding) selects the extra -1 entry of whoOfPatch
+    return whoOfPatch[topology[neighborhood][patches]].astype(np.int32)
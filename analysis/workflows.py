@@ -0,0 +1,35 @@
+import importlib
+
+'''
+Registry of the analysis workflows of main.py. Every analysis name maps to the (module, variable) of its workflows
+(see pipeline.py), which are only imported by load_workflows, so that the modules of the analyses that are not run,
+and their dependencies, are not imported. This module imports no analysis module, so that the command line can be
+parsed before any of them is loaded
+'''
+
+WORKFLOWS = {
+    'cloneSizeDistribution': [('cloneSizeDistribution', 'cloneSizeDistributionWorkflow')],
+    'averageCloneSize': [('averageCloneSize', 'avgCloneSizeWorkflow')],
+    'cellPopulations': [('mutantProportion', 'mutantPercentageWorkflow'), ('cellPopulations', 'cellPopulationsWorkflow')],
+    'cloneInteractions': [('cloneInteractions', 'cloneInteractionsWorkflow')],
+    'cellDensity': [('cellDensity', 'cellDensityWorkflow')],
+    'rho': [('rho', 'rhoWorkflow')],
+    'neighborhoodDensity': [('neighborhoodDensity', 'neighborhoodDensityWorkflow')],
+    'eventRates': [('eventRates', 'eventRatesWorkflow')],
+}
+
+
+'''
+Return the workflows of the given analysis names, in the order of the registry
+'''
+
+
+def load_workflows(analysisNames):
+    workflows = []
+    for analysisName, entries in WORKFLOWS.items():
+        if analysisName not in analysisNames:
+            continue
+        for moduleName, workflowName in entries:
+            workflows.append(getattr(importlib.import_module(moduleName), workflowName))
+
+    return workflows